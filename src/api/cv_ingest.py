@@ -0,0 +1,192 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, AsyncIterator, Dict, List, Optional
+import asyncio
+import hashlib
+import io
+import logging
+import os
+import re
+
+logger = logging.getLogger("CvIngestor")
+
+# Lines that start a new CV section
+SECTION_HEADINGS = re.compile(
+    r"^\s*(summary|profile|objective|about me|experience|work experience|professional experience|employment( history)?|"
+    r"education|skills|technical skills|projects|certifications?|licenses|languages|awards|publications|"
+    r"volunteer(ing)?|interests|references|contact)\s*:?\s*$",
+    re.IGNORECASE,
+)
+
+
+class CvIngestError(Exception):
+    """Raised when an uploaded CV cannot be accepted; carries the HTTP status to report."""
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def parse_cv_bytes(filename: str, data: bytes) -> str:
+    """Extract text from a PDF, DOCX or plain-text CV. Runs in a worker process."""
+    name = filename.lower()
+    if name.endswith(".pdf"):
+        import pdfplumber
+        with pdfplumber.open(io.BytesIO(data)) as pdf:
+            return "\n".join(page.extract_text() or "" for page in pdf.pages)
+    if name.endswith(".docx"):
+        import docx
+        document = docx.Document(io.BytesIO(data))
+        return "\n".join(paragraph.text for paragraph in document.paragraphs)
+    if name.endswith(".txt") or name.endswith(".md"):
+        return data.decode("utf-8", errors="replace")
+    raise ValueError(f"Unsupported file type: {filename}")
+
+
+def _is_heading(line: str) -> bool:
+    if SECTION_HEADINGS.match(line):
+        return True
+    stripped = line.strip()
+    # Short all-caps lines ("WORK HISTORY") are headings in most CV templates
+    return 2 < len(stripped) <= 40 and stripped.isupper() and not any(c.isdigit() for c in stripped)
+
+
+def chunk_cv(text: str, max_chars: int = 1200) -> List[Dict[str, str]]:
+    """Split CV text into section-aware chunks of at most `max_chars`, never spanning two sections."""
+    sections: List[List[str]] = [["General"]]
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        if _is_heading(line):
+            sections.append([line.strip().rstrip(":").title()])
+        else:
+            sections[-1].append(line.strip())
+    chunks = []
+    for heading, *lines in sections:
+        current: List[str] = []
+        size = 0
+        for line in lines:
+            if current and size + len(line) + 1 > max_chars:
+                chunks.append({"section": heading, "content": "\n".join(current)})
+                current, size = [], 0
+            # Single lines longer than a chunk are split hard
+            while len(line) > max_chars:
+                chunks.append({"section": heading, "content": line[:max_chars]})
+                line = line[max_chars:]
+            current.append(line)
+            size += len(line) + 1
+        if current:
+            chunks.append({"section": heading, "content": "\n".join(current)})
+    return chunks
+
+
+def content_hash(user_id: str, content: str) -> str:
+    normalized = " ".join(content.split()).lower()
+    return hashlib.sha256(f"{user_id}\x00{normalized}".encode("utf-8")).hexdigest()
+
+
+class CvIngestor:
+    """
+    CV ingestion pipeline: bounded upload read, PDF/DOCX parsing in a process pool with a
+    timeout, section-aware chunking, content-hash dedup and one bulk VectorMemory.add.
+    A parse that times out has its worker killed and the pool rebuilt.
+    """
+    def __init__(self, max_bytes: int = None, parse_timeout: float = None, max_workers: int = None, chunk_chars: int = None):
+        self.max_bytes = max_bytes or int(os.getenv("CV_MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+        self.parse_timeout = parse_timeout or float(os.getenv("CV_PARSE_TIMEOUT", "30"))
+        self.chunk_chars = chunk_chars or int(os.getenv("CV_CHUNK_CHARS", "1200"))
+        self.max_workers = max_workers or int(os.getenv("CV_PARSE_WORKERS", "2"))
+        self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        self.pool_restarts = 0
+
+    async def limit_stream(self, stream: AsyncIterator[bytes], overhead: int = 64 * 1024) -> AsyncIterator[bytes]:
+        """Pass a request body through, failing once it exceeds the size limit plus room for form fields."""
+        received = 0
+        async for chunk in stream:
+            received += len(chunk)
+            if received > self.max_bytes + overhead:
+                raise CvIngestError(413, f"CV exceeds {self.max_bytes} bytes")
+            yield chunk
+
+    async def read_upload(self, upload, chunk_size: int = 64 * 1024) -> bytes:
+        """Read an UploadFile in chunks, rejecting it as soon as it exceeds the size limit."""
+        buffer = bytearray()
+        while True:
+            chunk = await upload.read(chunk_size)
+            if not chunk:
+                return bytes(buffer)
+            buffer.extend(chunk)
+            if len(buffer) > self.max_bytes:
+                raise CvIngestError(413, f"CV exceeds {self.max_bytes} bytes")
+
+    async def parse(self, filename: str, data: bytes) -> str:
+        loop = asyncio.get_running_loop()
+        for attempt in range(2):
+            pool = self._pool
+            try:
+                return await asyncio.wait_for(loop.run_in_executor(pool, parse_cv_bytes, filename, data), self.parse_timeout)
+            except asyncio.TimeoutError:
+                # wait_for only stops waiting; the worker would keep parsing and hold its slot forever
+                self._restart_pool(pool)
+                raise CvIngestError(422, f"Parsing took longer than {self.parse_timeout:.0f}s")
+            except BrokenProcessPool:
+                # The pool was killed under this parse (another upload timed out) or a worker crashed
+                self._restart_pool(pool)
+                if attempt:
+                    logger.error(f"Parsing {filename} crashed the parser process")
+                    raise CvIngestError(422, f"Could not parse {filename}")
+            except ValueError as e:
+                raise CvIngestError(415, str(e))
+            except Exception as e:
+                logger.error(f"Failed to parse {filename}: {e}")
+                raise CvIngestError(422, f"Could not parse {filename}")
+
+    def _restart_pool(self, pool: ProcessPoolExecutor):
+        if pool is not self._pool:
+            return
+        self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        self.pool_restarts += 1
+        logger.warning("Restarting the CV parser pool")
+        # shutdown() never interrupts a running task, so the workers are killed outright
+        for process in list((pool._processes or {}).values()):
+            process.kill()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    async def ingest(self, vector_memory, filename: str, data: bytes, user_id: str, session_id: Optional[str] = None) -> Dict[str, Any]:
+        text = await self.parse(filename, data)
+        if not text.strip():
+            raise CvIngestError(422, "No text could be extracted from the CV")
+        chunks = chunk_cv(text, self.chunk_chars)
+        # Chunk ids are content hashes, so a re-upload overwrites the same documents (and re-embeds
+        # nothing, via the embedding cache) while retention or deletion never leaves a CV unindexed
+        messages = {}
+        for i, chunk in enumerate(chunks):
+            digest = content_hash(user_id, chunk["content"])
+            if digest in messages:
+                continue
+            messages[digest] = {
+                "id": digest,
+                "content": chunk["content"],
+                "metadata": {
+                    "doc_type": "cv",
+                    "user_id": user_id,
+                    "session_id": session_id,
+                    "filename": filename,
+                    "section": chunk["section"],
+                    "chunk": i,
+                    "content_hash": digest,
+                },
+            }
+        duplicates = len(chunks) - len(messages)
+        if messages:
+            await vector_memory.add(list(messages.values()))
+        logger.info(f"Indexed {len(messages)} CV chunks for {user_id} ({duplicates} duplicates skipped)")
+        return {
+            "chunks": len(chunks),
+            "indexed": len(messages),
+            "duplicates": duplicates,
+            "preview": text[:500],
+        }
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -1,18 +1,38 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, UploadFile, File
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse
+from starlette.datastructures import UploadFile
+from starlette.formparsers import MultiPartException, MultiPartParser
 import asyncio
 import json
 import os
 from workflow.config import llm_config
-from workflow.agents import create_agents as orig_create_agents
-from workflow.agent_selectors import human_in_the_loop_selector
+from workflow.session_pool import SessionFactory
+from workflow.session_store import LiveSession, SessionManager
+from common.clients import get_client_registry
+from workflow.tool_cache import get_response_cache, tool_cache_stats
+from workflow.events import SessionEventBus, bind_bus, make_event
+from common.metrics import bind_session, get_metrics
+from workflow.scheduler import get_scheduler
+from workflow.agent_selectors import make_human_in_the_loop_selector
+from workflow.orchestration import consult_mode, run_parallel_session
 from autogen_agentchat.teams import SelectorGroupChat
-from autogen_core.model_context import BufferedChatCompletionContext
+from autogen_agentchat.base import TaskResult
+from autogen_agentchat.messages import (
+    BaseChatMessage,
+    HandoffMessage,
+    ModelClientStreamingChunkEvent,
+    SelectSpeakerEvent,
+    ToolCallExecutionEvent,
+    ToolCallRequestEvent,
+)
+from workflow.model_context import TokenBudgetChatCompletionContext
+from memory.profile_cache import ProfileMemory, get_profile_cache, profile_memory
+from memory.retention import IndexCompactor
 from memory.vector_memory import VectorMemory
-import queue
+from api.cv_ingest import CvIngestor, CvIngestError
 import shutil
-import uuid
+from contextlib import asynccontextmanager
 from autogen_agentchat.agents import UserProxyAgent
 
 # For file parsing
@@ -25,7 +45,29 @@ try:
 except ImportError:
     docx = None
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm agent teams and MCP tool servers are shared by all chat sessions
+    app.state.agent_config = llm_config("agent")
+    app.state.tool_config = llm_config("tool")
+    app.state.session_factory = SessionFactory(app.state.agent_config, app.state.tool_config)
+    await app.state.session_factory.start()
+    app.state.cv_ingestor = CvIngestor()
+    app.state.session_manager = SessionManager()
+    app.state.session_manager.start()
+    # Expires old documents from the vector indexes in the background (VECTOR_RETENTION_SECONDS)
+    app.state.index_compactor = IndexCompactor([VectorMemory(index_name=os.getenv("AZURE_SEARCH_INDEX_CORE")), profile_memory()])
+    app.state.index_compactor.start()
+    try:
+        yield
+    finally:
+        await app.state.index_compactor.close()
+        app.state.cv_ingestor.close()
+        await app.state.session_manager.close()
+        await app.state.session_factory.close()
+        await get_client_registry().close()
+
+app = FastAPI(lifespan=lifespan)
 
 # Allow CORS for local frontend development
 app.add_middleware(
@@ -38,109 +80,215 @@ app.add_middleware(
 
 @app.get("/health")
 def health_check():
-    return {"status": "ok"}
+    return {
+        "status": "ok",
+        "sessions": app.state.session_factory.stats(),
+        "live_sessions": app.state.session_manager.stats(),
+        "connections": get_client_registry().stats(),
+        "tool_caches": tool_cache_stats(),
+        "response_cache": get_response_cache().stats() if get_response_cache() else None,
+        "llm_scheduler": get_scheduler().stats(),
+        "profile_cache": get_profile_cache().stats(),
+        "vector_compaction": app.state.index_compactor.stats(),
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    # Prometheus text format: span latency histograms plus token, cache and error counters
+    return get_metrics().render()
+
+@app.get("/metrics/sessions/{session_id}")
+def session_trace(session_id: str):
+    spans = get_metrics().trace(session_id)
+    if spans is None:
+        raise HTTPException(status_code=404, detail="No trace for this session (set METRICS_TRACE=true to record traces)")
+    return {"session_id": session_id, "spans": spans}
+
+@app.post("/upload_cv")
+async def upload_cv(request: Request):
+    """
+    Multipart form with `file` and optionally the `session_id` of a chat session. The CV belongs to
+    that session, or to a newly issued one returned in the response for /ws/chat?session_id=...
+    The body is parsed straight from the request stream, so an oversized upload is cut off once it
+    crosses the limit.
+    """
+    ingestor = app.state.cv_ingestor
+    # Reject oversized uploads from the declared length before reading anything
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > ingestor.max_bytes + 64 * 1024:
+        raise HTTPException(status_code=413, detail=f"CV exceeds {ingestor.max_bytes} bytes")
+    if not request.headers.get("content-type", "").startswith("multipart/form-data"):
+        raise HTTPException(status_code=415, detail="Expected a multipart/form-data upload")
+    form = None
+    try:
+        parser = MultiPartParser(request.headers, ingestor.limit_stream(request.stream()), max_files=1, max_fields=10)
+        form = await parser.parse()
+        file = form.get("file")
+        if not isinstance(file, UploadFile):
+            raise HTTPException(status_code=400, detail="Missing CV file")
+        # The owner is always a server-issued session id; a client-supplied one must be known
+        requested = form.get("session_id")
+        owner = await app.state.session_manager.session_id(requested if isinstance(requested, str) else None)
+        if requested and owner != requested:
+            raise HTTPException(status_code=404, detail="Unknown session_id")
+        data = await ingestor.read_upload(file)
+        async with profile_memory() as memory:
+            result = await ingestor.ingest(memory, file.filename or "cv", data, user_id=owner, session_id=owner)
+    except CvIngestError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except MultiPartException as e:
+        raise HTTPException(status_code=400, detail=e.message)
+    finally:
+        if form is not None:
+            await form.close()
+    # The next ProfilerAgent turn for this user should see the new CV
+    get_profile_cache().invalidate(owner)
+    return {"status": "ok", "filename": file.filename, "session_id": owner, **result}
 
 # Helper: Patch agent message sending to stream events to WebSocket
 async def stream_agent_event(event, websocket):
     # event: dict with keys like 'agent', 'type', 'content', 'tool', 'handoff'
     await websocket.send_text(json.dumps(event))
 
+async def publish_stream_item(item, bus):
+    """Translate one item from SelectorGroupChat.run_stream() into typed frames on the session bus."""
+    if isinstance(item, ModelClientStreamingChunkEvent):
+        await bus.publish_token(item.source, item.content)
+    elif isinstance(item, ToolCallRequestEvent):
+        for call in item.content:
+            await bus.publish(make_event(item.source, "tool_call_start", call.arguments, tool=call.name))
+    elif isinstance(item, ToolCallExecutionEvent):
+        for result in item.content:
+            await bus.publish(make_event(item.source, "tool_call_end", result.content[:2000], tool=result.name))
+    elif isinstance(item, SelectSpeakerEvent):
+        await bus.publish(make_event("system", "handoff", ", ".join(item.content), handoff=True))
+    elif isinstance(item, HandoffMessage):
+        await bus.publish(make_event(item.source, "handoff", item.content, handoff=True))
+    elif isinstance(item, BaseChatMessage) and item.source not in ("user", "user_proxy"):
+        # The complete message; the client replaces the tokens it accumulated for this agent
+        await bus.publish(make_event(item.source, "message", item.to_text()))
+    elif isinstance(item, TaskResult):
+        await bus.publish(make_event("system", "system", f"Conversation ended: {item.stop_reason}"))
+
+async def start_session(session_id, mode, snapshot=None):
+    """Build a LiveSession: a warm team from the pool, its hooks and the task driving the conversation."""
+    manager = app.state.session_manager
+    session_factory = app.state.session_factory
+    agent_config = app.state.agent_config
+    # Everything this session's agents, selector and hooks publish goes through its own bus;
+    # the task created below inherits these bindings and keeps them across reconnects
+    bus = SessionEventBus(session_id=session_id)
+    bind_bus(bus)
+    bind_session(session_id)
+    # Held open for the life of the session rather than one connection
+    user_vector_memory = await profile_memory().__aenter__()
+    model_context = TokenBudgetChatCompletionContext(
+        agent_config, deployment=os.getenv("AZURE_OPENAI_DEPLOYMENT"), summarizer_client=app.state.tool_config
+    )
+    session = None
+    async def websocket_input_func(prompt=None, *args, **kwargs):
+        # A turn boundary: snapshot after the prompt is out so the client is not kept waiting
+        session.waiting_for_input = True
+        await bus.publish(make_event("system", "system", "WAITING FOR USER INPUT"))
+        await manager.checkpoint(session)
+        try:
+            return await bus.receive_user_message()
+        finally:
+            session.waiting_for_input = False
+            session.turns += 1
+    agents, user_agent = await create_agents_with_patched_user(session_factory, websocket_input_func)
+    group_agents = agents + [user_agent]
+    groupchat = None
+    if mode != "parallel":
+        groupchat = SelectorGroupChat(
+            participants=group_agents,
+            model_client=agent_config,
+            max_turns=30,
+            selector_func=make_human_in_the_loop_selector(),
+            model_context=model_context,
+            emit_team_events=True
+        )
+    session = LiveSession(session_id, mode, bus, agents, team=groupchat, release=session_factory.release)
+    session.cleanups.append(user_vector_memory.backend.close)
+    if snapshot:
+        await session.restore(snapshot)
+    # ProfilerAgent sees the CV uploaded for this session in its model context, looked up by key
+    # through the profile cache. The session id is server-issued, so it is the CV's owner
+    for agent in agents:
+        if agent.name == "ProfilerAgent":
+            profile = ProfileMemory(user_vector_memory, session_id)
+            agent._memory = [*(agent._memory or []), profile]
+            # Detach it before the team goes back to the pool
+            session.cleanups.append(lambda agent=agent, profile=profile: agent._memory.remove(profile))
+    if mode == "parallel":
+        # Triage classifies, specialists run concurrently, Triage synthesizes. Snapshots are only taken
+        # while waiting for input, so a restored session restarts the loop at the next user message
+        async def send_reply(text):
+            await bus.publish(make_event("TriageAgent", "message", text))
+        async def receive():
+            return await websocket_input_func()
+        session.task = asyncio.create_task(run_parallel_session(agents, receive, send_reply))
+    else:
+        async def stream_groupchat():
+            # With no task, a restored team picks up where its snapshot left off. When the LLM scheduler
+            # sheds a call, it tells the user on this session's bus itself
+            async for item in groupchat.run_stream():
+                await publish_stream_item(item, bus)
+        session.task = asyncio.create_task(stream_groupchat())
+    return session
+
 @app.websocket("/ws/chat")
 async def websocket_chat(websocket: WebSocket):
-    session_id = websocket.query_params.get("session_id")
+    mode = websocket.query_params.get("mode") or consult_mode()
     await websocket.accept()
+    manager = app.state.session_manager
+    # An id this server never issued gets a new one; the client learns it from the session_ready frame
+    session_id = await manager.session_id(websocket.query_params.get("session_id"))
 
-    # Patch print to also send to WebSocket as a system message
-    import builtins
-    orig_print = builtins.print
-    async def ws_print(*args, **kwargs):
-        msg = " ".join(str(a) for a in args)
-        event = {
-            "agent": "system",
-            "type": "system",
-            "content": msg,
-            "tool": None,
-            "handoff": False
-        }
-        await stream_agent_event(event, websocket)
-        builtins.print = orig_print
-        try:
-            orig_print(*args, **kwargs)
-        finally:
-            builtins.print = print_patch
-    def print_patch(*args, **kwargs):
-        import asyncio
-        loop = asyncio.get_event_loop()
-        loop.create_task(ws_print(*args, **kwargs))
-    builtins.print = print_patch
+    # Reattach to a session still in memory, else restore its snapshot, else start a new one
+    session = await manager.attach(session_id, websocket)
+    resumed = session is not None
+    if session is None:
+        snapshot = await manager.store.load(session_id)
+        session = await start_session(session_id, snapshot["mode"] if snapshot else mode, snapshot)
+        manager.register(session, websocket, restored=snapshot is not None)
+        resumed = snapshot is not None
+    bus = session.bus
+    # Tells the client the team is in place; sent before any queued session events
+    await stream_agent_event(make_event("system", "session_ready", session_id), websocket)
+
+    async def forward_events():
+        async for event in bus.events():
+            await stream_agent_event(event, websocket)
+    sender_task = session.sender = asyncio.create_task(forward_events())
+    if resumed:
+        await bus.publish(make_event("system", "system", f"Session {session_id} resumed"))
+        if session.waiting_for_input:
+            await bus.publish(make_event("system", "system", "WAITING FOR USER INPUT"))
 
     try:
-        async with VectorMemory(index_name=os.getenv("AZURE_SEARCH_INDEX_PROFILE")) as user_vector_memory:
-            agent_config = llm_config("agent")
-            tool_config = llm_config("tool")
-            model_context = BufferedChatCompletionContext(buffer_size=10)
-            user_message_queue = queue.Queue()
-            async def websocket_input_func(prompt=None, *args, **kwargs):
-                print("WAITING FOR USER INPUT")
-                import asyncio
-                loop = asyncio.get_event_loop()
-                return await loop.run_in_executor(None, user_message_queue.get)
-            agents, user_agent = await create_agents_with_patched_user(agent_config, tool_config, websocket_input_func)
-            group_agents = agents + [user_agent]
-            # Patch ProfilerAgent to auto-retrieve CV from vector memory on first turn
-            for agent in group_agents:
-                if getattr(agent, "name", None) == "ProfilerAgent":
-                    orig_on_message = getattr(agent, "on_message", None)
-                    agent._cv_checked = False
-                    async def patched_on_message(self, msg, *args, **kwargs):
-                        if not self._cv_checked:
-                            self._cv_checked = True
-                            # Query vector memory for CV/resume
-                            result = await user_vector_memory.query("resume OR curriculum OR cv", top_k=1)
-                            if result and getattr(result, "results", None):
-                                cv_text = result.results[0]["content"]
-                                analysis = f"I found your uploaded CV. Here is my analysis:\n\n[CV Preview]\n{cv_text[:500]}...\n\n(For a full analysis, please ask specific questions or provide more details.)"
-                                event = {
-                                    "agent": self.name,
-                                    "type": "message",
-                                    "content": analysis,
-                                    "tool": None,
-                                    "handoff": False
-                                }
-                                print("HOOK CALLED", event)
-                                await stream_agent_event(event, websocket)
-                                return
-                        if orig_on_message:
-                            return await orig_on_message(msg)
-                    import types
-                    agent.on_message = types.MethodType(patched_on_message, agent)
-            groupchat = SelectorGroupChat(
-                participants=group_agents,
-                model_client=agent_config,
-                max_turns=30,
-                selector_func=human_in_the_loop_selector,
-                model_context=model_context
-            )
-            import asyncio
-            groupchat_task = asyncio.create_task(groupchat.run())
-            try:
-                while True:
-                    data = await websocket.receive_text()
-                    user_message = json.loads(data)
-                    text = user_message.get("content", "")
-                    user_message_queue.put(text)
-            except WebSocketDisconnect:
-                pass
-            except Exception as e:
-                await websocket.close(code=1011, reason=str(e))
-            finally:
-                groupchat_task.cancel()
-                try:
-                    await groupchat_task
-                except Exception:
-                    pass
+        while True:
+            data = await websocket.receive_text()
+            if session.owner is not websocket:
+                # Taken over by a newer connection; its turns must not reach the session
+                break
+            user_message = json.loads(data)
+            text = user_message.get("content", "")
+            # Waits while the inbound queue is full, which pushes back on the client
+            await bus.send_user_message(text)
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        if session.owner is websocket:
+            await websocket.close(code=1011, reason=str(e))
     finally:
-        builtins.print = orig_print
+        sender_task.cancel()
+        try:
+            await sender_task
+        except (Exception, asyncio.CancelledError):
+            pass
+        # The session stays alive for a reconnect until the manager evicts it to the store
+        await manager.detach(session, websocket)
 
 # --- PATCHED USERPROXYAGENT TO FORCE CUSTOM INPUT FUNC ---
 class PatchedUserProxyAgent(UserProxyAgent):
@@ -150,8 +298,8 @@ class PatchedUserProxyAgent(UserProxyAgent):
             self.input_func = input_func
     # Optionally, override methods to guarantee input_func is used
 
-async def create_agents_with_patched_user(agent_config, tool_config, input_func):
-    agents, user_agent = await orig_create_agents(agent_config, tool_config)
-    # Replace user_agent with patched version
+async def create_agents_with_patched_user(session_factory, input_func):
+    agents = await session_factory.acquire()
+    # The user proxy is per session; everything else comes from the warm pool
     patched_user_agent = PatchedUserProxyAgent("user_proxy", input_func=input_func)
     return agents, patched_user_agent 
\ No newline at end of file
@@ -0,0 +1,314 @@
+"""
+Local stand-ins for Azure OpenAI (chat and embeddings) and Azure Search, so the service can be
+load-tested without credentials. Latency and response sizes are drawn from configurable
+distributions; see FakeSettings for the BENCH_* environment variables.
+"""
+from typing import Any, AsyncGenerator, Dict, List, Mapping, Optional, Sequence
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import uuid
+import numpy as np
+from autogen_core import CancellationToken, FunctionCall
+from autogen_core.models import (
+    ChatCompletionClient,
+    CreateResult,
+    FunctionExecutionResultMessage,
+    LLMMessage,
+    ModelFamily,
+    ModelInfo,
+    RequestUsage,
+)
+from memory.vector_backends import compile_filter
+
+WORDS = (
+    "profile experience skills python data cloud analytics role market salary learning plan course project "
+    "certification interview portfolio leadership communication growth remote hybrid team engineering"
+).split()
+
+
+class FakeSettings:
+    """Distributions for the fakes, read from BENCH_* environment variables."""
+    def __init__(self):
+        self.llm_latency_ms = float(os.getenv("BENCH_LLM_LATENCY_MS", "400"))
+        self.llm_latency_sigma = float(os.getenv("BENCH_LLM_LATENCY_SIGMA", "0.5"))
+        self.llm_token_ms = float(os.getenv("BENCH_LLM_TOKEN_MS", "10"))
+        self.tokens_mean = float(os.getenv("BENCH_LLM_TOKENS_MEAN", "120"))
+        self.tokens_sd = float(os.getenv("BENCH_LLM_TOKENS_SD", "40"))
+        self.question_rate = float(os.getenv("BENCH_QUESTION_RATE", "0.35"))
+        self.tool_call_rate = float(os.getenv("BENCH_TOOL_CALL_RATE", "0.2"))
+        self.embed_latency_ms = float(os.getenv("BENCH_EMBED_LATENCY_MS", "20"))
+        self.search_latency_ms = float(os.getenv("BENCH_SEARCH_LATENCY_MS", "30"))
+        self.embedding_dim = int(os.getenv("BENCH_EMBEDDING_DIM", "256"))
+        self.seed = int(os.getenv("BENCH_SEED", "0"))
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(vars(self))
+
+
+def lognormal_seconds(rng: random.Random, median_ms: float, sigma: float) -> float:
+    if median_ms <= 0:
+        return 0.0
+    return rng.lognormvariate(math.log(median_ms), sigma) / 1000
+
+
+class FakeChatCompletionClient(ChatCompletionClient):
+    """
+    Drop-in for AzureOpenAIChatCompletionClient. Each completion waits a log-normal
+    time-to-first-token, then produces a normally distributed number of tokens at a fixed rate.
+    Replies end in a question with probability `question_rate` (which hands control back to the
+    user) and call one of the offered tools with probability `tool_call_rate`.
+    """
+    def __init__(self, deployment: str = "fake", settings: Optional[FakeSettings] = None):
+        self.deployment = deployment
+        self.settings = settings or FakeSettings()
+        self.calls = 0
+        self._rng = random.Random(f"{self.settings.seed}:{deployment}")
+        self._total_usage = RequestUsage(prompt_tokens=0, completion_tokens=0)
+        self._actual_usage = RequestUsage(prompt_tokens=0, completion_tokens=0)
+
+    def _plan(self, messages: Sequence[LLMMessage], tools: Sequence[Any]):
+        s = self.settings
+        first_token = lognormal_seconds(self._rng, s.llm_latency_ms, s.llm_latency_sigma)
+        n_tokens = max(1, int(self._rng.gauss(s.tokens_mean, s.tokens_sd)))
+        prompt_tokens = self.count_tokens(messages)
+        after_tool = bool(messages) and isinstance(messages[-1], FunctionExecutionResultMessage)
+        if tools and not after_tool and self._rng.random() < s.tool_call_rate:
+            tool = self._rng.choice(list(tools))
+            return first_token, [self._tool_call(tool)], prompt_tokens, 20
+        words = [self._rng.choice(WORDS) for _ in range(n_tokens)]
+        text = " ".join(words).capitalize()
+        text += "?" if self._rng.random() < s.question_rate else "."
+        return first_token, text, prompt_tokens, n_tokens
+
+    def _tool_call(self, tool) -> FunctionCall:
+        schema = tool if isinstance(tool, Mapping) else tool.schema
+        properties = schema.get("parameters", {}).get("properties", {})
+        required = schema.get("parameters", {}).get("required", list(properties))
+        query = " ".join(self._rng.choice(WORDS) for _ in range(4))
+        args = {name: query for name in required if properties.get(name, {}).get("type", "string") == "string"}
+        return FunctionCall(id=f"call_{uuid.uuid4().hex[:12]}", name=schema["name"], arguments=json.dumps(args))
+
+    def _record(self, prompt_tokens: int, completion_tokens: int) -> RequestUsage:
+        usage = RequestUsage(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        self.calls += 1
+        self._actual_usage = usage
+        self._total_usage = RequestUsage(
+            prompt_tokens=self._total_usage.prompt_tokens + prompt_tokens,
+            completion_tokens=self._total_usage.completion_tokens + completion_tokens,
+        )
+        return usage
+
+    async def create(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Any] = [],
+        tool_choice: Any = "auto",
+        json_output: Optional[Any] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> CreateResult:
+        first_token, content, prompt_tokens, n_tokens = self._plan(messages, tools)
+        await asyncio.sleep(first_token + n_tokens * self.settings.llm_token_ms / 1000)
+        return CreateResult(
+            finish_reason="function_calls" if isinstance(content, list) else "stop",
+            content=content,
+            usage=self._record(prompt_tokens, n_tokens),
+            cached=False,
+        )
+
+    async def create_stream(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Any] = [],
+        tool_choice: Any = "auto",
+        json_output: Optional[Any] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> AsyncGenerator[Any, None]:
+        first_token, content, prompt_tokens, n_tokens = self._plan(messages, tools)
+        await asyncio.sleep(first_token)
+        if isinstance(content, str):
+            for i, word in enumerate(content.split(" ")):
+                if i:
+                    await asyncio.sleep(self.settings.llm_token_ms / 1000)
+                yield word if i == 0 else " " + word
+        yield CreateResult(
+            finish_reason="function_calls" if isinstance(content, list) else "stop",
+            content=content,
+            usage=self._record(prompt_tokens, n_tokens),
+            cached=False,
+        )
+
+    async def close(self) -> None:
+        pass
+
+    def actual_usage(self) -> RequestUsage:
+        return self._actual_usage
+
+    def total_usage(self) -> RequestUsage:
+        return self._total_usage
+
+    def count_tokens(self, messages: Sequence[LLMMessage], *, tools: Sequence[Any] = []) -> int:
+        return sum(len(str(getattr(m, "content", ""))) // 4 + 4 for m in messages)
+
+    def remaining_tokens(self, messages: Sequence[LLMMessage], *, tools: Sequence[Any] = []) -> int:
+        return max(128000 - self.count_tokens(messages), 0)
+
+    @property
+    def capabilities(self):
+        return self.model_info
+
+    @property
+    def model_info(self) -> ModelInfo:
+        return ModelInfo(
+            vision=False,
+            function_calling=True,
+            json_output=True,
+            family=ModelFamily.GPT_4O,
+            structured_output=True,
+            multiple_system_messages=True,
+        )
+
+
+class _EmbeddingItem:
+    def __init__(self, index: int, embedding: List[float]):
+        self.index = index
+        self.embedding = embedding
+
+
+class _EmbeddingResponse:
+    def __init__(self, data: List[_EmbeddingItem]):
+        self.data = data
+
+
+class _FakeEmbeddings:
+    def __init__(self, owner: "FakeOpenAIClient"):
+        self._owner = owner
+
+    async def create(self, input: List[str], model: str = None, **kwargs) -> _EmbeddingResponse:
+        owner = self._owner
+        owner.requests += 1
+        await asyncio.sleep(lognormal_seconds(owner.rng, owner.settings.embed_latency_ms, 0.3))
+        return _EmbeddingResponse([_EmbeddingItem(i, owner.vector(text)) for i, text in enumerate(input)])
+
+
+class FakeOpenAIClient:
+    """Stands in for AsyncAzureOpenAI's embeddings API; vectors are deterministic per text."""
+    def __init__(self, settings: Optional[FakeSettings] = None):
+        self.settings = settings or FakeSettings()
+        self.rng = random.Random(self.settings.seed)
+        self.requests = 0
+        self.embeddings = _FakeEmbeddings(self)
+
+    def vector(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        return np.random.default_rng(seed).standard_normal(self.settings.embedding_dim).astype(np.float32).tolist()
+
+
+class FakeSearchClient:
+    """
+    In-memory stand-in for azure.search.documents.aio.SearchClient covering the calls the
+    memory backends make: upload_documents, delete_documents, get_document_count and search
+    (vector queries, "*" text search, OData filters, select).
+    """
+    def __init__(self, index_name: str, settings: Optional[FakeSettings] = None):
+        self.index_name = index_name
+        self.settings = settings or FakeSettings()
+        self.rng = random.Random(f"{self.settings.seed}:{index_name}")
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        self.requests = 0
+
+    async def _latency(self):
+        self.requests += 1
+        await asyncio.sleep(lognormal_seconds(self.rng, self.settings.search_latency_ms, 0.3))
+
+    async def upload_documents(self, documents: List[Dict[str, Any]]):
+        await self._latency()
+        for doc in documents:
+            self.docs[doc["id"]] = dict(doc)
+        return [{"key": doc["id"], "succeeded": True} for doc in documents]
+
+    async def delete_documents(self, documents: List[Dict[str, Any]]):
+        await self._latency()
+        for doc in documents:
+            self.docs.pop(doc["id"], None)
+        return [{"key": doc["id"], "succeeded": True} for doc in documents]
+
+    async def get_document_count(self) -> int:
+        return len(self.docs)
+
+    async def search(
+        self,
+        search_text: Optional[str] = None,
+        vector_queries: Optional[List[Any]] = None,
+        filter: Optional[str] = None,
+        top: Optional[int] = None,
+        select: Optional[List[str]] = None,
+        order_by: Optional[List[str]] = None,
+        **kwargs,
+    ):
+        await self._latency()
+        predicate = compile_filter(filter) if filter else None
+        docs = [doc for doc in self.docs.values() if predicate is None or predicate(doc)]
+        for clause in reversed(order_by or []):
+            field, _, direction = clause.partition(" ")
+            docs.sort(key=lambda doc: doc.get(field), reverse=direction.strip().lower() == "desc")
+        if vector_queries:
+            query = vector_queries[0]
+            vector = query["vector"] if isinstance(query, Mapping) else query.vector
+            k = (query.get("k") if isinstance(query, Mapping) else query.k_nearest_neighbors) or top
+            q = np.asarray(vector, dtype=np.float32)
+            q /= np.linalg.norm(q) or 1.0
+            scored = []
+            for doc in docs:
+                v = np.asarray(doc.get("embedding", []), dtype=np.float32)
+                if v.shape != q.shape:
+                    continue
+                scored.append((float(v @ q) / (float(np.linalg.norm(v)) or 1.0), doc))
+            scored.sort(key=lambda item: item[0], reverse=True)
+            docs = [dict(doc, **{"@search.score": score}) for score, doc in scored[:k]]
+        if top is not None:
+            docs = docs[:top]
+        if select:
+            docs = [{field: doc.get(field) for field in select} for doc in docs]
+
+        async def results():
+            for doc in docs:
+                yield doc
+        return results()
+
+    async def close(self):
+        pass
+
+
+def install_fakes(registry, settings: Optional[FakeSettings] = None) -> Dict[str, Any]:
+    """
+    Route a ClientRegistry's chat, embedding and search clients to the fakes.
+    Returns the created fakes so callers can read their counters.
+    """
+    settings = settings or FakeSettings()
+    fakes: Dict[str, Any] = {"chat": {}, "search": {}, "openai": FakeOpenAIClient(settings)}
+
+    def chat_client(deployment: str) -> FakeChatCompletionClient:
+        if deployment not in fakes["chat"]:
+            fakes["chat"][deployment] = FakeChatCompletionClient(deployment, settings)
+        return fakes["chat"][deployment]
+
+    def openai_client(api_version: str, max_retries: int = 0) -> FakeOpenAIClient:
+        return fakes["openai"]
+
+    async def search_client(index_name: str) -> FakeSearchClient:
+        if index_name not in fakes["search"]:
+            fakes["search"][index_name] = FakeSearchClient(index_name, settings)
+        return fakes["search"][index_name]
+
+    registry.chat_client = chat_client
+    registry.openai_client = openai_client
+    registry.search_client = search_client
+    return fakes
@@ -0,0 +1,250 @@
+"""
+Load driver for /ws/chat: opens N concurrent sessions, replays scripted conversations and reports
+session-setup time, time-to-first-event, turn latency percentiles, events/s and peak RSS.
+Results are written as JSON and can be compared against a previous run.
+
+    cd src && python -m benchmarks.load_driver --spawn --sessions 20
+    cd src && python -m benchmarks.load_driver --spawn --sessions 20 --baseline benchmarks/results/<previous>.json
+
+Session setup runs from connecting until the server's "session_ready" frame, i.e. until the team is
+built or reattached. A "turn" runs from sending a user message until the service asks for input again.
+Peak RSS of the server is only known with --spawn.
+"""
+from typing import Any, Dict, List, Optional
+import argparse
+import asyncio
+import json
+import math
+import os
+import resource
+import sys
+import time
+import aiohttp
+import websockets
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SCRIPT = os.path.join(HERE, "scripts", "default.jsonl")
+DEFAULT_RESULTS = os.path.join(HERE, "results")
+
+# Metric -> True when lower is better
+COMPARED_METRICS = {
+    "session_setup_s.p95": True,
+    "time_to_first_event_s.p95": True,
+    "turn_latency_s.p50": True,
+    "turn_latency_s.p95": True,
+    "turn_latency_s.p99": True,
+    "events_per_s": False,
+    "server_peak_rss_mb": True,
+}
+
+
+def load_scripts(path: str) -> List[Dict[str, Any]]:
+    """One conversation per line: {"name": ..., "turns": ["user message", ...]}."""
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"count": 0, "mean": None, "p50": None, "p90": None, "p95": None, "p99": None, "max": None}
+    ordered = sorted(values)
+
+    def rank(p):
+        # Nearest-rank percentile
+        return ordered[max(math.ceil(p / 100 * len(ordered)), 1) - 1]
+    return {
+        "count": len(ordered),
+        "mean": sum(ordered) / len(ordered),
+        "p50": rank(50),
+        "p90": rank(90),
+        "p95": rank(95),
+        "p99": rank(99),
+        "max": ordered[-1],
+    }
+
+
+def peak_rss_mb(who: int) -> float:
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+async def run_session(url: str, session_id: str, script: Dict[str, Any], mode: str, turn_timeout: float) -> Dict[str, Any]:
+    result = {"session_id": session_id, "script": script.get("name"), "events": 0, "turn_latencies": [], "error": None}
+    turns = iter(script["turns"])
+    started = time.perf_counter()
+    try:
+        async with websockets.connect(f"{url}?session_id={session_id}&mode={mode}", max_size=None) as ws:
+            # Setup ends when the server has built (or reattached) the session, not when the socket opens
+            while True:
+                frame = json.loads(await asyncio.wait_for(ws.recv(), turn_timeout))
+                if frame.get("type") == "session_ready":
+                    break
+            opened = time.perf_counter()
+            result["setup_s"] = opened - started
+            turn_started = None
+
+            async def send_next():
+                text = next(turns, None)
+                if text is not None:
+                    await ws.send(json.dumps({"content": text}))
+                return text
+
+            while True:
+                frame = await asyncio.wait_for(ws.recv(), turn_timeout)
+                now = time.perf_counter()
+                result["events"] += 1
+                if "first_event_s" not in result:
+                    result["first_event_s"] = now - opened
+                event = json.loads(frame)
+                content = str(event.get("content", ""))
+                waiting = event.get("type") == "system" and content == "WAITING FOR USER INPUT"
+                ended = event.get("type") == "system" and content.startswith("Conversation ended")
+                if (waiting or ended) and turn_started is not None:
+                    result["turn_latencies"].append(now - turn_started)
+                    turn_started = None
+                if ended:
+                    break
+                if waiting:
+                    if await send_next() is None:
+                        break
+                    turn_started = time.perf_counter()
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["duration_s"] = time.perf_counter() - started
+    return result
+
+
+async def wait_for_server(http_url: str, timeout: float):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while True:
+            try:
+                async with session.get(f"{http_url}/health") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Server at {http_url} did not become healthy within {timeout:.0f}s")
+            await asyncio.sleep(0.5)
+
+
+async def run_load(args) -> Dict[str, Any]:
+    scripts = load_scripts(args.script)
+    url = f"ws://{args.host}:{args.port}/ws/chat"
+    http_url = f"http://{args.host}:{args.port}"
+    server = None
+    if args.spawn:
+        server = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "benchmarks.server", "--host", args.host, "--port", str(args.port),
+            cwd=os.path.dirname(HERE),
+        )
+    try:
+        await wait_for_server(http_url, args.startup_timeout)
+        started = time.perf_counter()
+        tasks = []
+        for i in range(args.sessions):
+            tasks.append(asyncio.create_task(
+                run_session(url, f"bench-{i}", scripts[i % len(scripts)], args.mode, args.turn_timeout)
+            ))
+            if args.ramp > 0:
+                await asyncio.sleep(args.ramp)
+        sessions = await asyncio.gather(*tasks)
+        wall = time.perf_counter() - started
+    finally:
+        if server is not None:
+            server.terminate()
+            await server.wait()
+
+    events = sum(s["events"] for s in sessions)
+    return {
+        "sessions": len(sessions),
+        "errors": sum(1 for s in sessions if s["error"]),
+        "error_samples": [s["error"] for s in sessions if s["error"]][:5],
+        "wall_s": wall,
+        "events": events,
+        "events_per_s": events / wall if wall else 0.0,
+        "turns": sum(len(s["turn_latencies"]) for s in sessions),
+        "session_setup_s": percentiles([s["setup_s"] for s in sessions if "setup_s" in s]),
+        "time_to_first_event_s": percentiles([s["first_event_s"] for s in sessions if "first_event_s" in s]),
+        "turn_latency_s": percentiles([t for s in sessions for t in s["turn_latencies"]]),
+        # Only waited-for children count, so this is the spawned server's peak
+        "server_peak_rss_mb": peak_rss_mb(resource.RUSAGE_CHILDREN) if args.spawn else None,
+        "driver_peak_rss_mb": peak_rss_mb(resource.RUSAGE_SELF),
+    }
+
+
+def metric(metrics: Dict[str, Any], path: str) -> Optional[float]:
+    value: Any = metrics
+    for part in path.split("."):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Print the change of each compared metric; returns the ones that regressed by more than `tolerance`."""
+    regressions = []
+    print(f"\n{'metric':<28} {'baseline':>12} {'current':>12} {'change':>9}")
+    for path, lower_is_better in COMPARED_METRICS.items():
+        old, new = metric(baseline, path), metric(current, path)
+        if old is None or new is None:
+            continue
+        change = (new - old) / old if old else 0.0
+        worse = change > tolerance if lower_is_better else change < -tolerance
+        print(f"{path:<28} {old:>12.4f} {new:>12.4f} {change:>+8.1%}{'  REGRESSION' if worse else ''}")
+        if worse:
+            regressions.append(path)
+    return regressions
+
+
+def report(metrics: Dict[str, Any]):
+    print(f"sessions={metrics['sessions']} errors={metrics['errors']} turns={metrics['turns']} "
+          f"wall={metrics['wall_s']:.1f}s events/s={metrics['events_per_s']:.1f}")
+    for name in ("session_setup_s", "time_to_first_event_s", "turn_latency_s"):
+        p = metrics[name]
+        if p["count"]:
+            print(f"{name:<24} p50={p['p50']:.3f} p90={p['p90']:.3f} p95={p['p95']:.3f} p99={p['p99']:.3f} max={p['max']:.3f}")
+    if metrics["server_peak_rss_mb"] is not None:
+        print(f"server peak RSS {metrics['server_peak_rss_mb']:.0f} MB")
+    print(f"driver peak RSS {metrics['driver_peak_rss_mb']:.0f} MB")
+    for error in metrics["error_samples"]:
+        print(f"error: {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--spawn", action="store_true", help="start benchmarks.server as a child process")
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--mode", default="selector", choices=["selector", "parallel"])
+    parser.add_argument("--script", default=DEFAULT_SCRIPT)
+    parser.add_argument("--ramp", type=float, default=0.0, help="seconds between session starts")
+    parser.add_argument("--turn-timeout", type=float, default=120.0)
+    parser.add_argument("--startup-timeout", type=float, default=60.0)
+    parser.add_argument("--out", default=DEFAULT_RESULTS, help="directory for the results JSON")
+    parser.add_argument("--label", default="", help="added to the results file name")
+    parser.add_argument("--baseline", help="results JSON of a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative regression")
+    args = parser.parse_args()
+
+    metrics = asyncio.run(run_load(args))
+    report(metrics)
+    os.makedirs(args.out, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(args.out, f"{stamp}{'-' + args.label if args.label else ''}.json")
+    config = {k: v for k, v in vars(args).items() if k not in ("baseline", "out")}
+    config["bench_env"] = {k: v for k, v in os.environ.items() if k.startswith("BENCH_")}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"timestamp": stamp, "config": config, "metrics": metrics}, f, indent=2)
+    print(f"results written to {path}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["metrics"]
+        if compare(metrics, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
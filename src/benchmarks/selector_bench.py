@@ -0,0 +1,64 @@
+"""
+Micro-benchmark for the group chat selector.
+Compares the per-turn cost of a full thread rescan (a new HumanInTheLoopRouter for every turn)
+with one incremental HumanInTheLoopRouter per team as the conversation grows.
+
+    cd src && python -m benchmarks.selector_bench
+"""
+import argparse
+import time
+from autogen_agentchat.messages import TextMessage
+from workflow.agent_selectors import DEFAULT_AGENTS, HumanInTheLoopRouter, make_human_in_the_loop_selector
+
+LINES = [
+    "Here is what I found in the profile.",
+    "SkillAgent, please compare these skills with the target role.",
+    "The main gaps are cloud and data pipelines.",
+    "Could you tell me which city you want to work in?",
+]
+
+
+def make_thread(length):
+    thread = [TextMessage(source="user", content="I want to move into data engineering.")]
+    for i in range(1, length):
+        thread.append(TextMessage(source=DEFAULT_AGENTS[i % len(DEFAULT_AGENTS)], content=LINES[i % len(LINES)]))
+    return thread
+
+
+def full_rescan(messages):
+    return HumanInTheLoopRouter().select(messages)
+
+
+def per_turn_us(selector, thread, warmup):
+    # Replay the conversation one turn at a time, timing only the turns after `warmup`. One list grows
+    # in place, as the group chat's own thread does, so no copying lands inside the timed loop
+    history = []
+    for message in thread[:warmup]:
+        history.append(message)
+        selector(history)
+    elapsed = 0.0
+    for message in thread[warmup:]:
+        history.append(message)
+        start = time.perf_counter()
+        selector(history)
+        elapsed += time.perf_counter() - start
+    return elapsed / (len(thread) - warmup) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lengths", default="50,500,2000", help="comma-separated thread lengths")
+    parser.add_argument("--turns", type=int, default=50, help="turns timed at the end of each thread")
+    args = parser.parse_args()
+    print(f"{'thread':>8} {'full scan us/turn':>18} {'incremental us/turn':>20}")
+    for length in (int(n) for n in args.lengths.split(",")):
+        thread = make_thread(length)
+        warmup = max(length - args.turns, 0)
+        full = per_turn_us(full_rescan, thread, warmup)
+        # The router is stateful: it sees every turn, but only the last `turns` are timed
+        incremental = per_turn_us(make_human_in_the_loop_selector(), thread, warmup)
+        print(f"{length:>8} {full:>18.1f} {incremental:>20.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Runs api.main with Azure OpenAI, Azure Search and the Brave MCP server replaced by local fakes.
+
+    cd src && python -m benchmarks.server --port 8765
+
+Latency and response-size distributions come from the BENCH_* variables (see benchmarks.fakes).
+"""
+import argparse
+import logging
+import os
+import sys
+
+STUB_MCP_SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stub_mcp_server.py")
+
+# Settings the service reads at import or startup; real values in the environment still win
+BENCH_ENV = {
+    "AZURE_OPENAI_DEPLOYMENT": "bench-agent",
+    "AZURE_OPENAI_TOOL_DEPLOYMENT": "bench-tool",
+    "AZURE_OPENAI_EMBEDDING_DEPLOYMENT": "bench-embedding",
+    "AZURE_SEARCH_INDEX_CORE": "bench-core",
+    "AZURE_SEARCH_INDEX_PROFILE": "bench-profile",
+    "PROFILE_FILTERABLE_FIELDS": "user_id,session_id,doc_type",
+    "MCP_WEB_SEARCH_COMMAND": sys.executable,
+    "MCP_WEB_SEARCH_ARGS": STUB_MCP_SERVER,
+    "EMBEDDING_CACHE_PATH": "",
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--log-level", default="warning")
+    args = parser.parse_args()
+
+    for name, value in BENCH_ENV.items():
+        os.environ.setdefault(name, value)
+    logging.basicConfig(level=args.log_level.upper())
+
+    import uvicorn
+    from benchmarks.fakes import FakeSettings, install_fakes
+    from common.clients import get_client_registry
+    from api.main import app
+
+    settings = FakeSettings()
+    install_fakes(get_client_registry(), settings)
+    logging.getLogger("BenchServer").warning(f"Serving api.main with fakes: {settings.as_dict()}")
+    uvicorn.run(app, host=args.host, port=args.port, log_level=args.log_level)
+
+
+if __name__ == "__main__":
+    main()
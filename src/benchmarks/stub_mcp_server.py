@@ -0,0 +1,36 @@
+"""
+Stub stdio MCP server exposing a `brave_web_search` tool with canned results and configurable latency
+(BENCH_MCP_LATENCY_MS, BENCH_MCP_LATENCY_SIGMA). Point the service at it with:
+
+    MCP_WEB_SEARCH_COMMAND=python
+    MCP_WEB_SEARCH_ARGS=/path/to/src/benchmarks/stub_mcp_server.py
+"""
+import asyncio
+import math
+import os
+import random
+from mcp.server.fastmcp import FastMCP
+
+server = FastMCP("brave-search-stub")
+_rng = random.Random(int(os.getenv("BENCH_SEED", "0")))
+_latency_ms = float(os.getenv("BENCH_MCP_LATENCY_MS", "200"))
+_latency_sigma = float(os.getenv("BENCH_MCP_LATENCY_SIGMA", "0.4"))
+
+
+@server.tool()
+async def brave_web_search(query: str, count: int = 10, offset: int = 0) -> str:
+    """Performs a web search using the Brave Search API (stubbed for benchmarks)."""
+    if _latency_ms > 0:
+        await asyncio.sleep(_rng.lognormvariate(math.log(_latency_ms), _latency_sigma) / 1000)
+    results = []
+    for i in range(offset, offset + min(count, 20)):
+        results.append(
+            f"Title: {query.title()} - result {i + 1}\n"
+            f"Description: Stub search result {i + 1} for '{query}'.\n"
+            f"URL: https://example.com/search/{i + 1}"
+        )
+    return "\n\n".join(results)
+
+
+if __name__ == "__main__":
+    server.run()
@@ -0,0 +1,177 @@
+from typing import Any, Dict, Optional, Tuple
+import asyncio
+import logging
+import os
+import aiohttp
+import httpx
+from openai import AsyncAzureOpenAI
+from autogen_ext.models.openai import AzureOpenAIChatCompletionClient
+from azure.core.credentials import AzureKeyCredential
+from azure.core.pipeline.transport import AioHttpTransport
+from azure.search.documents.aio import SearchClient
+
+logger = logging.getLogger("ClientRegistry")
+
+
+class ConnectionStats:
+    """Request and connection counters for one pooled HTTP client."""
+    def __init__(self):
+        self.requests = 0
+        self.new_connections = 0
+
+    @property
+    def reused_connections(self) -> int:
+        return max(self.requests - self.new_connections, 0)
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "requests": self.requests,
+            "new_connections": self.new_connections,
+            "reused_connections": self.reused_connections,
+            "reuse_rate": self.reused_connections / self.requests if self.requests else 0.0,
+        }
+
+
+class ClientRegistry:
+    """
+    Process-wide registry of Azure OpenAI and Azure Search clients.
+    Clients are created lazily and shared by every agent and session: one keep-alive
+    connection pool per endpoint, one chat client per deployment, one SearchClient per index.
+    """
+    def __init__(self, max_connections: int = None, max_keepalive: int = None, keepalive_expiry: float = None):
+        self.max_connections = max_connections or int(os.getenv("HTTP_POOL_MAX_CONNECTIONS", "100"))
+        self.max_keepalive = max_keepalive or int(os.getenv("HTTP_POOL_MAX_KEEPALIVE", "20"))
+        self.keepalive_expiry = keepalive_expiry or float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+        self.stats_by_pool: Dict[str, ConnectionStats] = {}
+        self._http_clients: Dict[str, httpx.AsyncClient] = {}
+        self._chat_clients: Dict[Tuple[str, str], AzureOpenAIChatCompletionClient] = {}
+        self._openai_clients: Dict[Tuple[str, str, int], AsyncAzureOpenAI] = {}
+        self._search_session: Optional[aiohttp.ClientSession] = None
+        self._search_clients: Dict[Tuple[str, str], SearchClient] = {}
+        self._lock = asyncio.Lock()
+
+    def http_client(self, endpoint: str) -> httpx.AsyncClient:
+        """Shared httpx pool for an Azure OpenAI endpoint."""
+        if endpoint not in self._http_clients:
+            stats = self.stats_by_pool.setdefault(f"openai:{endpoint}", ConnectionStats())
+
+            async def trace(event_name, info):
+                if event_name == "connection.connect_tcp.complete":
+                    stats.new_connections += 1
+
+            async def on_request(request: httpx.Request):
+                stats.requests += 1
+                request.extensions["trace"] = trace
+
+            self._http_clients[endpoint] = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive,
+                    keepalive_expiry=self.keepalive_expiry,
+                ),
+                timeout=httpx.Timeout(600.0, connect=10.0),
+                event_hooks={"request": [on_request]},
+            )
+        return self._http_clients[endpoint]
+
+    def chat_client(self, deployment: str) -> AzureOpenAIChatCompletionClient:
+        endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
+        key = (endpoint, deployment)
+        if key not in self._chat_clients:
+            self._chat_clients[key] = AzureOpenAIChatCompletionClient(
+                azure_deployment=deployment,
+                model=deployment,
+                api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
+                azure_endpoint=endpoint,
+                api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+                http_client=self.http_client(endpoint),
+                # Retries go through the LLM scheduler, which backs off the whole deployment
+                max_retries=0,
+            )
+        return self._chat_clients[key]
+
+    def openai_client(self, api_version: str, max_retries: int = 0) -> AsyncAzureOpenAI:
+        """
+        Raw Azure OpenAI client (used for embeddings) on the same shared pool.
+        SDK retries are off unless asked for, since scheduled callers retry through the LLM scheduler.
+        """
+        endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
+        key = (endpoint, api_version, max_retries)
+        if key not in self._openai_clients:
+            self._openai_clients[key] = AsyncAzureOpenAI(
+                api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+                azure_endpoint=endpoint,
+                api_version=api_version,
+                http_client=self.http_client(endpoint),
+                max_retries=max_retries,
+            )
+        return self._openai_clients[key]
+
+    async def search_client(self, index_name: str) -> SearchClient:
+        """Shared SearchClient for an index; all indexes share one aiohttp connection pool."""
+        endpoint = os.getenv("AZURE_SEARCH_ENDPOINT")
+        key = (endpoint, index_name)
+        async with self._lock:
+            if key not in self._search_clients:
+                client = SearchClient(
+                    endpoint=endpoint,
+                    index_name=index_name,
+                    credential=AzureKeyCredential(os.getenv("AZURE_SEARCH_KEY")),
+                    transport=AioHttpTransport(session=self._get_search_session(), session_owner=False),
+                )
+                await client.__aenter__()
+                self._search_clients[key] = client
+        return self._search_clients[key]
+
+    def _get_search_session(self) -> aiohttp.ClientSession:
+        if self._search_session is None:
+            stats = self.stats_by_pool.setdefault("search", ConnectionStats())
+
+            async def on_request_start(session, context, params):
+                stats.requests += 1
+
+            async def on_connection_create_end(session, context, params):
+                stats.new_connections += 1
+
+            trace_config = aiohttp.TraceConfig()
+            trace_config.on_request_start.append(on_request_start)
+            trace_config.on_connection_create_end.append(on_connection_create_end)
+            self._search_session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=self.keepalive_expiry),
+                trace_configs=[trace_config],
+            )
+        return self._search_session
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            # Configured per-pool limits; the search pool uses max_connections and keepalive_expiry
+            "limits": {
+                "max_connections": self.max_connections,
+                "max_keepalive_connections": self.max_keepalive,
+                "keepalive_expiry_s": self.keepalive_expiry,
+            },
+            "pools": {name: stats.as_dict() for name, stats in self.stats_by_pool.items()},
+        }
+
+    async def close(self):
+        for client in self._search_clients.values():
+            await client.close()
+        self._search_clients.clear()
+        if self._search_session is not None:
+            await self._search_session.close()
+            self._search_session = None
+        for client in self._http_clients.values():
+            await client.aclose()
+        self._http_clients.clear()
+        self._chat_clients.clear()
+        self._openai_clients.clear()
+
+
+_registry: Optional[ClientRegistry] = None
+
+
+def get_client_registry() -> ClientRegistry:
+    global _registry
+    if _registry is None:
+        _registry = ClientRegistry()
+    return _registry
@@ -0,0 +1,261 @@
+from bisect import bisect_left
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, List, Optional, Tuple
+import logging
+import os
+import time
+
+logger = logging.getLogger("Metrics")
+
+# Seconds; covers a cached lookup up to a long multi-tool completion
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+LabelKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+_session: ContextVar[Optional[str]] = ContextVar("metrics_session", default=None)
+_agent: ContextVar[Optional[str]] = ContextVar("metrics_agent", default=None)
+_usage: ContextVar[Optional["Usage"]] = ContextVar("metrics_usage", default=None)
+
+
+def bind_session(session_id: Optional[str]):
+    """Tag spans recorded by the current task (and tasks it creates) with `session_id`."""
+    return _session.set(session_id)
+
+
+def bind_agent(agent: Optional[str]):
+    """Tag spans recorded from here on in the current task with `agent` (set by the per-agent model client)."""
+    return _agent.set(agent)
+
+
+def bind_usage(usage: Optional["Usage"]):
+    """Add the tokens of model calls made by the current task (and tasks it creates) to `usage`."""
+    return _usage.set(usage)
+
+
+def current_session() -> Optional[str]:
+    return _session.get()
+
+
+def current_agent() -> Optional[str]:
+    return _agent.get()
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus layout."""
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Usage:
+    """Token totals per deployment for one unit of work, e.g. a batch job."""
+    __slots__ = ("deployments", "calls")
+
+    def __init__(self):
+        self.deployments: Dict[str, List[int]] = {}
+        self.calls = 0
+
+    def add(self, deployment: Optional[str], prompt: int, completion: int):
+        totals = self.deployments.setdefault(deployment or "", [0, 0])
+        totals[0] += prompt
+        totals[1] += completion
+        self.calls += 1
+
+    @property
+    def prompt_tokens(self) -> int:
+        return sum(totals[0] for totals in self.deployments.values())
+
+    @property
+    def completion_tokens(self) -> int:
+        return sum(totals[1] for totals in self.deployments.values())
+
+
+class Span:
+    """
+    Timing of one operation. Use as a context manager; tokens and cache results can be attached
+    before it exits. Labels become Prometheus labels; session and agent come from the context.
+    """
+    __slots__ = ("registry", "kind", "name", "labels", "started", "wall_started", "prompt_tokens", "completion_tokens", "cache_hit")
+
+    def __init__(self, registry: "MetricsRegistry", kind: str, name: str, labels: Dict[str, Any]):
+        self.registry = registry
+        self.kind = kind
+        self.name = name
+        self.labels = labels
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cache_hit: Optional[bool] = None
+
+    def tokens(self, prompt: int = 0, completion: int = 0):
+        self.prompt_tokens += prompt or 0
+        self.completion_tokens += completion or 0
+
+    def cached(self, hit: bool):
+        self.cache_hit = hit
+
+    def __enter__(self) -> "Span":
+        self.wall_started = time.time()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry.finish(self, time.perf_counter() - self.started, exc)
+        return False
+
+
+class MetricsRegistry:
+    """
+    In-process span aggregation: one histogram per (kind, name, labels) plus token, cache and
+    error counters, rendered in the Prometheus text format. With tracing on, the latest spans
+    of recent sessions are also kept for per-session dumps.
+    """
+    def __init__(self, enabled: bool = None, trace: bool = None, trace_max_spans: int = None, trace_max_sessions: int = None):
+        self.enabled = enabled if enabled is not None else os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+        self.trace_enabled = trace if trace is not None else os.getenv("METRICS_TRACE", "").lower() in ("1", "true", "yes")
+        self.trace_max_spans = trace_max_spans or int(os.getenv("METRICS_TRACE_MAX_SPANS", "2000"))
+        self.trace_max_sessions = trace_max_sessions or int(os.getenv("METRICS_TRACE_MAX_SESSIONS", "200"))
+        self.histograms: Dict[LabelKey, Histogram] = {}
+        self.counters: Dict[LabelKey, float] = {}
+        self.gauges: Dict[LabelKey, float] = {}
+        self.traces: "OrderedDict[str, Deque[Dict[str, Any]]]" = OrderedDict()
+        self._help: Dict[str, Tuple[str, str]] = {}
+
+    def span(self, kind: str, name: str, **labels) -> Span:
+        if "agent" not in labels:
+            labels["agent"] = _agent.get()
+        return Span(self, kind, name, labels)
+
+    def observe(self, metric: str, value: float, labels: Dict[str, Any], help: str = ""):
+        key = self._key(metric, labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+            self._help.setdefault(metric, ("histogram", help))
+        histogram.observe(value)
+
+    def inc(self, metric: str, labels: Dict[str, Any], value: float = 1, help: str = ""):
+        key = self._key(metric, labels)
+        if key not in self.counters:
+            self._help.setdefault(metric, ("counter", help))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, metric: str, labels: Dict[str, Any], value: float, help: str = ""):
+        key = self._key(metric, labels)
+        if key not in self.gauges:
+            self._help.setdefault(metric, ("gauge", help))
+        self.gauges[key] = value
+
+    def cache(self, kind: str, name: str, hit: bool, count: int = 1):
+        if self.enabled and count:
+            self.inc(
+                "career_coach_cache_requests_total",
+                {"kind": kind, "name": name, "result": "hit" if hit else "miss"},
+                count,
+                "Cache lookups by result",
+            )
+
+    def finish(self, span: Span, duration: float, error: Optional[BaseException]):
+        usage = _usage.get()
+        # Completions served from a cache are free
+        if usage is not None and span.kind == "model" and not span.cache_hit and (span.prompt_tokens or span.completion_tokens):
+            usage.add(span.labels.get("deployment"), span.prompt_tokens, span.completion_tokens)
+        if not self.enabled:
+            return
+        labels = {"kind": span.kind, "name": span.name, **span.labels}
+        self.observe("career_coach_span_seconds", duration, labels, "Duration of model calls, tool calls, memory, embedding and selector operations")
+        if error is not None:
+            self.inc("career_coach_span_errors_total", labels, 1, "Operations that raised")
+        if span.prompt_tokens:
+            self.inc("career_coach_tokens_total", {**labels, "type": "prompt"}, span.prompt_tokens, "Model tokens")
+        if span.completion_tokens:
+            self.inc("career_coach_tokens_total", {**labels, "type": "completion"}, span.completion_tokens, "Model tokens")
+        if span.cache_hit is not None:
+            self.cache(span.kind, span.name, span.cache_hit)
+        session = _session.get()
+        if self.trace_enabled and session is not None:
+            self._trace(session, {
+                **labels,
+                "start": span.wall_started,
+                "duration_s": duration,
+                "prompt_tokens": span.prompt_tokens,
+                "completion_tokens": span.completion_tokens,
+                "cache_hit": span.cache_hit,
+                "error": repr(error) if error is not None else None,
+            })
+
+    def _trace(self, session: str, record: Dict[str, Any]):
+        spans = self.traces.get(session)
+        if spans is None:
+            spans = self.traces[session] = deque(maxlen=self.trace_max_spans)
+            while len(self.traces) > self.trace_max_sessions:
+                self.traces.popitem(last=False)
+        else:
+            self.traces.move_to_end(session)
+        spans.append(record)
+
+    def trace(self, session_id: str) -> Optional[List[Dict[str, Any]]]:
+        spans = self.traces.get(session_id)
+        return list(spans) if spans is not None else None
+
+    @staticmethod
+    def _key(metric: str, labels: Dict[str, Any]) -> LabelKey:
+        return metric, tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+        families: Dict[str, List[str]] = {}
+        for (metric, labels), histogram in sorted(self.histograms.items()):
+            out = families.setdefault(metric, [])
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                out.append(f"{metric}_bucket{_labels(labels, ('le', repr(bound)))} {cumulative}")
+            out.append(f"{metric}_bucket{_labels(labels, ('le', '+Inf'))} {histogram.count}")
+            out.append(f"{metric}_sum{_labels(labels)} {histogram.sum}")
+            out.append(f"{metric}_count{_labels(labels)} {histogram.count}")
+        for (metric, labels), value in sorted(list(self.counters.items()) + list(self.gauges.items())):
+            families.setdefault(metric, []).append(f"{metric}{_labels(labels)} {value}")
+        for metric, samples in families.items():
+            type_, help = self._help.get(metric, ("untyped", ""))
+            if help:
+                lines.append(f"# HELP {metric} {help}")
+            lines.append(f"# TYPE {metric} {type_}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: Tuple[Tuple[str, str], ...], extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+_metrics: Optional[MetricsRegistry] = None
+
+
+def get_metrics() -> MetricsRegistry:
+    global _metrics
+    if _metrics is None:
+        _metrics = MetricsRegistry()
+    return _metrics
+
+
+def span(kind: str, name: str, **labels) -> Span:
+    """Shorthand for get_metrics().span(...)."""
+    return get_metrics().span(kind, name, **labels)
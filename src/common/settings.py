@@ -0,0 +1,20 @@
+from typing import Optional
+import os
+
+
+def keyed_setting(name: str, key: Optional[str], default: float) -> float:
+    """
+    Numeric setting that is either one value ("16") or per key ("gpt-4o=32,gpt-4o-mini=64,*=16"),
+    where the key is whatever the caller scopes it by (a deployment, an index name).
+    """
+    raw = os.getenv(name, "").strip()
+    if not raw:
+        return default
+    if "=" not in raw:
+        return float(raw)
+    values = {}
+    for item in raw.split(","):
+        k, _, value = item.partition("=")
+        if k.strip() and value.strip():
+            values[k.strip()] = float(value)
+    return values.get(key or "", values.get("*", default))
@@ -37,15 +37,30 @@ function App() {
     ws.onmessage = (event) => {
       try {
         const data = JSON.parse(event.data);
-        setChatLog((log) => [
-          ...log,
-          {
-            sender: data.agent || "agent",
+        // Handshake frame for clients that wait for the session to be built
+        if (data.type === "session_ready") return;
+        const sender = data.agent || "agent";
+        setChatLog((log) => {
+          const last = log[log.length - 1];
+          const streaming = last && last.streaming && last.sender === sender;
+          // Token frames grow the agent's current bubble; the final message replaces it
+          if (data.type === "token") {
+            if (streaming) {
+              return [...log.slice(0, -1), { ...last, content: last.content + data.content }];
+            }
+            return [...log, { sender, content: data.content, streaming: true }];
+          }
+          const entry = {
+            sender,
             content: data.content,
             tool: data.tool,
             handoff: data.handoff,
-          },
-        ]);
+          };
+          if (data.type === "message" && streaming) {
+            return [...log.slice(0, -1), entry];
+          }
+          return [...log, entry];
+        });
       } catch {
         setChatLog((log) => [
           ...log,
@@ -0,0 +1,141 @@
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import logging
+import mmap
+import os
+import struct
+
+logger = logging.getLogger("EmbeddingCache")
+
+# On-disk record: 32-byte sha256 key, uint32 dimension, then `dimension` float32 values
+_HEADER = struct.Struct("<32sI")
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache keyed by sha256(deployment, text).
+    Keeps a bounded in-memory LRU and, when `path` is set, an append-only store that is
+    memory-mapped on open so embeddings survive restarts without being loaded up front.
+    """
+    def __init__(self, capacity: int = 10000, path: Optional[str] = None):
+        self.capacity = capacity
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._lru: "OrderedDict[bytes, List[float]]" = OrderedDict()
+        self._offsets: Dict[bytes, Tuple[int, int]] = {}
+        self._file = None
+        self._mmap: Optional[mmap.mmap] = None
+        if path:
+            self._open_store(path)
+
+    @staticmethod
+    def key(deployment: Optional[str], text: str) -> bytes:
+        return hashlib.sha256(f"{deployment}\x00{text}".encode("utf-8")).digest()
+
+    def get(self, key: bytes) -> Optional[List[float]]:
+        embedding = self._lru.get(key)
+        if embedding is not None:
+            self._lru.move_to_end(key)
+            self.hits += 1
+            return embedding
+        embedding = self._read_record(key)
+        if embedding is not None:
+            self._remember(key, embedding)
+            self.hits += 1
+            self.disk_hits += 1
+            return embedding
+        self.misses += 1
+        return None
+
+    def put(self, key: bytes, embedding: List[float]):
+        self._remember(key, embedding)
+        if self._file is not None and key not in self._offsets:
+            offset = self._file.tell()
+            self._file.write(_HEADER.pack(key, len(embedding)))
+            self._file.write(array("f", embedding).tobytes())
+            self._offsets[key] = (offset + _HEADER.size, len(embedding))
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "memory_entries": len(self._lru),
+            "disk_entries": len(self._offsets),
+        }
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _remember(self, key: bytes, embedding: List[float]):
+        self._lru[key] = embedding
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.capacity:
+            self._lru.popitem(last=False)
+
+    def _open_store(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "a+b")
+        self._file.seek(0, os.SEEK_END)
+        size = self._file.tell()
+        if size:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            valid = self._scan(size)
+            if valid < size:
+                # Drop a record truncated by a crash mid-write
+                logger.warning(f"Truncating {size - valid} trailing bytes in embedding cache {path}")
+                self._mmap.close()
+                self._mmap = None
+                self._file.truncate(valid)
+                if valid:
+                    self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._file.seek(0, os.SEEK_END)
+        logger.info(f"Opened embedding cache {path} with {len(self._offsets)} entries")
+
+    def _scan(self, size: int) -> int:
+        offset = 0
+        while offset + _HEADER.size <= size:
+            key, dim = _HEADER.unpack_from(self._mmap, offset)
+            end = offset + _HEADER.size + dim * 4
+            if end > size:
+                break
+            self._offsets[key] = (offset + _HEADER.size, dim)
+            offset = end
+        return offset
+
+    def _read_record(self, key: bytes) -> Optional[List[float]]:
+        location = self._offsets.get(key)
+        if location is None:
+            return None
+        start, dim = location
+        end = start + dim * 4
+        if self._mmap is None or end > len(self._mmap):
+            # Written since the file was last mapped
+            self._file.flush()
+            if self._mmap is not None:
+                self._mmap.close()
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return array("f", self._mmap[start:end]).tolist()
+
+
+_cache: Optional[EmbeddingCache] = None
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Process-wide embedding cache configured from the environment; None if disabled."""
+    global _cache
+    capacity = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+    if _cache is None and capacity > 0:
+        _cache = EmbeddingCache(capacity=capacity, path=os.getenv("EMBEDDING_CACHE_PATH") or None)
+    return _cache
@@ -0,0 +1,152 @@
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import logging
+import os
+from memory.embedding_cache import EmbeddingCache, get_embedding_cache
+from common.clients import get_client_registry
+from common.metrics import get_metrics
+
+logger = logging.getLogger("EmbeddingEngine")
+
+
+class EmbeddingEngine:
+    """
+    Async embedding engine for Azure OpenAI.
+    Concurrent embed calls are collected for a short window and sent as multi-input requests,
+    with at most `max_concurrency` requests in flight, so the event loop is never blocked.
+    Texts already in the embedding cache, or already being embedded, cost no extra request.
+    """
+    def __init__(
+        self,
+        deployment: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        batch_window: Optional[float] = None,
+        cache: Optional[EmbeddingCache] = None,
+    ):
+        self.deployment = deployment or os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT")
+        self.batch_size = batch_size or int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+        self.max_concurrency = max_concurrency or int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "4"))
+        self.batch_window = batch_window if batch_window is not None else float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5")) / 1000
+        # Embeddings do not go through the LLM scheduler, so they keep the SDK's own retries
+        self.client = get_client_registry().openai_client(
+            os.getenv("AZURE_OPENAI_EMBEDDING_API_VERSION", "2023-05-15"),
+            max_retries=int(os.getenv("EMBEDDING_MAX_RETRIES", "2")),
+        )
+        self.cache = cache
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # Callers still waiting on each in-flight future; it is only cancelled once this drops to zero
+        self._waiters: Dict[asyncio.Future, int] = {}
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+        self.requests = 0
+
+    async def embed(self, text: str) -> List[float]:
+        return (await self.embed_many([text]))[0]
+
+    async def embed_many(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        loop = asyncio.get_running_loop()
+        futures = []
+        misses = 0
+        for text in texts:
+            # The embeddings endpoint rejects empty strings
+            text = text or " "
+            key = EmbeddingCache.key(self.deployment, text) if self.cache else None
+            cached = self.cache.get(key) if self.cache else None
+            if cached is not None:
+                future = loop.create_future()
+                future.set_result(cached)
+            elif text in self._inflight:
+                future = self._inflight[text]
+            else:
+                misses += 1
+                future = loop.create_future()
+                self._inflight[text] = future
+                future.add_done_callback(lambda f, text=text, key=key: self._on_embedded(text, key, f))
+                self._pending.append((text, future))
+                if len(self._pending) >= self.batch_size:
+                    self._flush()
+            futures.append(future)
+            if not future.done():
+                self._waiters[future] = self._waiters.get(future, 0) + 1
+        if self._pending and self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_window, self._flush)
+        # Cached and in-flight texts cost no request
+        metrics = get_metrics()
+        metrics.cache("embedding", self.deployment or "default", True, len(texts) - misses)
+        metrics.cache("embedding", self.deployment or "default", False, misses)
+        try:
+            # Futures are shared with concurrent callers, so one caller's cancellation must not cancel them
+            return list(await asyncio.gather(*(asyncio.shield(future) for future in futures)))
+        finally:
+            for future in futures:
+                self._release(future)
+
+    def _release(self, future: asyncio.Future):
+        waiters = self._waiters.pop(future, 0) - 1
+        if waiters > 0:
+            self._waiters[future] = waiters
+        elif not future.done():
+            future.cancel()
+
+    def _on_embedded(self, text: str, key: Optional[bytes], future: asyncio.Future):
+        self._inflight.pop(text, None)
+        if self.cache and not future.cancelled() and future.exception() is None:
+            self.cache.put(key, future.result())
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending = self._pending, []
+        for start in range(0, len(pending), self.batch_size):
+            task = asyncio.get_running_loop().create_task(self._send(pending[start:start + self.batch_size]))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: List[Tuple[str, asyncio.Future]]):
+        # Texts every caller gave up on before the flush are not sent
+        batch = [(text, future) for text, future in batch if not future.done()]
+        if not batch:
+            return
+        # Identical texts in one batch are only sent once
+        unique: Dict[str, int] = {}
+        for text, _ in batch:
+            unique.setdefault(text, len(unique))
+        try:
+            async with self._semaphore:
+                self.requests += 1
+                with get_metrics().span("embedding", "create", deployment=self.deployment):
+                    response = await self.client.embeddings.create(input=list(unique), model=self.deployment)
+        except Exception as e:
+            logger.error(f"Embedding request for {len(unique)} inputs failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        embeddings = {item.index: item.embedding for item in response.data}
+        for text, future in batch:
+            if not future.done():
+                future.set_result(embeddings[unique[text]])
+        logger.debug(f"Embedded {len(unique)} inputs in one request")
+
+    async def close(self):
+        if self._pending:
+            self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+_engines: Dict[Optional[str], EmbeddingEngine] = {}
+
+
+def get_embedding_engine(deployment: Optional[str] = None) -> EmbeddingEngine:
+    """Return the process-wide engine for a deployment, so all VectorMemory instances share one batcher."""
+    deployment = deployment or os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT")
+    if deployment not in _engines:
+        _engines[deployment] = EmbeddingEngine(deployment=deployment, cache=get_embedding_cache())
+    return _engines[deployment]
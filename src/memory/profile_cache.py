@@ -0,0 +1,165 @@
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import json
+import logging
+import os
+import time
+from autogen_core.memory import Memory, MemoryContent, MemoryQueryResult, UpdateContextResult
+from autogen_core.model_context import ChatCompletionContext
+from autogen_core.models import SystemMessage
+from memory.vector_memory import VectorMemory
+from common.metrics import get_metrics
+
+logger = logging.getLogger("ProfileCache")
+
+
+def profile_filterable_fields() -> List[str]:
+    """
+    Metadata keys promoted to top-level fields in the profile index (PROFILE_FILTERABLE_FIELDS).
+    Opt-in, since the Azure index must declare them as filterable before documents carry them.
+    """
+    return [field.strip() for field in os.getenv("PROFILE_FILTERABLE_FIELDS", "").split(",") if field.strip()]
+
+
+def profile_memory() -> VectorMemory:
+    """VectorMemory over the profile index, writing and filtering on the promoted profile fields."""
+    return VectorMemory(index_name=os.getenv("AZURE_SEARCH_INDEX_PROFILE"), filterable_fields=profile_filterable_fields())
+
+
+class ProfileCache:
+    """
+    Per-process TTL + LRU cache of a user's profile documents (CV chunks).
+    A miss is one keyed lookup on user_id and doc_type; concurrent misses for the same user share it.
+    Indexes that cannot filter on user_id and doc_type return nothing, since an unscoped search
+    would hand this user other users' CVs.
+    """
+    def __init__(self, ttl: float = None, max_entries: int = None, top: int = None):
+        self.ttl = ttl if ttl is not None else float(os.getenv("PROFILE_CACHE_TTL", "300"))
+        self.max_entries = max_entries or int(os.getenv("PROFILE_CACHE_MAX_ENTRIES", "1000"))
+        self.top = top or int(os.getenv("PROFILE_LOOKUP_TOP", "50"))
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[float, List[MemoryContent]]]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, str, str], asyncio.Future] = {}
+        self._unfiltered: set = set()
+
+    async def get(self, memory: VectorMemory, user_id: str, doc_type: str = "cv") -> List[MemoryContent]:
+        key = (memory.index_name, user_id, doc_type)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(key)
+            get_metrics().cache("profile", doc_type, True)
+            return entry[1]
+        if not memory.can_filter("user_id", "doc_type"):
+            if memory.index_name not in self._unfiltered:
+                self._unfiltered.add(memory.index_name)
+                logger.warning(f"Index {memory.index_name} cannot filter on user_id and doc_type; set PROFILE_FILTERABLE_FIELDS=user_id,doc_type")
+            return []
+        get_metrics().cache("profile", doc_type, False)
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            results = await self._fetch(memory, user_id, doc_type)
+            self._put(key, results)
+            future.set_result(results)
+            return results
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting on it
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def _fetch(self, memory: VectorMemory, user_id: str, doc_type: str) -> List[MemoryContent]:
+        result = await memory.lookup(top=self.top, user_id=user_id, doc_type=doc_type)
+        # Documents written before the fields were promoted can still carry other owners' metadata
+        return [
+            item for item in result.results
+            if item.metadata and item.metadata.get("user_id") == user_id and item.metadata.get("doc_type") == doc_type
+        ]
+
+    def _put(self, key: Tuple[str, str, str], results: List[MemoryContent]):
+        self._entries[key] = (time.monotonic() + self.ttl, results)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str):
+        """Forget every cached document type of `user_id` (e.g. after a new CV upload)."""
+        for key in [key for key in self._entries if key[1] == user_id]:
+            del self._entries[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "inflight": len(self._inflight)}
+
+
+def join_cv_chunks(results: List[Any], max_chars: int = 4000) -> str:
+    """Reassemble CV chunks (MemoryContent or dicts) in document order, up to `max_chars`."""
+    def field(item, name):
+        return item.get(name) if isinstance(item, dict) else getattr(item, name, None)
+
+    def chunk_index(item):
+        metadata = field(item, "metadata") or {}
+        if isinstance(metadata, str):
+            try:
+                metadata = json.loads(metadata)
+            except ValueError:
+                metadata = {}
+        return metadata.get("chunk", 0) if isinstance(metadata, dict) else 0
+    text = "\n\n".join(str(field(item, "content")) for item in sorted(results, key=chunk_index))
+    return text if len(text) <= max_chars else text[:max_chars] + "..."
+
+
+class ProfileMemory(Memory):
+    """
+    Per-session memory for ProfilerAgent: before each model call the user's uploaded CV is looked up
+    through the ProfileCache and added to the agent's model context, once per CV version.
+    """
+    def __init__(self, memory: VectorMemory, user_id: str, cache: Optional[ProfileCache] = None, max_chars: int = 4000):
+        self.memory = memory
+        self.user_id = user_id
+        self.cache = cache or get_profile_cache()
+        self.max_chars = max_chars
+
+    async def update_context(self, model_context: ChatCompletionContext) -> UpdateContextResult:
+        try:
+            result = await self.query()
+        except Exception as e:
+            # The agent can still answer without the CV
+            logger.warning(f"CV lookup for {self.user_id} failed: {e}")
+            return UpdateContextResult(memories=MemoryQueryResult(results=[]))
+        if result.results:
+            content = "The user's uploaded CV:\n\n" + join_cv_chunks(result.results, self.max_chars)
+            # Already there from an earlier turn or a restored snapshot; a new upload changes the text
+            messages = await model_context.get_messages()
+            if not any(isinstance(m, SystemMessage) and m.content == content for m in messages):
+                await model_context.add_message(SystemMessage(content=content))
+        return UpdateContextResult(memories=result)
+
+    async def query(self, query: Any = "", cancellation_token=None, **kwargs) -> MemoryQueryResult:
+        return MemoryQueryResult(results=await self.cache.get(self.memory, self.user_id))
+
+    async def add(self, content: MemoryContent, cancellation_token=None) -> None:
+        """Read-only: CVs are indexed by /upload_cv, so generic Memory.add callers are ignored."""
+        logger.debug(f"Ignoring add to the profile memory of {self.user_id}")
+
+    async def clear(self) -> None:
+        self.cache.invalidate(self.user_id)
+
+    async def close(self) -> None:
+        pass
+
+
+_profile_cache: Optional[ProfileCache] = None
+
+
+def get_profile_cache() -> ProfileCache:
+    global _profile_cache
+    if _profile_cache is None:
+        _profile_cache = ProfileCache()
+    return _profile_cache
@@ -0,0 +1,71 @@
+from typing import Dict, List, Optional
+import asyncio
+import logging
+import os
+import time
+from memory.vector_memory import VectorMemory
+from common.metrics import get_metrics
+from common.settings import keyed_setting
+
+logger = logging.getLogger("VectorRetention")
+
+
+def retention_seconds(index_name: str) -> float:
+    """TTL for an index from VECTOR_RETENTION_SECONDS: one value or per index ("core=2592000,*=0"); 0 keeps everything."""
+    return keyed_setting("VECTOR_RETENTION_SECONDS", index_name, 0.0)
+
+
+class IndexCompactor:
+    """
+    Background retention for vector indexes. Every `interval` seconds each index with a TTL has its
+    expired documents deleted, at most `max_rate` documents per second, and its document count is
+    published as a gauge. Runs one index at a time so compaction never competes with itself.
+    """
+    def __init__(self, memories: List[VectorMemory], interval: float = None, max_rate: float = None):
+        self.memories = [memory for memory in memories if memory.index_name]
+        self.interval = interval or float(os.getenv("VECTOR_COMPACTION_INTERVAL", "3600"))
+        self.max_rate = max_rate if max_rate is not None else float(os.getenv("VECTOR_COMPACTION_MAX_RATE", "200"))
+        self.runs = 0
+        self.deleted: Dict[str, int] = {}
+        self.sizes: Dict[str, int] = {}
+        self.last_run: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if any(retention_seconds(memory.index_name) > 0 for memory in self.memories):
+            self._task = asyncio.create_task(self._loop())
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.compact()
+
+    async def compact(self):
+        metrics = get_metrics()
+        for memory in self.memories:
+            ttl = retention_seconds(memory.index_name)
+            try:
+                if ttl > 0:
+                    deleted = await memory.expire(ttl, max_rate=self.max_rate or None)
+                    self.deleted[memory.index_name] = self.deleted.get(memory.index_name, 0) + deleted
+                    if deleted:
+                        metrics.inc("career_coach_vector_expired_total", {"index": memory.index_name}, deleted, "Documents removed by retention")
+                self.sizes[memory.index_name] = await memory.count()
+                metrics.set("career_coach_vector_index_documents", {"index": memory.index_name}, self.sizes[memory.index_name], "Documents per vector index")
+            except Exception as e:
+                logger.warning(f"Compaction of {memory.index_name} failed: {e}")
+        self.runs += 1
+        self.last_run = time.time()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "runs": self.runs,
+            "last_run": self.last_run,
+            "deleted": dict(self.deleted),
+            "documents": dict(self.sizes),
+        }
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
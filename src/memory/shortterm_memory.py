@@ -1,38 +1,149 @@
-from typing import List, Dict, Any, Optional
-from autogen_core.memory import Memory, MemoryQueryResult
+from collections import deque
+from typing import List, Dict, Any, Optional, Deque
+import math
+import re
+from autogen_core.memory import Memory, MemoryQueryResult, UpdateContextResult
+from autogen_core.model_context import ChatCompletionContext
+from autogen_core.models import SystemMessage
 from typing import override
 
+RECALL_HEADER = "Relevant recent messages:\n"
+
+_WORD = re.compile(r"[a-z0-9][a-z0-9+#.]*")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have i in is it its me my of on or our so that the this to was we were "
+    "what when where which who will with you your".split()
+)
+
+
+def _terms(text: str) -> List[str]:
+    return [t for t in _WORD.findall(text.lower()) if len(t) > 1 and t not in _STOPWORDS]
+
+
+def _is_recall(message) -> bool:
+    return isinstance(message, SystemMessage) and message.content.startswith(RECALL_HEADER)
+
+
 class ShortTermMemory(Memory):
     """
-    Simple FIFO memory for storing messages with optional capacity, compatible with AutoGen BaseMemory interface.
+    FIFO memory for recent messages, compatible with AutoGen BaseMemory interface.
+    Backed by a deque, so adds and evictions are O(1). Capacity is a message count and/or a token total.
+    A keyword index is maintained as messages come and go, so query() ranks recent messages by
+    relevance to the query text. update_context() keeps one recall message in the agent's model
+    context with the messages most relevant to the latest turn, replacing the previous one.
     """
-    def __init__(self, capacity: Optional[int] = None):
-        self._memory: List[Dict[str, Any]] = []
+    def __init__(self, capacity: Optional[int] = None, max_tokens: Optional[int] = None):
+        # Entries are (seq, message, tokens, term counts)
+        self._memory: Deque[tuple] = deque()
         self._capacity = capacity
+        self._max_tokens = max_tokens
+        self._total_tokens = 0
+        self._next_seq = 0
+        # term -> {seq: count in that message}
+        self._index: Dict[str, Dict[int, int]] = {}
 
     @override
     async def add(self, messages: List[Dict[str, Any]]):
         for msg in messages:
-            if self._capacity is not None and len(self._memory) >= self._capacity:
-                self._memory.pop(0)
-            self._memory.append(msg)
+            text = str(msg.get("content", ""))
+            tokens = len(text) // 4 + 1
+            counts: Dict[str, int] = {}
+            for term in _terms(text):
+                counts[term] = counts.get(term, 0) + 1
+            seq = self._next_seq
+            self._next_seq += 1
+            self._memory.append((seq, msg, tokens, counts))
+            self._total_tokens += tokens
+            for term, count in counts.items():
+                self._index.setdefault(term, {})[seq] = count
+            self._evict()
+
+    def _evict(self):
+        # Always keep the newest message, even if it alone exceeds max_tokens
+        while len(self._memory) > 1 and (
+            (self._capacity is not None and len(self._memory) > self._capacity)
+            or (self._max_tokens is not None and self._total_tokens > self._max_tokens)
+        ):
+            seq, _, tokens, counts = self._memory.popleft()
+            self._total_tokens -= tokens
+            for term in counts:
+                postings = self._index[term]
+                del postings[seq]
+                if not postings:
+                    del self._index[term]
 
     @override
     async def query(self, query: str, top_k: int = 5) -> MemoryQueryResult:
-        # For short-term memory, just return the most recent messages (optionally filter by query in the future)
-        results = self._memory[-top_k:] if top_k > 0 else self._memory.copy()
-        return MemoryQueryResult(messages=results)
+        # Rank by keyword relevance with a small recency bonus; fall back to the most recent messages
+        entries = list(self._memory)
+        scores: Dict[int, float] = {}
+        if query and entries:
+            n = len(entries)
+            for term in set(_terms(query)):
+                postings = self._index.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + n / len(postings))
+                for seq, count in postings.items():
+                    scores[seq] = scores.get(seq, 0.0) + (1 + math.log(count)) * idf
+        if scores:
+            first_seq = entries[0][0]
+            newest = self._next_seq - 1
+            ranked = sorted(
+                scores,
+                key=lambda seq: scores[seq] + 0.1 * (seq - first_seq) / max(newest - first_seq, 1),
+                reverse=True,
+            )
+            if top_k > 0:
+                ranked = ranked[:top_k]
+            results = [entries[seq - first_seq][1] for seq in ranked]
+        else:
+            results = [entry[1] for entry in entries]
+            if top_k > 0:
+                results = results[-top_k:]
+        return MemoryQueryResult(results=[
+            {
+                "content": str(msg.get("content", "")),
+                "metadata": {k: v for k, v in msg.items() if k != "content"},
+                "mime_type": "text/plain",
+            }
+            for msg in results
+        ])
 
     @override
     async def clear(self):
-        self._memory = []
+        self._memory.clear()
+        self._index.clear()
+        self._total_tokens = 0
+        self._next_seq = 0
 
     @override
-    async def update_context(self, context: str):
-        self._memory = [{"role": "system", "content": context}] + self._memory
+    async def update_context(self, model_context: ChatCompletionContext, top_k: int = 5) -> UpdateContextResult:
+        # The recall block from the previous inference is stale; drop it rather than stack another.
+        # ChatCompletionContext has no public way to remove a message
+        model_context._messages = [m for m in model_context._messages if not _is_recall(m)]
+        if not self._memory:
+            return UpdateContextResult(memories=MemoryQueryResult(results=[]))
+        messages = await model_context.get_messages()
+        last = messages[-1].content if messages else ""
+        result = await self.query(last if isinstance(last, str) else "", top_k=top_k)
+        if result.results:
+            lines = [f"{i}. {memory.content}" for i, memory in enumerate(result.results, 1)]
+            await model_context.add_message(SystemMessage(content=RECALL_HEADER + "\n".join(lines)))
+        return UpdateContextResult(memories=result)
+
+    async def save_state(self) -> Dict[str, Any]:
+        return {"messages": [entry[1] for entry in self._memory]}
+
+    async def load_state(self, state: Dict[str, Any]):
+        await self.clear()
+        await self.add(state.get("messages", []))
 
     def size(self) -> int:
         return len(self._memory)
-    
+
+    def total_tokens(self) -> int:
+        return self._total_tokens
+
     async def close(self):
-        pass
\ No newline at end of file
+        pass
@@ -0,0 +1,563 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+import asyncio
+import json
+import logging
+import os
+import re
+import numpy as np
+from common.clients import get_client_registry
+
+logger = logging.getLogger("VectorBackend")
+
+
+class VectorBackend:
+    """
+    Storage interface behind VectorMemory. Documents are dicts with `id`, `content`,
+    `embedding` and `metadata` (a JSON string), matching the Azure Search index schema.
+    """
+    # Whether filters can reach into the metadata JSON (otherwise only top-level index fields)
+    filters_metadata = False
+    async def open(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def upload(self, docs: List[Dict[str, Any]]):
+        raise NotImplementedError
+
+    async def search(self, vector: List[float], top_k: int, filter: Optional[str] = None) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def lookup(self, filter: str, top: int, select: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Documents matching `filter`, without any vector scoring."""
+        raise NotImplementedError
+
+    async def delete(self, filter: Optional[str] = None, batch_size: int = 500, max_rate: Optional[float] = None) -> int:
+        """Delete every document matching `filter` (all of them if None); returns how many were deleted."""
+        raise NotImplementedError
+
+    async def count(self) -> int:
+        raise NotImplementedError
+
+    async def clear(self):
+        await self.delete()
+
+
+class AzureSearchBackend(VectorBackend):
+    """
+    Azure Cognitive Search vector index. The SearchClient is shared through the client registry
+    and opened lazily on first use, so memories that are never entered as a context still work.
+    """
+    def __init__(self, index_name: str):
+        self.index_name = index_name
+        self.client = None  # Will be fetched from the registry on first use
+
+    async def open(self):
+        if self.client is None:
+            self.client = await get_client_registry().search_client(self.index_name)
+
+    async def close(self):
+        # The shared client is closed by the registry at shutdown
+        self.client = None
+
+    async def upload(self, docs: List[Dict[str, Any]]):
+        await self.open()
+        await self.client.upload_documents(documents=docs)
+
+    async def search(self, vector: List[float], top_k: int, filter: Optional[str] = None) -> List[Dict[str, Any]]:
+        search_kwargs = {
+            "search_text": "",
+            "vector_queries": [{
+                "vector": vector,
+                "fields": "embedding",
+                "k": top_k,
+                "kind": "vector"
+            }],
+            "top": top_k
+        }
+        if filter:
+            search_kwargs["filter"] = filter
+        await self.open()
+        results = await self.client.search(**search_kwargs)
+        return [doc async for doc in results]
+
+    async def lookup(self, filter: str, top: int, select: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        # A filter-only query: no embedding, no ranking, served from the filterable fields' indexes
+        await self.open()
+        results = await self.client.search(search_text="*", filter=filter, top=top, select=select)
+        return [doc async for doc in results]
+
+    async def delete(self, filter: Optional[str] = None, batch_size: int = 500, max_rate: Optional[float] = None) -> int:
+        """
+        Azure Search has no delete-by-query, so matching keys are scanned in id order, one page at a
+        time (select=["id"], resuming after the last key), and deleted in batches. `max_rate` caps the
+        documents deleted per second so a large purge does not crowd out live queries.
+        """
+        await self.open()
+        deleted = 0
+        last_id = None
+        while True:
+            clauses = [f"({filter})"] if filter else []
+            if last_id is not None:
+                clauses.append("id gt '" + last_id.replace("'", "''") + "'")
+            results = await self.client.search(
+                search_text="*",
+                filter=" and ".join(clauses) or None,
+                select=["id"],
+                order_by=["id asc"],
+                top=batch_size,
+            )
+            ids = [doc["id"] async for doc in results]
+            if not ids:
+                return deleted
+            started = asyncio.get_running_loop().time()
+            await self.client.delete_documents(documents=[{"id": doc_id} for doc_id in ids])
+            deleted += len(ids)
+            last_id = ids[-1]
+            if max_rate:
+                await asyncio.sleep(max(len(ids) / max_rate - (asyncio.get_running_loop().time() - started), 0))
+
+    async def count(self) -> int:
+        await self.open()
+        return await self.client.get_document_count()
+
+
+class LocalVectorBackend(VectorBackend):
+    """
+    In-process vector index. Embeddings are L2-normalized float32 rows of one contiguous
+    NumPy array, so top-k cosine search is a single matrix-vector product. With `path` set,
+    the array is a np.memmap and documents are appended to a JSONL file next to it.
+    Each filter's result is kept as a boolean row mask that only evaluates rows added since its
+    last use, so a repeated filtered query is a NumPy mask over the scores.
+    Deleted rows are hidden at once and removed by a compaction that runs in a worker thread.
+    """
+    filters_metadata = True
+
+    def __init__(self, index_name: str, path: Optional[str] = None, initial_capacity: int = 1024, max_masks: int = None):
+        self.index_name = index_name
+        self.path = path
+        self.initial_capacity = initial_capacity
+        self.max_masks = max_masks or int(os.getenv("VECTOR_LOCAL_FILTER_MASKS", "256"))
+        self._vectors: Optional[np.ndarray] = None
+        self._docs: List[Dict[str, Any]] = []
+        self._rows: Dict[str, int] = {}
+        self._filters: Dict[str, Callable[[Dict[str, Any]], bool]] = {}
+        # Per filter: a row mask (with spare capacity) and how many rows it has evaluated
+        self._masks: "OrderedDict[str, Tuple[np.ndarray, int]]" = OrderedDict()
+        # Rows deleted but not yet compacted away
+        self._dead: Set[int] = set()
+        # Uploads and compaction both move rows; deletes scan rows and must not overlap each other
+        self._lock = asyncio.Lock()
+        self._delete_lock = asyncio.Lock()
+        if path:
+            os.makedirs(path, exist_ok=True)
+            self._load()
+
+    @property
+    def size(self) -> int:
+        return len(self._docs)
+
+    async def upload(self, docs: List[Dict[str, Any]]):
+        async with self._lock:
+            self._upload(docs)
+
+    def _upload(self, docs: List[Dict[str, Any]]):
+        for doc in docs:
+            vector = np.asarray(doc["embedding"], dtype=np.float32)
+            norm = np.linalg.norm(vector)
+            if norm:
+                vector = vector / norm
+            stored = {"id": doc["id"], "content": doc.get("content", ""), "metadata": doc.get("metadata", "{}")}
+            stored.update({k: v for k, v in doc.items() if k not in ("id", "content", "metadata", "embedding")})
+            row = self._rows.get(doc["id"])
+            if row is None:
+                row = len(self._docs)
+                self._ensure_capacity(row + 1, vector.shape[0])
+                self._docs.append(stored)
+                self._rows[doc["id"]] = row
+            else:
+                # Upload replaces an existing document, like Azure's upload_documents
+                self._docs[row] = stored
+                for filter, (mask, evaluated) in self._masks.items():
+                    if row < evaluated:
+                        mask[row] = self._compile(filter)(stored)
+            self._vectors[row] = vector
+        if self.path and docs:
+            self._vectors.flush()
+            with open(self._docs_path, "a", encoding="utf-8") as f:
+                for doc in docs:
+                    f.write(json.dumps(self._docs[self._rows[doc["id"]]]) + "\n")
+
+    async def search(self, vector: List[float], top_k: int, filter: Optional[str] = None) -> List[Dict[str, Any]]:
+        n = len(self._docs)
+        if n == 0 or top_k <= 0:
+            return []
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        scores = self._vectors[:n] @ query
+        available = n - len(self._dead)
+        dead = list(self._dead)
+        if dead:
+            scores[dead] = -np.inf
+        if filter:
+            mask = self._mask(filter, n)
+            scores = np.where(mask, scores, -np.inf)
+            available = int(mask.sum()) - int(mask[dead].sum())
+        top_k = min(top_k, available)
+        if top_k == 0:
+            return []
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top])]
+        return [dict(self._docs[i], **{"@search.score": float(scores[i])}) for i in top]
+
+    async def lookup(self, filter: str, top: int, select: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        docs = []
+        for row in np.flatnonzero(self._mask(filter, len(self._docs))):
+            if len(docs) >= top:
+                break
+            if row not in self._dead:
+                doc = self._docs[row]
+                docs.append({field: doc.get(field) for field in select} if select else dict(doc))
+        return docs
+
+    async def delete(self, filter: Optional[str] = None, batch_size: int = 500, max_rate: Optional[float] = None) -> int:
+        """
+        Rows are scanned `batch_size` at a time, yielding to queries in between; matches are hidden
+        from queries right away (at most `max_rate` per second) and then compacted out in one pass.
+        """
+        if filter is None:
+            deleted = await self.count()
+            await self.clear()
+            return deleted
+        predicate = self._compile(filter)
+        loop = asyncio.get_running_loop()
+        deleted = 0
+        async with self._delete_lock:
+            # Rows appended while the scan sleeps are newer than the delete and are left alone
+            for start in range(0, len(self._docs), batch_size):
+                began = loop.time()
+                matches = [
+                    row for row in range(start, min(start + batch_size, len(self._docs)))
+                    if row not in self._dead and predicate(self._docs[row])
+                ]
+                for row in matches:
+                    self._dead.add(row)
+                    if self._rows.get(self._docs[row]["id"]) == row:
+                        del self._rows[self._docs[row]["id"]]
+                deleted += len(matches)
+                pause = len(matches) / max_rate - (loop.time() - began) if max_rate else 0
+                await asyncio.sleep(max(pause, 0))
+            if self._dead:
+                await self._compact()
+        return deleted
+
+    async def count(self) -> int:
+        return len(self._docs) - len(self._dead)
+
+    async def _compact(self):
+        async with self._lock:
+            keep = [row for row in range(len(self._docs)) if row not in self._dead]
+            # Copying rows and rewriting files is O(n); queries keep reading the old arrays meanwhile
+            docs, vectors = await asyncio.to_thread(self._compacted, keep)
+            # Surviving rows keep their mask bits; masks that had not caught up are rebuilt on next use
+            self._masks = OrderedDict(
+                (filter, (mask[keep], len(keep)))
+                for filter, (mask, evaluated) in self._masks.items()
+                if evaluated == len(self._docs)
+            )
+            self._docs = docs
+            self._rows = {doc["id"]: row for row, doc in enumerate(docs)}
+            self._dead = set()
+            if self.path:
+                self._swap_files(vectors)
+            else:
+                self._vectors = vectors
+
+    def _compacted(self, keep: List[int]) -> Tuple[List[Dict[str, Any]], Optional[np.ndarray]]:
+        """Runs in a worker thread: the surviving documents and vectors, written to temporary files if persistent."""
+        docs = [self._docs[i] for i in keep]
+        vectors = None
+        if self._vectors is not None:
+            shape = (max(self.initial_capacity, len(keep)), self._vectors.shape[1])
+            if self.path:
+                vectors = np.memmap(self._vectors_path + ".tmp", dtype=np.float32, mode="w+", shape=shape)
+            else:
+                vectors = np.zeros(shape, dtype=np.float32)
+            vectors[:len(keep)] = self._vectors[keep]
+        if self.path:
+            if vectors is not None:
+                vectors.flush()
+            # The append-only document log is rewritten without deleted or superseded entries
+            with open(self._docs_path + ".tmp", "w", encoding="utf-8") as f:
+                for doc in docs:
+                    f.write(json.dumps(doc) + "\n")
+        return docs, vectors
+
+    def _swap_files(self, vectors: Optional[np.ndarray]):
+        os.replace(self._docs_path + ".tmp", self._docs_path)
+        if vectors is None:
+            return
+        shape = vectors.shape
+        del vectors
+        self._vectors = None
+        os.replace(self._vectors_path + ".tmp", self._vectors_path)
+        with open(self._meta_path, "w", encoding="utf-8") as f:
+            json.dump({"capacity": shape[0], "dim": shape[1]}, f)
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=shape)
+
+    async def clear(self):
+        async with self._delete_lock, self._lock:
+            self._vectors = None
+            self._docs = []
+            self._rows = {}
+            self._dead = set()
+            self._masks.clear()
+            if self.path:
+                for p in (self._vectors_path, self._docs_path, self._meta_path):
+                    if os.path.exists(p):
+                        os.remove(p)
+
+    async def close(self):
+        if self.path and self._vectors is not None:
+            self._vectors.flush()
+
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.path, f"{self.index_name}.f32")
+
+    @property
+    def _docs_path(self) -> str:
+        return os.path.join(self.path, f"{self.index_name}.jsonl")
+
+    @property
+    def _meta_path(self) -> str:
+        return os.path.join(self.path, f"{self.index_name}.meta.json")
+
+    def _compile(self, filter: str) -> Callable[[Dict[str, Any]], bool]:
+        predicate = self._filters.get(filter)
+        if predicate is None:
+            predicate = self._filters[filter] = compile_filter(filter)
+        return predicate
+
+    def _mask(self, filter: str, n: int) -> np.ndarray:
+        """Rows 0..n-1 matching `filter`; only rows not evaluated before run the predicate."""
+        mask, evaluated = self._masks.pop(filter, (None, 0))
+        if mask is None or mask.shape[0] < n:
+            grown = np.zeros(max(n, 2 * evaluated, 64), dtype=bool)
+            if mask is not None:
+                grown[:evaluated] = mask[:evaluated]
+            mask = grown
+        if evaluated < n:
+            predicate = self._compile(filter)
+            mask[evaluated:n] = np.fromiter((predicate(doc) for doc in self._docs[evaluated:n]), dtype=bool, count=n - evaluated)
+            evaluated = n
+        self._masks[filter] = (mask, evaluated)
+        while len(self._masks) > self.max_masks:
+            self._masks.popitem(last=False)
+        return mask[:n]
+
+    def _ensure_capacity(self, rows: int, dim: int):
+        if self._vectors is not None:
+            if self._vectors.shape[1] != dim:
+                raise ValueError(f"Embedding dimension {dim} does not match index dimension {self._vectors.shape[1]}")
+            if rows <= self._vectors.shape[0]:
+                return
+        capacity = max(self.initial_capacity, rows)
+        if self._vectors is not None:
+            capacity = max(capacity, self._vectors.shape[0] * 2)
+        self._vectors = self._allocate(capacity, dim, self._vectors)
+
+    def _allocate(self, capacity: int, dim: int, old: Optional[np.ndarray]) -> np.ndarray:
+        if not self.path:
+            vectors = np.zeros((capacity, dim), dtype=np.float32)
+            if old is not None:
+                vectors[:old.shape[0]] = old
+            return vectors
+        if old is not None:
+            old.flush()
+            del old
+        with open(self._vectors_path, "ab") as f:
+            f.truncate(capacity * dim * 4)
+        with open(self._meta_path, "w", encoding="utf-8") as f:
+            json.dump({"capacity": capacity, "dim": dim}, f)
+        return np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, dim))
+
+    def _load(self):
+        if not os.path.exists(self._docs_path):
+            return
+        with open(self._docs_path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                doc = json.loads(line)
+                row = self._rows.setdefault(doc["id"], len(self._docs))
+                if row == len(self._docs):
+                    self._docs.append(doc)
+                else:
+                    self._docs[row] = doc
+        if self._docs and os.path.exists(self._meta_path):
+            with open(self._meta_path, encoding="utf-8") as f:
+                shape = json.load(f)
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(shape["capacity"], shape["dim"]))
+        logger.info(f"Loaded {len(self._docs)} documents into local index {self.index_name}")
+
+
+# --- OData filter subset for LocalVectorBackend ---
+# Supports eq/ne/gt/ge/lt/le, and/or/not, parentheses and search.in(field, 'a,b'[, ',']).
+# Field paths like metadata/user_id resolve into the JSON-encoded metadata column.
+
+_TOKEN = re.compile(r"\s*(?:(?P<str>'(?:[^']|'')*')|(?P<num>-?\d+(?:\.\d+)?)|(?P<punct>[(),])|(?P<word>[A-Za-z_@][\w./@]*))")
+_COMPARISONS = {
+    "eq": lambda a, b: a == b,
+    "ne": lambda a, b: a != b,
+    "gt": lambda a, b: a is not None and b is not None and a > b,
+    "ge": lambda a, b: a is not None and b is not None and a >= b,
+    "lt": lambda a, b: a is not None and b is not None and a < b,
+    "le": lambda a, b: a is not None and b is not None and a <= b,
+}
+_LITERALS = {"true": True, "false": False, "null": None}
+
+
+def _tokenize(expr: str) -> List[tuple]:
+    tokens, pos = [], 0
+    expr = expr.rstrip()
+    while pos < len(expr):
+        match = _TOKEN.match(expr, pos)
+        if not match:
+            raise ValueError(f"Unsupported filter syntax at: {expr[pos:]!r}")
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "str":
+            value = value[1:-1].replace("''", "'")
+        elif kind == "num":
+            value = float(value) if "." in value else int(value)
+        tokens.append((kind, value))
+        pos = match.end()
+    return tokens
+
+
+def resolve_field(doc: Dict[str, Any], path: str) -> Any:
+    """Resolve `a/b` style field paths against a document, looking inside the metadata JSON as a fallback."""
+    parts = path.split("/")
+    value: Any = doc
+    if parts[0] not in doc:
+        value = _metadata(doc)
+    elif parts[0] == "metadata" and len(parts) > 1:
+        value, parts = _metadata(doc), parts[1:]
+    for part in parts:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def _metadata(doc: Dict[str, Any]) -> Dict[str, Any]:
+    metadata = doc.get("metadata") or {}
+    if isinstance(metadata, str):
+        try:
+            metadata = json.loads(metadata)
+        except ValueError:
+            return {}
+    return metadata if isinstance(metadata, dict) else {}
+
+
+def compile_filter(expr: str) -> Callable[[Dict[str, Any]], bool]:
+    """Compile an OData filter expression into a predicate over documents."""
+    tokens = _tokenize(expr)
+    pos = 0
+
+    def peek(offset=0):
+        return tokens[pos + offset] if pos + offset < len(tokens) else (None, None)
+
+    def take(expected=None):
+        nonlocal pos
+        token = peek()
+        if token[0] is None or (expected is not None and token[1] != expected):
+            raise ValueError(f"Expected {expected or 'token'} in filter {expr!r}")
+        pos += 1
+        return token
+
+    def operand():
+        kind, value = take()
+        if kind in ("str", "num"):
+            return lambda doc: value
+        if kind == "word" and value in _LITERALS:
+            literal = _LITERALS[value]
+            return lambda doc: literal
+        if kind == "word":
+            return lambda doc: resolve_field(doc, value)
+        raise ValueError(f"Unexpected {value!r} in filter {expr!r}")
+
+    def primary():
+        kind, value = peek()
+        if value == "(":
+            take("(")
+            predicate = disjunction()
+            take(")")
+            return predicate
+        if value == "not":
+            take()
+            inner = primary()
+            return lambda doc: not inner(doc)
+        if value == "search.in":
+            take()
+            take("(")
+            field = take()[1]
+            take(",")
+            values = take()[1]
+            delimiters = ", "
+            if peek()[1] == ",":
+                take(",")
+                delimiters = take()[1]
+            take(")")
+            allowed = {v for v in re.split("[" + re.escape(delimiters) + "]", values) if v}
+            return lambda doc: resolve_field(doc, field) in allowed
+        left = operand()
+        op = peek()[1]
+        if op in _COMPARISONS:
+            take()
+            right = operand()
+            compare = _COMPARISONS[op]
+            return lambda doc: compare(left(doc), right(doc))
+        return lambda doc: bool(left(doc))
+
+    def conjunction():
+        predicate = primary()
+        while peek()[1] == "and":
+            take()
+            left, right = predicate, primary()
+            predicate = lambda doc, left=left, right=right: left(doc) and right(doc)
+        return predicate
+
+    def disjunction():
+        predicate = conjunction()
+        while peek()[1] == "or":
+            take()
+            left, right = predicate, conjunction()
+            predicate = lambda doc, left=left, right=right: left(doc) or right(doc)
+        return predicate
+
+    predicate = disjunction()
+    if pos != len(tokens):
+        raise ValueError(f"Unexpected trailing input in filter {expr!r}")
+    return predicate
+
+
+_local_backends: Dict[str, LocalVectorBackend] = {}
+
+
+def create_backend(index_name: str) -> VectorBackend:
+    """Build the backend selected by VECTOR_MEMORY_BACKEND ("azure" or "local")."""
+    kind = os.getenv("VECTOR_MEMORY_BACKEND", "azure").lower()
+    if kind == "local":
+        # Local indexes are shared in-process so every VectorMemory on an index sees the same documents
+        if index_name not in _local_backends:
+            _local_backends[index_name] = LocalVectorBackend(index_name, path=os.getenv("VECTOR_MEMORY_LOCAL_DIR") or None)
+        return _local_backends[index_name]
+    if kind == "azure":
+        return AzureSearchBackend(index_name)
+    raise ValueError(f"Unknown VECTOR_MEMORY_BACKEND: {kind}")
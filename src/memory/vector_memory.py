@@ -1,10 +1,11 @@
-from typing import List, Dict, Any, override
+from typing import List, Dict, Any, Iterable, Optional, override
 from uuid import uuid4
-from azure.search.documents.aio import SearchClient
-from azure.core.credentials import AzureKeyCredential
 import os
 import logging
-import openai  # For Azure OpenAI embeddings
+import time
+from memory.embeddings import get_embedding_engine
+from memory.vector_backends import VectorBackend, create_backend
+from common.metrics import get_metrics
 from autogen_core.memory import Memory, MemoryQueryResult
 import json
 
@@ -14,96 +15,138 @@ class VectorMemory(Memory):
     """
     General-purpose vector memory for storing and retrieving documents using Azure Cognitive Search and OpenAI embeddings.
     Can be used for core knowledge, user info, or any other vector-based memory needs.
+    The storage backend is pluggable; pass `backend` or set VECTOR_MEMORY_BACKEND=local for the in-process index.
+    Metadata keys listed in `filterable_fields` are also written as top-level document fields, so an index
+    that declares them filterable can serve lookup() without an embedding or a vector query.
+    Every document is stamped with `created_at` (epoch seconds) in its metadata, which expire() uses for retention.
     """
-    def __init__(self, index_name=None):
-        self.endpoint = os.getenv("AZURE_SEARCH_ENDPOINT")
-        self.key = os.getenv("AZURE_SEARCH_KEY")
+    def __init__(self, index_name=None, backend: VectorBackend = None, filterable_fields: Optional[Iterable[str]] = None):
         self.index_name = index_name
-        self.client = None  # Will be created in __aenter__
-        # Azure OpenAI embedding config
-        self.openai_api_key = os.getenv("AZURE_OPENAI_API_KEY")
-        self.openai_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
+        self.backend = backend or create_backend(index_name)
+        # VECTOR_MEMORY_FILTERABLE_FIELDS applies to every index, e.g. created_at for retention
+        configured = [field.strip() for field in os.getenv("VECTOR_MEMORY_FILTERABLE_FIELDS", "").split(",") if field.strip()]
+        self.filterable_fields = tuple(dict.fromkeys([*(filterable_fields or ()), *configured]))
+        # Azure OpenAI embedding config; the engine is shared by every VectorMemory on the same deployment
         self.openai_deployment = os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT")
+        self.embedding_engine = get_embedding_engine(self.openai_deployment)
         super().__init__()
 
     async def __aenter__(self):
-        self.client = SearchClient(
-            endpoint=self.endpoint,
-            index_name=self.index_name,
-            credential=AzureKeyCredential(self.key)
-        )
-        await self.client.__aenter__()
+        await self.backend.open()
         return self
 
     async def __aexit__(self, exc_type, exc, tb):
-        if self.client:
-            await self.client.__aexit__(exc_type, exc, tb)
-            self.client = None
+        await self.backend.close()
 
     async def get_embedding(self, text: str) -> List[float]:
-        openai.api_type = "azure"
-        openai.api_key = self.openai_api_key
-        openai.api_base = self.openai_endpoint
-        openai.api_version = "2023-05-15"
-        response = openai.embeddings.create(
-            input=[text],
-            model=self.openai_deployment
-        )
-        return response.data[0].embedding
+        return await self.embedding_engine.embed(text)
+
+    async def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return await self.embedding_engine.embed_many(texts)
 
     @override
     async def add(self, messages: List[Dict[str, Any]]):
-        docs = []
-        for msg in messages:
-            content = msg.get("content", "")
-            embedding = await self.get_embedding(content)
-            doc = {
-                "id": str(uuid4()),
-                "content": content,
-                "embedding": embedding,
-                "metadata": json.dumps(msg.get("metadata", {}))
-            }
-            docs.append(doc)
-        await self.client.upload_documents(documents=docs)
-        logger.info(f"Stored {len(docs)} messages in Azure Vector DB")
+        with get_metrics().span("memory", "add", index=self.index_name):
+            docs = []
+            embeddings = await self.get_embeddings([msg.get("content", "") for msg in messages])
+            now = int(time.time())
+            for msg, embedding in zip(messages, embeddings):
+                content = msg.get("content", "")
+                metadata = {"created_at": now, **(msg.get("metadata") or {})}
+                doc = {
+                    # Callers may pass a stable id (e.g. a content hash) so re-adding a document overwrites it
+                    "id": msg.get("id") or str(uuid4()),
+                    "content": content,
+                    "embedding": embedding,
+                    "metadata": json.dumps(metadata)
+                }
+                for field in self.filterable_fields:
+                    doc[field] = metadata.get(field)
+                docs.append(doc)
+            await self.backend.upload(docs)
+        logger.info(f"Stored {len(docs)} messages in vector index {self.index_name}")
     
     @override
     async def query(self, query: str, top_k: int = 5, filter: str = None) -> MemoryQueryResult:
-        embedding = await self.get_embedding(query)
-        search_kwargs = {
-            "search_text": "",
-            "vector_queries": [{
-                "vector": embedding,
-                "fields": "embedding",
-                "k": top_k,
-                "kind": "vector"
-            }],
-            "top": top_k
-        }
-        if filter:
-            search_kwargs["filter"] = filter
-        results = await self.client.search(**search_kwargs)
-        docs = [doc async for doc in results]
-        logger.info(f"Retrieved {len(docs)} results from Azure Vector DB")
-        # Convert docs to the format expected by MemoryQueryResult
-        messages = [
-            {
-                "content": doc.get("content", ""),
-                "metadata": doc.get("metadata", {}),
-                "mime_type": "text/plain"
-            }
-            for doc in docs
-        ]
-        return MemoryQueryResult(results=messages)
+        with get_metrics().span("memory", "query", index=self.index_name):
+            embedding = await self.get_embedding(query)
+            docs = await self.backend.search(embedding, top_k, filter)
+        logger.info(f"Retrieved {len(docs)} results from vector index {self.index_name}")
+        return to_query_result(docs)
+
+    def can_filter(self, *fields: str) -> bool:
+        """True if lookup() can filter on all of `fields` in this index."""
+        return self.backend.filters_metadata or all(field in self.filterable_fields for field in fields)
+
+    async def lookup(self, top: int = 50, filter: str = None, **fields) -> MemoryQueryResult:
+        """
+        Keyed retrieval: documents whose fields equal the given values (e.g. user_id=..., doc_type="cv"),
+        optionally AND-ed with an OData `filter`. No embedding is computed and nothing is ranked.
+        """
+        with get_metrics().span("memory", "lookup", index=self.index_name):
+            docs = await self.backend.lookup(match_filter(filter, fields), top, select=["id", "content", "metadata"])
+        logger.info(f"Looked up {len(docs)} documents in vector index {self.index_name}")
+        return to_query_result(docs)
+
+    async def delete(self, filter: str = None, max_rate: float = None, **fields) -> int:
+        """
+        Bulk delete of the documents matching the given field values and/or OData `filter`, in batches.
+        `max_rate` caps documents deleted per second. Returns the number deleted.
+        """
+        with get_metrics().span("memory", "delete", index=self.index_name):
+            deleted = await self.backend.delete(match_filter(filter, fields), max_rate=max_rate)
+        logger.info(f"Deleted {deleted} documents from vector index {self.index_name}")
+        return deleted
+
+    async def expire(self, max_age: float, max_rate: float = None) -> int:
+        """Delete documents whose created_at is more than `max_age` seconds old."""
+        if not self.can_filter("created_at"):
+            logger.warning(f"Index {self.index_name} cannot filter on created_at; add it to VECTOR_MEMORY_FILTERABLE_FIELDS for retention")
+            return 0
+        return await self.delete(filter=f"created_at lt {int(time.time() - max_age)}", max_rate=max_rate)
+
+    async def count(self) -> int:
+        return await self.backend.count()
 
     @override
     async def clear(self):
-        # Azure Search does not support bulk delete by default; this is a placeholder
-        logger.warning("Clear method is not implemented for Azure Search.")
-        pass
+        await self.backend.clear()
 
     async def update_context(self, context: str):
         pass
 
     async def close(self):
         pass
+
+
+def to_query_result(docs: List[Dict[str, Any]]) -> MemoryQueryResult:
+    """Convert index documents to the format expected by MemoryQueryResult (metadata decoded from JSON)."""
+    messages = []
+    for doc in docs:
+        metadata = doc.get("metadata") or {}
+        if isinstance(metadata, str):
+            try:
+                metadata = json.loads(metadata)
+            except ValueError:
+                metadata = {}
+        messages.append({"content": doc.get("content", ""), "metadata": metadata, "mime_type": "text/plain"})
+    return MemoryQueryResult(results=messages)
+
+
+def match_filter(filter: Optional[str], fields: Dict[str, Any]) -> str:
+    """AND together `field eq value` clauses and an optional OData filter."""
+    clauses = [f"{field} eq {odata_literal(value)}" for field, value in fields.items() if value is not None]
+    if filter:
+        clauses.append(f"({filter})")
+    if not clauses:
+        raise ValueError("Give at least one field or a filter")
+    return " and ".join(clauses)
+
+
+def odata_literal(value: Any) -> str:
+    """Render a Python value as an OData literal for Azure Search filters."""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return "'" + str(value).replace("'", "''") + "'"
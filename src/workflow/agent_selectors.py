@@ -1,55 +1,121 @@
-def human_in_the_loop_selector(messages):
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+import logging
+import os
+import re
+from common.metrics import get_metrics
+
+logger = logging.getLogger("AgentSelector")
+
+DEFAULT_AGENTS = ["TriageAgent", "ProfilerAgent", "SkillAgent", "LearningPlanAgent", "GlobalJobsAgent"]
+USER = "user_proxy"
+
+_QUESTION = re.compile(r"\?\s*$|please provide|can you|user input", re.IGNORECASE)
+
+
+def asks_user(text):
+    """True if a message is a question or requests user input."""
+    return _QUESTION.search(text) is not None
+
+
+def selector_routes() -> Dict[str, str]:
+    """Routing table from SELECTOR_ROUTES ("TriageAgent=ProfilerAgent,ProfilerAgent=SkillAgent"); empty means round-robin."""
+    routes = {}
+    for item in os.getenv("SELECTOR_ROUTES", "").split(","):
+        speaker, _, target = item.partition("=")
+        if speaker.strip() and target.strip():
+            routes[speaker.strip()] = target.strip()
+    return routes
+
+
+class HumanInTheLoopRouter:
     """
-    Selector for AutoGen SelectorGroupChat.
-    - messages: list of BaseAgentEvent or BaseChatMessage objects
-    Returns the name (string) of the next speaker.
+    Stateful selector for AutoGen SelectorGroupChat; one instance per team, with `select` as the
+    team's `selector_func`.
+    Only messages added since the previous call are looked at, and the rules are compiled once,
+    so each turn costs the same however long the conversation is.
+    Order of rules:
+    - nobody but the user has spoken yet: TriageAgent
+    - explicit handoff in the last message ("SkillAgent, please ..."): that agent
+    - the last message asks the user something: user_proxy
+    - otherwise the routing table entry for the last speaker, falling back to round-robin
     """
-    # Define all non-user agent names
-    all_non_user_agents = ["TriageAgent", "ProfilerAgent", "SkillAgent", "LearningPlanAgent", "GlobalJobsAgent"]
-    agent_names = []
-    last_speaker = None
-    for msg in messages:
-        name = getattr(msg, "source", None)
-        if name == "user":
-            name = "user_proxy"
-        if name and name not in agent_names:
-            agent_names.append(name)
-        last_speaker = name or last_speaker
-
-    # Debug prints
-    if last_speaker and last_speaker != 'user_proxy':
-        print(f"[{last_speaker}]: {messages[-1].to_text()}")
-    # print("--------------------------------")
-
-    # Always include user_proxy
-    if "user_proxy" not in agent_names:
-        agent_names.append("user_proxy")
-
-    # If this is the very first message (or only user_proxy has spoken), start with TriageAgent
-    if not messages or (len(agent_names) == 1 and agent_names[0] == "user_proxy"):
-        return "TriageAgent"
-
-    # If last message is a question or requests user input, return user_proxy
-    if messages:
-        last_msg = messages[-1].to_text()
-        if (
-            last_msg.strip().endswith("?")
-            or "please provide" in last_msg.lower()
-            or "can you" in last_msg.lower()
-            or "user input" in last_msg.lower()
-        ):
-            return "user_proxy"
-
-    # Round-robin among all non-user agents
-    non_user_agents = all_non_user_agents
-    if last_speaker and last_speaker in non_user_agents:
-        idx = non_user_agents.index(last_speaker)
-        next_idx = (idx + 1) % len(non_user_agents)
-        selected = non_user_agents[next_idx]
+    def __init__(
+        self,
+        agents: Optional[Iterable[str]] = None,
+        routes: Optional[Dict[str, str]] = None,
+        entry_agent: str = "TriageAgent",
+    ):
+        self.agents: List[str] = list(agents or DEFAULT_AGENTS)
+        self.entry_agent = entry_agent if entry_agent in self.agents else self.agents[0]
+        self.routes = {**self._round_robin(), **(routes if routes is not None else selector_routes())}
+        names = "|".join(re.escape(name) for name in sorted(self.agents, key=len, reverse=True))
+        self._handoff = re.compile(rf"(?:^|[\s@(\"'])({names})\s*[,:]\s*(?:please|could you|can you|would you)\b", re.IGNORECASE)
+        self._canonical = {name.lower(): name for name in self.agents}
+        self.reset()
+
+    def _round_robin(self) -> Dict[str, str]:
+        return {name: self.agents[(i + 1) % len(self.agents)] for i, name in enumerate(self.agents)}
+
+    def reset(self):
+        self._seen = 0
+        self._first = None
+        self.agent_spoken = False
+        self.last_speaker: Optional[str] = None
+
+    def select(self, messages: Sequence) -> str:
+        with get_metrics().span("selector", "route") as span:
+            selected, rule = self._select(messages)
+            span.labels.update(agent=self.last_speaker, selected=selected, rule=rule)
         return selected
-    # Start with TriageAgent or first non-user agent
-    if "TriageAgent" in non_user_agents:
-        selected = "TriageAgent"
-    else:
-        selected = non_user_agents[0] if non_user_agents else "user_proxy"
-    return selected 
\ No newline at end of file
+
+    def _select(self, messages: Sequence):
+        # A shorter thread or a different first message means the team was reset or restored
+        if len(messages) < self._seen or (messages and self._seen and messages[0] is not self._first):
+            self.reset()
+        for msg in messages[self._seen:]:
+            name = getattr(msg, "source", None)
+            if name == "user":
+                name = USER
+            if name:
+                self.last_speaker = name
+                if name != USER:
+                    self.agent_spoken = True
+        self._seen = len(messages)
+        self._first = messages[0] if messages else None
+
+        if not self.agent_spoken:
+            return self.entry_agent, "entry"
+        text = messages[-1].to_text()
+        logger.debug(f"[{self.last_speaker}]: {text}")
+        return self._route(self.last_speaker, text)
+
+    def route(self, speaker: Optional[str], text: str) -> str:
+        return self._route(speaker, text)[0]
+
+    def _route(self, speaker: Optional[str], text: str):
+        for match in self._handoff.finditer(text):
+            target = self._canonical[match.group(1).lower()]
+            if target != speaker:
+                return target, "handoff"
+        if asks_user(text):
+            return USER, "question"
+        return self.routes.get(speaker, self.entry_agent), "route"
+
+
+def make_human_in_the_loop_selector(agents: Optional[Iterable[str]] = None, routes: Optional[Dict[str, str]] = None) -> Callable[[Sequence], str]:
+    """The `select` method of a new router; call once per team and pass it as `selector_func`."""
+    return HumanInTheLoopRouter(agents, routes).select
+
+
+_default_router: Optional[HumanInTheLoopRouter] = None
+
+
+def human_in_the_loop_selector(messages):
+    """
+    Selector for AutoGen SelectorGroupChat backed by one shared router. Another team's thread makes
+    it start over, so concurrent teams should each use make_human_in_the_loop_selector().
+    """
+    global _default_router
+    if _default_router is None:
+        _default_router = HumanInTheLoopRouter()
+    return _default_router.select(messages)
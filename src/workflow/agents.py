@@ -3,30 +3,54 @@ from workflow.tools import (
     make_analyze_resume_tool,
     make_analyze_skill_gap_tool,
 )
+from workflow.tool_cache import CachingTool
+from workflow.instrumented_client import InstrumentedChatCompletionClient
+from workflow.model_context import TokenBudgetChatCompletionContext
 from memory.shortterm_memory import ShortTermMemory
 from memory.vector_memory import VectorMemory
 import os
 from autogen_ext.tools.mcp import StdioServerParams, mcp_server_tools, SseMcpToolAdapter, SseServerParams, StdioMcpToolAdapter
 
 
-async def create_agents(agent_config, tool_config):
+async def create_agents(agent_config, tool_config, web_search_tool=None, model_client_stream=False):
     # Use different vector indexes for different agent types if needed
     core_index = os.getenv("AZURE_SEARCH_INDEX_CORE")
     profile_index = os.getenv("AZURE_SEARCH_INDEX_PROFILE")
 
+    # Each agent keeps a token-budgeted history, compacted into a rolling summary by the tool model
+    def budgeted_context():
+        return TokenBudgetChatCompletionContext(
+            agent_config,
+            deployment=os.getenv("AZURE_OPENAI_DEPLOYMENT"),
+            summarizer_client=InstrumentedChatCompletionClient(tool_config, "Summarizer", os.getenv("AZURE_OPENAI_TOOL_DEPLOYMENT")),
+        )
+
+    # Each agent gets its own view of the shared client so model calls are attributed to it
+    def agent_client(name):
+        return InstrumentedChatCompletionClient(agent_config, name, os.getenv("AZURE_OPENAI_DEPLOYMENT"))
+
+    def short_term_memory():
+        max_tokens = os.getenv("SHORT_TERM_MEMORY_MAX_TOKENS")
+        return ShortTermMemory(capacity=10, max_tokens=int(max_tokens) if max_tokens else None)
+
     # Create AgentTool instances
     analyze_resume_tool = make_analyze_resume_tool(tool_config)
     analyze_skill_gap_tool = make_analyze_skill_gap_tool(tool_config)
-    fetch_mcp_server = StdioServerParams(
-        command="npx", 
-        args=["-y", "@modelcontextprotocol/server-brave-search"], 
-        env={"BRAVE_API_KEY": ""}
-    ) 
-    brave_web_search = await StdioMcpToolAdapter.from_server_params(fetch_mcp_server, "brave_web_search")
+    # Sessions built by workflow.session_pool pass in a tool backed by long-lived MCP servers
+    brave_web_search = web_search_tool
+    if brave_web_search is None:
+        fetch_mcp_server = StdioServerParams(
+            command="npx", 
+            args=["-y", "@modelcontextprotocol/server-brave-search"], 
+            env={"BRAVE_API_KEY": ""}
+        ) 
+        brave_web_search = CachingTool(await StdioMcpToolAdapter.from_server_params(fetch_mcp_server, "brave_web_search"))
 
     triage_agent = AssistantAgent(
         name="TriageAgent",
-        model_client=agent_config,
+        model_client=agent_client("TriageAgent"),
+        model_client_stream=model_client_stream,
+        model_context=budgeted_context(),
         system_message=(
             "You are the Leader and Triage Agent for a consultant team. Your responsibilities are: "
             "- You are the ONLY agent allowed to interact directly with the user. "
@@ -40,11 +64,13 @@ async def create_agents(agent_config, tool_config):
             "- You have access to your own short-term and vector memory, as well as a shared team memory for coordination. Use the shared memory to store and retrieve information that benefits all agents."
         ),
         tools=[],
-        memory=[ShortTermMemory(capacity=10), VectorMemory(index_name=core_index)],
+        memory=[short_term_memory(), VectorMemory(index_name=core_index)],
     )
     profiler_agent = AssistantAgent(
         name="ProfilerAgent",
-        model_client=agent_config,
+        model_client=agent_client("ProfilerAgent"),
+        model_client_stream=model_client_stream,
+        model_context=budgeted_context(),
         system_message=(
             "You are the Profiler Agent. You are NOT allowed to address or interact with the user directly. "
             "You may only communicate with other agents in the group, and must hand over your findings, suggestions, or requests to the TriageAgent. "
@@ -54,11 +80,13 @@ async def create_agents(agent_config, tool_config):
             "- You have access to your own short-term and vector memory, as well as a shared team memory for coordination. Use the shared memory to store and retrieve information that benefits all agents."
         ),
         tools=[analyze_resume_tool],
-        memory=[ShortTermMemory(capacity=10), VectorMemory(index_name=core_index)],
+        memory=[short_term_memory(), VectorMemory(index_name=core_index)],
     )
     skill_agent = AssistantAgent(
         name="SkillAgent",
-        model_client=agent_config,
+        model_client=agent_client("SkillAgent"),
+        model_client_stream=model_client_stream,
+        model_context=budgeted_context(),
         system_message=(
             "You are the Skill Evaluator Agent. You are NOT allowed to address or interact with the user directly. "
             "You may only communicate with other agents in the group, and must hand over your findings, suggestions, or requests to the TriageAgent. "
@@ -69,11 +97,13 @@ async def create_agents(agent_config, tool_config):
         ),
         tools=[analyze_skill_gap_tool, brave_web_search],
         reflect_on_tool_use=True,
-        memory=[ShortTermMemory(capacity=10), VectorMemory(index_name=core_index)],
+        memory=[short_term_memory(), VectorMemory(index_name=core_index)],
     )
     learning_plan_agent = AssistantAgent(
         name="LearningPlanAgent",
-        model_client=agent_config,
+        model_client=agent_client("LearningPlanAgent"),
+        model_client_stream=model_client_stream,
+        model_context=budgeted_context(),
         system_message=(
             "You are the Learning Plan Agent. You are NOT allowed to address or interact with the user directly. "
             "You may only communicate with other agents in the group, and must hand over your findings, suggestions, or requests to the TriageAgent. "
@@ -86,11 +116,13 @@ async def create_agents(agent_config, tool_config):
         ),
         tools=[brave_web_search],
         reflect_on_tool_use=True,
-        memory=[ShortTermMemory(capacity=10), VectorMemory(index_name=core_index)],
+        memory=[short_term_memory(), VectorMemory(index_name=core_index)],
     )
     global_jobs_agent = AssistantAgent(
         name="GlobalJobsAgent",
-        model_client=agent_config,
+        model_client=agent_client("GlobalJobsAgent"),
+        model_client_stream=model_client_stream,
+        model_context=budgeted_context(),
         system_message=(
             "You are the Global Jobs Agent. You are NOT allowed to address or interact with the user directly. "
             "You may only communicate with other agents in the group, and must hand over your findings, suggestions, or requests to the TriageAgent. "
@@ -103,7 +135,7 @@ async def create_agents(agent_config, tool_config):
         ),
         tools=[brave_web_search],
         reflect_on_tool_use=True,
-        memory=[ShortTermMemory(capacity=10), VectorMemory(index_name=core_index)],
+        memory=[short_term_memory(), VectorMemory(index_name=core_index)],
     )
     user_agent = UserProxyAgent("user_proxy", input_func=input)
     return [triage_agent, profiler_agent, skill_agent, learning_plan_agent, global_jobs_agent], user_agent 
\ No newline at end of file
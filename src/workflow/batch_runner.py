@@ -0,0 +1,270 @@
+"""
+Batch consultations: runs many non-interactive consultations from a JSONL file of jobs.
+
+    cd src && python -m workflow.batch_runner jobs.jsonl --output results.jsonl --workers 8
+
+Each job line is {"id": "...", "target_role": "...", "cv": "<CV text>"}; "cv_path" (PDF, DOCX or text)
+may replace "cv" and an optional "message" adds instructions. Results are appended to the output file
+as jobs finish, so rerunning the same command after a crash only runs the jobs that have no result yet.
+Workers share one pool of agent teams, MCP servers and model clients, and every model call still goes
+through the LLM scheduler. Cost per job uses MODEL_PRICE_PROMPT_PER_1K / MODEL_PRICE_COMPLETION_PER_1K.
+"""
+from typing import Any, Dict, List, Optional, Set
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+from workflow.agent_selectors import asks_user
+from workflow.config import llm_config
+from common.clients import get_client_registry
+from workflow.events import SessionEventBus, bind_bus
+from common.metrics import Usage, bind_session, bind_usage
+from workflow.orchestration import ParallelConsultation
+from common.settings import keyed_setting
+from workflow.session_pool import SessionFactory
+
+logger = logging.getLogger("BatchRunner")
+
+NO_FURTHER_INPUT = (
+    "No further information is available from the user. Proceed with the CV and target role given, "
+    "state any assumptions you make, and give the team's full recommendations."
+)
+
+
+def job_cost(usage: Usage) -> float:
+    """Cost of the tokens in `usage`, from the per-deployment prices per 1K tokens."""
+    cost = 0.0
+    for deployment, (prompt, completion) in usage.deployments.items():
+        cost += prompt / 1000 * keyed_setting("MODEL_PRICE_PROMPT_PER_1K", deployment, 0.0)
+        cost += completion / 1000 * keyed_setting("MODEL_PRICE_COMPLETION_PER_1K", deployment, 0.0)
+    return cost
+
+
+def load_jobs(path: str) -> List[Dict[str, Any]]:
+    jobs = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            job = json.loads(line)
+            job["id"] = str(job.get("id") or f"line-{line_number}")
+            jobs.append(job)
+    return jobs
+
+
+def completed_jobs(path: str, retry_failed: bool = True) -> Set[str]:
+    """Ids that already have a result in the checkpoint file (failed ones only if not retrying them)."""
+    done: Set[str] = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                # A line cut short by a crash; that job simply runs again
+                continue
+            if result.get("status") == "ok" or not retry_failed:
+                done.add(str(result.get("id")))
+    return done
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(math.ceil(q / 100 * len(ordered)) - 1, 0)]
+
+
+class BatchRunner:
+    """
+    Runs consultation jobs with `workers` concurrent consultations. Each worker borrows an agent
+    team from a shared SessionFactory per job and returns it reset, so teams and MCP servers are
+    built once for the whole batch.
+    """
+    def __init__(
+        self,
+        output: str,
+        workers: int = None,
+        job_timeout: float = None,
+        max_follow_ups: int = None,
+        cv_max_chars: int = None,
+        retry_failed: bool = True,
+    ):
+        self.output = output
+        self.workers = workers or int(os.getenv("BATCH_WORKERS", "8"))
+        self.job_timeout = job_timeout or float(os.getenv("BATCH_JOB_TIMEOUT", "600"))
+        self.max_follow_ups = max_follow_ups if max_follow_ups is not None else int(os.getenv("BATCH_MAX_FOLLOW_UPS", "1"))
+        self.cv_max_chars = cv_max_chars or int(os.getenv("BATCH_CV_MAX_CHARS", "12000"))
+        self.retry_failed = retry_failed
+        self.factory: Optional[SessionFactory] = None
+        self.ingestor = None
+        self.results: List[Dict[str, Any]] = []
+        self._out = None
+
+    async def run(self, jobs: List[Dict[str, Any]]) -> Dict[str, Any]:
+        done = completed_jobs(self.output, self.retry_failed)
+        pending = [job for job in jobs if job["id"] not in done]
+        logger.info(f"{len(pending)} jobs to run, {len(jobs) - len(pending)} already in {self.output}")
+        started = time.perf_counter()
+        if pending:
+            await self._start()
+            queue: asyncio.Queue = asyncio.Queue()
+            for job in pending:
+                queue.put_nowait(job)
+            try:
+                await asyncio.gather(*(self._worker(queue, len(pending)) for _ in range(min(self.workers, len(pending)))))
+            finally:
+                await self._close()
+        return self.report(time.perf_counter() - started, skipped=len(jobs) - len(pending))
+
+    async def _start(self):
+        # Imported here so the module stays usable without the CV parsing dependencies
+        from api.cv_ingest import CvIngestor
+        self.ingestor = CvIngestor()
+        self.factory = SessionFactory(llm_config("agent"), llm_config("tool"), size=self.workers, model_client_stream=False)
+        await self.factory.start()
+        os.makedirs(os.path.dirname(os.path.abspath(self.output)), exist_ok=True)
+        self._out = open(self.output, "a", encoding="utf-8")
+
+    async def _close(self):
+        if self._out is not None:
+            self._out.close()
+        if self.ingestor is not None:
+            self.ingestor.close()
+        if self.factory is not None:
+            await self.factory.close()
+        await get_client_registry().close()
+
+    async def _worker(self, queue: asyncio.Queue, total: int):
+        while True:
+            try:
+                job = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            result = await self.run_job(job)
+            self._checkpoint(result)
+            if len(self.results) % 10 == 0 or len(self.results) == total:
+                logger.info(f"{len(self.results)}/{total} jobs finished")
+
+    def _checkpoint(self, result: Dict[str, Any]):
+        self.results.append(result)
+        self._out.write(json.dumps(result) + "\n")
+        self._out.flush()
+
+    async def run_job(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        usage = Usage()
+        # Everything this job's agents emit goes to its own bus instead of stdout; model tokens go to `usage`
+        bus = SessionEventBus(session_id=f"batch-{job['id']}")
+        bind_bus(bus)
+        bind_session(bus.session_id)
+        bind_usage(usage)
+        findings: Dict[str, str] = {}
+
+        async def collect():
+            async for event in bus.events():
+                if event.get("type") == "message":
+                    findings[event["agent"]] = event["content"]
+        collector = asyncio.create_task(collect())
+        started = time.perf_counter()
+        result: Dict[str, Any] = {"id": job["id"], "target_role": job.get("target_role")}
+        agents = None
+        try:
+            agents = await self.factory.acquire()
+            reply = await asyncio.wait_for(self._consult(agents, await self._task_text(job)), self.job_timeout)
+            result.update(status="ok", reply=reply)
+        except asyncio.TimeoutError:
+            result.update(status="failed", error=f"timed out after {self.job_timeout:.0f}s")
+        except Exception as e:
+            logger.error(f"Job {job['id']} failed: {e}")
+            result.update(status="failed", error=str(e))
+        finally:
+            if agents is not None:
+                await self.factory.release(agents)
+            bus.close()
+            await collector
+        findings.pop("TriageAgent", None)
+        result.update(
+            findings=findings,
+            seconds=round(time.perf_counter() - started, 3),
+            model_calls=usage.calls,
+            prompt_tokens=usage.prompt_tokens,
+            completion_tokens=usage.completion_tokens,
+            cost=round(job_cost(usage), 6),
+        )
+        return result
+
+    async def _consult(self, agents: List[Any], task: str) -> str:
+        consultation = ParallelConsultation(agents)
+        reply = await consultation.consult(task)
+        # Nobody can answer TriageAgent's questions, so tell it to go ahead with what it has
+        for _ in range(self.max_follow_ups):
+            if not asks_user(reply):
+                break
+            reply = await consultation.consult(NO_FURTHER_INPUT)
+        return reply
+
+    async def _task_text(self, job: Dict[str, Any]) -> str:
+        cv = job.get("cv")
+        if cv is None and job.get("cv_path"):
+            with open(job["cv_path"], "rb") as f:
+                data = f.read()
+            cv = await self.ingestor.parse(os.path.basename(job["cv_path"]), data)
+        if not cv or not cv.strip():
+            raise ValueError("job has no CV text (set \"cv\" or \"cv_path\")")
+        if len(cv) > self.cv_max_chars:
+            cv = cv[:self.cv_max_chars] + "..."
+        parts = []
+        if job.get("target_role"):
+            parts.append(f"My target role is {job['target_role']}.")
+        parts.append(job.get("message") or (
+            "Please review my profile against this role, identify my skill gaps, "
+            "suggest a learning plan and point me to relevant job openings."
+        ))
+        parts.append(f"Here is my CV:\n\n{cv}")
+        return "\n\n".join(parts)
+
+    def report(self, elapsed: float, skipped: int = 0) -> Dict[str, Any]:
+        ok = [r for r in self.results if r["status"] == "ok"]
+        costs = [r["cost"] for r in self.results]
+        latencies = [r["seconds"] for r in ok]
+        return {
+            "jobs_run": len(self.results),
+            "jobs_ok": len(ok),
+            "jobs_failed": len(self.results) - len(ok),
+            "jobs_skipped": skipped,
+            "workers": self.workers,
+            "elapsed_s": round(elapsed, 3),
+            "jobs_per_min": round(len(ok) / elapsed * 60, 2) if elapsed > 0 else None,
+            "job_p50_s": percentile(latencies, 50),
+            "job_p95_s": percentile(latencies, 95),
+            "prompt_tokens": sum(r["prompt_tokens"] for r in self.results),
+            "completion_tokens": sum(r["completion_tokens"] for r in self.results),
+            "cost_total": round(sum(costs), 6),
+            # Failed jobs still spent tokens, so they count towards the cost of each successful one
+            "cost_per_job": round(sum(costs) / len(ok), 6) if ok else None,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("jobs", help="JSONL file of jobs")
+    parser.add_argument("--output", default=None, help="JSONL results and checkpoint file (default: <jobs>.results.jsonl)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--job-timeout", type=float, default=None)
+    parser.add_argument("--no-retry-failed", action="store_true", help="On resume, skip jobs that failed before")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level.upper())
+
+    output = args.output or os.path.splitext(args.jobs)[0] + ".results.jsonl"
+    runner = BatchRunner(output, workers=args.workers, job_timeout=args.job_timeout, retry_failed=not args.no_retry_failed)
+    report = asyncio.run(runner.run(load_jobs(args.jobs)))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
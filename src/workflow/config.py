@@ -1,16 +1,10 @@
-from autogen_ext.models.openai import AzureOpenAIChatCompletionClient
 from autogen_core.models import ChatCompletionClient
+from common.clients import get_client_registry
+from workflow.scheduler import get_scheduler
 import os
 
-def llm_config(role: str):
+def llm_config(role: str) -> ChatCompletionClient:
+    # Clients come from the shared registry, so every agent and session reuses one connection pool,
+    # and every call goes through the deployment's scheduler (concurrency, TPM budget, priorities)
     deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT") if role == "agent" else os.getenv("AZURE_OPENAI_TOOL_DEPLOYMENT")
-    az_model_client = AzureOpenAIChatCompletionClient(
-        azure_deployment=deployment,
-        model=deployment,
-        api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
-        azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-        api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-    )
-    return az_model_client
-
-
+    return get_scheduler().client(deployment, get_client_registry().chat_client(deployment))
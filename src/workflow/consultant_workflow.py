@@ -1,34 +1,57 @@
 import os
 from memory.vector_memory import VectorMemory
 from workflow.agents import create_agents
-from workflow.agent_selectors import human_in_the_loop_selector
+from workflow.agent_selectors import make_human_in_the_loop_selector
+from workflow.orchestration import consult_mode, run_parallel_session
 from workflow.config import llm_config
 from autogen_agentchat.teams import SelectorGroupChat
-from autogen_core.model_context import BufferedChatCompletionContext
+from autogen_agentchat.ui import Console
+from workflow.model_context import TokenBudgetChatCompletionContext
 
 
 async def main():
     async with VectorMemory(index_name=os.getenv("AZURE_SEARCH_INDEX_PROFILE")) as user_vector_memory:
         agent_config = llm_config("agent")
         tool_config = llm_config("tool")
-        model_context = BufferedChatCompletionContext(buffer_size=10)
+        model_context = TokenBudgetChatCompletionContext(
+            agent_config, deployment=os.getenv("AZURE_OPENAI_DEPLOYMENT"), summarizer_client=tool_config
+        )
 
         # Create agents and user agent using modular function
         agents, user_agent = await create_agents(agent_config, tool_config)
         group_agents = agents + [user_agent]
 
+        if consult_mode() == "parallel":
+            print("Career Coach: specialists run concurrently after triage. Send an empty message to quit.")
+            first_message = input("Type your requirements as your first chat message: ")
+
+            async def receive():
+                nonlocal first_message
+                if first_message is not None:
+                    message, first_message = first_message, None
+                else:
+                    message = input("> ")
+                return message or None
+
+            async def send(reply):
+                print(f"[TriageAgent]: {reply}")
+
+            await run_parallel_session(agents, receive, send)
+            return
+
         # Create SelectorGroupChat with imported selector
         groupchat = SelectorGroupChat(
             participants=group_agents,
             model_client=agent_config,
             max_turns=30,
-            selector_func=human_in_the_loop_selector,
+            selector_func=make_human_in_the_loop_selector(),
             model_context=model_context
         )
 
         print("Career Coach GroupChat: All agents can contribute in parallel.")
         user_message = input("Type your requirements as your first chat message: ")
-        await groupchat.run(task=user_message)
+        # Console prints each agent's messages as the team produces them
+        await Console(groupchat.run_stream(task=user_message))
 
 if __name__ == "__main__":
     import asyncio
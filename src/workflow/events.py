@@ -0,0 +1,169 @@
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, List, Optional
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger("SessionEventBus")
+
+_CLOSED = object()
+
+
+def make_event(agent: str, type: str, content: Any, tool: Optional[str] = None, handoff: bool = False) -> Dict[str, Any]:
+    """Event shape sent to the frontend (see api.main.stream_agent_event)."""
+    return {
+        "agent": agent,
+        "type": type,
+        "content": content,
+        "tool": tool,
+        "handoff": handoff,
+    }
+
+
+class SessionEventBus:
+    """
+    Per-session async event bus.
+    Outbound events (agents -> websocket) and inbound user messages (websocket -> user proxy)
+    go through bounded asyncio queues, so a slow client applies backpressure and a waiting
+    user costs a suspended coroutine rather than a parked thread.
+    Model token chunks are coalesced into one "token" frame per agent every `token_window` seconds
+    (or `token_max_chars`); any other event flushes pending tokens first so frames stay in order.
+    """
+    def __init__(
+        self,
+        session_id: Optional[str] = None,
+        max_outbound: int = None,
+        max_inbound: int = None,
+        token_window: float = None,
+        token_max_chars: int = None,
+    ):
+        self.session_id = session_id
+        self.token_window = token_window if token_window is not None else float(os.getenv("STREAM_COALESCE_MS", "50")) / 1000
+        self.token_max_chars = token_max_chars or int(os.getenv("STREAM_COALESCE_MAX_CHARS", "512"))
+        self.outbound: asyncio.Queue = asyncio.Queue(max_outbound or int(os.getenv("SESSION_OUTBOUND_QUEUE_SIZE", "256")))
+        self.inbound: asyncio.Queue = asyncio.Queue(max_inbound or int(os.getenv("SESSION_INBOUND_QUEUE_SIZE", "16")))
+        self.dropped = 0
+        self.closed = False
+        self._token_agent: Optional[str] = None
+        self._token_parts: List[str] = []
+        self._token_chars = 0
+        self._token_started = 0.0
+        self._token_timer: Optional[asyncio.TimerHandle] = None
+
+    async def publish(self, event: Dict[str, Any]):
+        """Queue an event for the client, waiting while the outbound queue is full."""
+        if not self.closed:
+            await self._flush_tokens()
+            await self.outbound.put(event)
+
+    async def publish_token(self, agent: str, text: str):
+        """Buffer a streamed model chunk; sent as a coalesced "token" frame."""
+        if self.closed or not text:
+            return
+        loop = asyncio.get_running_loop()
+        if self._token_agent is not None and self._token_agent != agent:
+            await self._flush_tokens()
+        if not self._token_parts:
+            self._token_agent = agent
+            self._token_started = loop.time()
+        self._token_parts.append(text)
+        self._token_chars += len(text)
+        if self._token_chars >= self.token_max_chars or loop.time() - self._token_started >= self.token_window:
+            await self._flush_tokens()
+        elif self._token_timer is None:
+            # Flush the tail of a burst even if no further chunk arrives
+            self._token_timer = loop.call_later(self.token_window, self._flush_tokens_soon)
+
+    def _take_tokens(self) -> Optional[Dict[str, Any]]:
+        if self._token_timer is not None:
+            self._token_timer.cancel()
+            self._token_timer = None
+        if not self._token_parts:
+            return None
+        event = make_event(self._token_agent, "token", "".join(self._token_parts))
+        self._token_parts = []
+        self._token_chars = 0
+        self._token_agent = None
+        return event
+
+    async def _flush_tokens(self):
+        event = self._take_tokens()
+        if event is not None:
+            await self.outbound.put(event)
+
+    def _flush_tokens_soon(self):
+        self._token_timer = None
+        if self.outbound.full():
+            # Keep buffering rather than dropping tokens; retry after another window
+            self._token_timer = asyncio.get_running_loop().call_later(self.token_window, self._flush_tokens_soon)
+            return
+        event = self._take_tokens()
+        if event is not None:
+            self.outbound.put_nowait(event)
+
+    def publish_nowait(self, event: Dict[str, Any]) -> bool:
+        """Queue an event from synchronous code; drops it (and counts the drop) if the queue is full."""
+        if self.closed:
+            return False
+        try:
+            pending = self._take_tokens()
+            if pending is not None:
+                self.outbound.put_nowait(pending)
+            self.outbound.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning(f"Session {self.session_id}: outbound queue full, dropped {event.get('type')} event")
+            return False
+
+    async def events(self) -> AsyncIterator[Dict[str, Any]]:
+        while True:
+            event = await self.outbound.get()
+            if event is _CLOSED:
+                return
+            yield event
+
+    async def send_user_message(self, text: str):
+        await self.inbound.put(text)
+
+    async def receive_user_message(self) -> str:
+        """Next message from the client; raises CancelledError once the bus is closed."""
+        text = await self.inbound.get() if not self.closed else _CLOSED
+        if text is _CLOSED:
+            raise asyncio.CancelledError(f"Session {self.session_id} closed")
+        return text
+
+    def close(self):
+        self.closed = True
+        if self._token_timer is not None:
+            self._token_timer.cancel()
+            self._token_timer = None
+        # Wake the sender and a user proxy waiting for input, even if their queues are full
+        for queue in (self.outbound, self.inbound):
+            while True:
+                try:
+                    queue.put_nowait(_CLOSED)
+                    break
+                except asyncio.QueueFull:
+                    queue.get_nowait()
+
+
+_current_bus: ContextVar[Optional[SessionEventBus]] = ContextVar("session_event_bus", default=None)
+
+
+def bind_bus(bus: Optional[SessionEventBus]):
+    """Make `bus` the event bus for the current task and any tasks it creates."""
+    return _current_bus.set(bus)
+
+
+def current_bus() -> Optional[SessionEventBus]:
+    return _current_bus.get()
+
+
+def emit(agent: str, type: str, content: Any, tool: Optional[str] = None, handoff: bool = False):
+    """Publish an event on the current session's bus, or print it when running outside a session (CLI)."""
+    bus = _current_bus.get()
+    if bus is None:
+        print(f"[{agent}]: {content}")
+        return
+    bus.publish_nowait(make_event(agent, type, content, tool, handoff))
@@ -0,0 +1,67 @@
+from typing import Any, AsyncGenerator, Optional, Sequence
+import time
+from autogen_core.models import ChatCompletionClient, CreateResult, LLMMessage, ModelInfo, RequestUsage
+from common.metrics import bind_agent, get_metrics
+
+
+class InstrumentedChatCompletionClient(ChatCompletionClient):
+    """
+    Per-agent view of a shared chat client. Every completion is recorded as a "model" span tagged
+    with the agent and deployment, with its token usage and, when streaming, time to first token.
+    """
+    def __init__(self, client: ChatCompletionClient, agent: str, deployment: Optional[str] = None):
+        self._client = client
+        self.agent = agent
+        self.deployment = deployment
+
+    async def create(self, messages: Sequence[LLMMessage], **kwargs) -> CreateResult:
+        # Tool calls made after this completion belong to the same agent
+        bind_agent(self.agent)
+        with get_metrics().span("model", "create", agent=self.agent, deployment=self.deployment) as span:
+            result = await self._client.create(messages, **kwargs)
+            span.tokens(result.usage.prompt_tokens, result.usage.completion_tokens)
+            span.cached(result.cached)
+        return result
+
+    async def create_stream(self, messages: Sequence[LLMMessage], **kwargs) -> AsyncGenerator[Any, None]:
+        bind_agent(self.agent)
+        metrics = get_metrics()
+        with metrics.span("model", "create_stream", agent=self.agent, deployment=self.deployment) as span:
+            first = True
+            async for item in self._client.create_stream(messages, **kwargs):
+                if first:
+                    first = False
+                    metrics.observe(
+                        "career_coach_model_first_token_seconds",
+                        time.perf_counter() - span.started,
+                        {"agent": self.agent, "deployment": self.deployment},
+                        "Time from request to the first streamed chunk",
+                    )
+                if isinstance(item, CreateResult):
+                    span.tokens(item.usage.prompt_tokens, item.usage.completion_tokens)
+                    span.cached(item.cached)
+                yield item
+
+    async def close(self) -> None:
+        # The wrapped client is shared and closed by the registry
+        pass
+
+    def actual_usage(self) -> RequestUsage:
+        return self._client.actual_usage()
+
+    def total_usage(self) -> RequestUsage:
+        return self._client.total_usage()
+
+    def count_tokens(self, messages: Sequence[LLMMessage], **kwargs) -> int:
+        return self._client.count_tokens(messages, **kwargs)
+
+    def remaining_tokens(self, messages: Sequence[LLMMessage], **kwargs) -> int:
+        return self._client.remaining_tokens(messages, **kwargs)
+
+    @property
+    def capabilities(self):
+        return self._client.capabilities
+
+    @property
+    def model_info(self) -> ModelInfo:
+        return self._client.model_info
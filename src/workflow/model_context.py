@@ -0,0 +1,156 @@
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+import logging
+import os
+from autogen_core.model_context import ChatCompletionContext
+from autogen_core.models import (
+    ChatCompletionClient,
+    FunctionExecutionResultMessage,
+    LLMMessage,
+    SystemMessage,
+    UserMessage,
+)
+
+logger = logging.getLogger("TokenBudgetContext")
+
+
+def context_token_budget(deployment: Optional[str]) -> int:
+    """Token budget for a deployment from CONTEXT_TOKEN_BUDGETS ("gpt-4o=8000,gpt-4o-mini=4000"), else CONTEXT_TOKEN_BUDGET."""
+    for item in os.getenv("CONTEXT_TOKEN_BUDGETS", "").split(","):
+        name, _, budget = item.partition("=")
+        if deployment and name.strip() == deployment and budget.strip():
+            return int(budget)
+    return int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+
+
+def message_text(message: LLMMessage) -> str:
+    source = getattr(message, "source", None) or type(message).__name__.replace("Message", "")
+    content = message.content
+    if isinstance(content, list):
+        parts = []
+        for item in content:
+            if isinstance(item, str):
+                parts.append(item)
+            elif hasattr(item, "arguments"):
+                parts.append(f"called {item.name}({item.arguments})")
+            elif hasattr(item, "content"):
+                parts.append(f"{getattr(item, 'name', 'tool')} returned: {item.content}")
+        content = "\n".join(parts)
+    return f"{source}: {content}"
+
+
+class TokenBudgetChatCompletionContext(ChatCompletionContext):
+    """
+    Chat completion context bounded by tokens rather than message count.
+    When an added message takes the history over the budget, the oldest turns are folded into a
+    rolling summary; get_messages only reads. The summary is updated incrementally from the previous
+    summary and only the newly evicted turns, and each message's token count is computed once.
+    """
+    def __init__(
+        self,
+        model_client: ChatCompletionClient,
+        token_budget: Optional[int] = None,
+        deployment: Optional[str] = None,
+        summarizer_client: Optional[ChatCompletionClient] = None,
+        summary_max_words: int = 200,
+        initial_messages: Optional[List[LLMMessage]] = None,
+    ):
+        super().__init__(initial_messages)
+        self._model_client = model_client
+        self._summarizer_client = summarizer_client or model_client
+        self.token_budget = token_budget or context_token_budget(deployment)
+        self.summary_max_words = summary_max_words
+        self.summary = ""
+        self.compactions = 0
+        self._summary_tokens = 0
+        self._token_counts: Dict[int, Tuple[LLMMessage, int]] = {}
+
+    async def add_message(self, message: LLMMessage) -> None:
+        await super().add_message(message)
+        await self.compact()
+
+    async def compact(self) -> None:
+        """Fold the oldest turns into the summary if the history is over the token budget."""
+        counts = [self._count(message) for message in self._messages]
+        if len(self._token_counts) > len(self._messages):
+            # Forget messages removed from the history without being evicted
+            self._token_counts = {id(m): self._token_counts[id(m)] for m in self._messages}
+        total = self._summary_tokens + sum(counts)
+        if total > self.token_budget and len(self._messages) > 1:
+            await self._compact(counts, total)
+
+    async def get_messages(self) -> List[LLMMessage]:
+        if not self.summary:
+            return list(self._messages)
+        return [self._summary_message()] + list(self._messages)
+
+    async def clear(self) -> None:
+        await super().clear()
+        self.summary = ""
+        self._summary_tokens = 0
+        self._token_counts.clear()
+
+    async def save_state(self) -> Mapping[str, Any]:
+        state = dict(await super().save_state())
+        state["summary"] = self.summary
+        return state
+
+    async def load_state(self, state: Mapping[str, Any]) -> None:
+        await super().load_state(state)
+        self._token_counts.clear()
+        self.summary = state.get("summary", "")
+        self._summary_tokens = self._count_uncached(self._summary_message()) if self.summary else 0
+
+    def _count(self, message: LLMMessage) -> int:
+        # Keyed by identity; the entry holds the message too, so an id reused after a message was
+        # removed from the history (e.g. a replaced recall block) never returns a stale count
+        entry = self._token_counts.get(id(message))
+        if entry is None or entry[0] is not message:
+            entry = self._token_counts[id(message)] = (message, self._count_uncached(message))
+        return entry[1]
+
+    def _count_uncached(self, message: LLMMessage) -> int:
+        try:
+            return self._model_client.count_tokens([message])
+        except Exception:
+            # Clients without a tokenizer for this model: roughly 4 characters per token
+            return len(message_text(message)) // 4 + 4
+
+    def _summary_message(self) -> SystemMessage:
+        return SystemMessage(content=f"Summary of the earlier conversation:\n{self.summary}")
+
+    async def _compact(self, counts: List[int], total: int):
+        # Reserve room for the summary itself, then evict oldest turns until the rest fits,
+        # always keeping the latest message and never orphaning a tool result from its call
+        target = self.token_budget - self.summary_max_words * 2
+        evict = 0
+        while evict < len(self._messages) - 1 and total > target:
+            total -= counts[evict]
+            evict += 1
+        while evict < len(self._messages) - 1 and isinstance(self._messages[evict], FunctionExecutionResultMessage):
+            evict += 1
+        if evict == 0:
+            return
+        evicted = self._messages[:evict]
+        self.summary = await self._summarize(evicted)
+        self._messages = self._messages[evict:]
+        for message in evicted:
+            self._token_counts.pop(id(message), None)
+        self._summary_tokens = self._count_uncached(self._summary_message())
+        self.compactions += 1
+        logger.debug(f"Compacted {evict} messages into the rolling summary")
+
+    async def _summarize(self, evicted: List[LLMMessage]) -> str:
+        transcript = "\n".join(message_text(m) for m in evicted)
+        prompt = (
+            f"Current summary of the conversation:\n{self.summary or '(none)'}\n\n"
+            f"New turns to fold in:\n{transcript}\n\n"
+            f"Rewrite the summary to include the new turns. Keep facts about the user's profile, goals, skills, "
+            f"and the team's findings and recommendations. At most {self.summary_max_words} words."
+        )
+        try:
+            result = await self._summarizer_client.create([UserMessage(content=prompt, source="summarizer")])
+            if isinstance(result.content, str) and result.content.strip():
+                return result.content.strip()
+        except Exception as e:
+            logger.warning(f"Summarization failed, keeping the previous summary: {e}")
+        return (self.summary + "\n[Some earlier turns were omitted.]").strip()
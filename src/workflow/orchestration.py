@@ -0,0 +1,98 @@
+from typing import List, Optional
+import asyncio
+import logging
+import os
+from autogen_agentchat.messages import TextMessage
+from autogen_core import CancellationToken
+from workflow.agent_selectors import asks_user
+from workflow.events import emit
+
+logger = logging.getLogger("ParallelConsultation")
+
+SPECIALISTS = ["ProfilerAgent", "SkillAgent", "LearningPlanAgent", "GlobalJobsAgent"]
+
+
+class ParallelConsultation:
+    """
+    Fan-out/fan-in consult mode.
+    TriageAgent classifies the user's message; once the intent is clear the specialists it named
+    (or all of them) run concurrently, each under its own timeout, and their merged findings are
+    handed back to TriageAgent for the synthesis sent to the user. A consult therefore takes
+    roughly as long as the slowest specialist instead of the sum of all of them.
+    """
+    def __init__(self, agents: List, specialist_timeout: float = None):
+        by_name = {agent.name: agent for agent in agents}
+        self.triage = by_name["TriageAgent"]
+        self.specialists = {name: by_name[name] for name in SPECIALISTS if name in by_name}
+        self.specialist_timeout = specialist_timeout or float(os.getenv("SPECIALIST_TIMEOUT", "90"))
+
+    async def consult(self, user_message: str, cancellation_token: Optional[CancellationToken] = None) -> str:
+        """Run one consult turn and return TriageAgent's reply to the user."""
+        cancellation_token = cancellation_token or CancellationToken()
+        request = TextMessage(content=user_message, source="user")
+        triage = await self.triage.on_messages([request], cancellation_token)
+        triage_text = triage.chat_message.to_text()
+        # Vague input: Triage is asking the user for more detail, so there is nothing to fan out yet
+        if asks_user(triage_text):
+            return triage_text
+        emit(self.triage.name, "message", triage_text)
+
+        selected = self._select(triage_text)
+        results = await asyncio.gather(*(
+            self._run_specialist(name, [request, triage.chat_message], cancellation_token)
+            for name in selected
+        ))
+        merged = "\n\n".join(f"[{name}]\n{text}" for name, text in zip(selected, results))
+        synthesis = await self.triage.on_messages(
+            [TextMessage(
+                content=(
+                    "The team has contributed the findings below. Summarize and synthesize them "
+                    "into one response for the user.\n\n" + merged
+                ),
+                source="team",
+            )],
+            cancellation_token,
+        )
+        return synthesis.chat_message.to_text()
+
+    def _select(self, triage_text: str) -> List[str]:
+        named = [name for name in self.specialists if name in triage_text]
+        return named or list(self.specialists)
+
+    async def _run_specialist(self, name: str, messages: List[TextMessage], cancellation_token: CancellationToken) -> str:
+        agent = self.specialists[name]
+        token = CancellationToken()
+        cancellation_token.add_callback(token.cancel)
+        emit(name, "system", f"{name} started", handoff=True)
+        try:
+            response = await asyncio.wait_for(agent.on_messages(messages, token), self.specialist_timeout)
+            text = response.chat_message.to_text()
+        except asyncio.TimeoutError:
+            token.cancel()
+            logger.warning(f"{name} timed out after {self.specialist_timeout}s")
+            text = f"(no response within {self.specialist_timeout:.0f}s)"
+        except Exception as e:
+            logger.error(f"{name} failed: {e}")
+            text = f"(failed: {e})"
+        emit(name, "message", text)
+        return text
+
+
+def consult_mode() -> str:
+    """Consult mode from CONSULT_MODE: "selector" (round-robin group chat, default) or "parallel"."""
+    return os.getenv("CONSULT_MODE", "selector").lower()
+
+
+async def run_parallel_session(agents: List, receive, send, specialist_timeout: float = None):
+    """
+    Drive a ParallelConsultation from a message source until `receive` returns None.
+    The loop keeps no state between turns (the agents hold the conversation), so a session restored
+    from a snapshot taken while waiting for input can simply start this again from the top.
+    """
+    consultation = ParallelConsultation(agents, specialist_timeout=specialist_timeout)
+    while True:
+        user_message = await receive()
+        if user_message is None:
+            return
+        reply = await consultation.consult(user_message)
+        await send(reply)
@@ -0,0 +1,347 @@
+from typing import Any, AsyncGenerator, Dict, List, Optional, Sequence, Tuple
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import random
+import time
+import weakref
+import openai
+from autogen_core.models import ChatCompletionClient, CreateResult, LLMMessage, ModelInfo, RequestUsage
+from common.metrics import current_agent, get_metrics
+from common.settings import keyed_setting
+from workflow.events import current_bus, make_event
+
+logger = logging.getLogger("LlmScheduler")
+
+BUSY_MESSAGE = "The service is busy right now, please try again in a moment."
+
+# Lower runs first: the user-facing agent, then specialists, then tool agents and background work
+DEFAULT_PRIORITIES = {
+    "TriageAgent": 0,
+    "ProfilerAgent": 1,
+    "SkillAgent": 1,
+    "LearningPlanAgent": 1,
+    "GlobalJobsAgent": 1,
+    "AnalyzeResumeAgent": 2,
+    "AnalyzeSkillGapAgent": 2,
+    "Summarizer": 2,
+}
+
+
+def agent_priority(agent: Optional[str]) -> int:
+    """Priority of an agent from AGENT_PRIORITIES ("TriageAgent=0,GlobalJobsAgent=2"), else the defaults."""
+    for item in os.getenv("AGENT_PRIORITIES", "").split(","):
+        name, _, priority = item.partition("=")
+        if agent and name.strip() == agent and priority.strip():
+            return int(priority)
+    return DEFAULT_PRIORITIES.get(agent, 1)
+
+
+class SchedulerOverloaded(Exception):
+    """Raised instead of queueing when a deployment's queue is already at its limit."""
+    def __init__(self, deployment: Optional[str], depth: int):
+        super().__init__(f"Deployment {deployment} is overloaded ({depth} requests queued)")
+        self.deployment = deployment
+        self.depth = depth
+
+
+class DeploymentScheduler:
+    """
+    Admission control for one deployment: at most `max_concurrency` requests in flight and a
+    tokens-per-minute bucket (disabled when `tpm` is 0). Waiting requests form a priority queue,
+    so a queued TriageAgent call is always admitted before queued specialist or tool calls.
+    After a 429 nothing is admitted until the back-off has passed, with or without a bucket.
+    """
+    def __init__(self, deployment: Optional[str], max_concurrency: int, tpm: float, max_queue: int):
+        self.deployment = deployment
+        self.max_concurrency = max_concurrency
+        self.tpm = tpm
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self.tokens = float(tpm)
+        self.admitted = 0
+        self.shed = 0
+        self.retries = 0
+        self.total_wait = 0.0
+        self._updated = time.monotonic()
+        self._not_before = 0.0
+        self._queue: List[Tuple[int, int, asyncio.Future, int]] = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # When each session was last told about shedding, so a burst of rejected calls sends one notice
+        self._notified: "weakref.WeakKeyDictionary[Any, float]" = weakref.WeakKeyDictionary()
+
+    @property
+    def depth(self) -> int:
+        return sum(1 for _, _, future, _ in self._queue if not future.done())
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.tpm:
+            self.tokens = min(self.tpm, self.tokens + (now - self._updated) * self.tpm / 60)
+        self._updated = now
+
+    async def acquire(self, priority: int, tokens: int):
+        if self.depth >= self.max_queue:
+            self.shed += 1
+            get_metrics().inc("career_coach_scheduler_shed_total", {"deployment": self.deployment}, 1, "Requests rejected by admission control")
+            self._notify_busy()
+            raise SchedulerOverloaded(self.deployment, self.depth)
+        # A request larger than the whole bucket could never be admitted; cap it
+        tokens = min(tokens, int(self.tpm)) if self.tpm else tokens
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._seq), future, tokens))
+        started = time.monotonic()
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Admitted just as the caller was cancelled: hand the slot and its tokens back
+                self.release(tokens, 0)
+            raise
+        waited = time.monotonic() - started
+        self.total_wait += waited
+        self.admitted += 1
+        get_metrics().observe(
+            "career_coach_scheduler_wait_seconds",
+            waited,
+            {"deployment": self.deployment, "priority": priority},
+            "Time LLM requests waited for admission",
+        )
+        return tokens
+
+    def _notify_busy(self, interval: float = 10.0):
+        # Told here because the team flattens the exception into a RuntimeError before the session sees it
+        bus = current_bus()
+        if bus is None:
+            return
+        now = time.monotonic()
+        if now - self._notified.get(bus, -interval) >= interval:
+            self._notified[bus] = now
+            bus.publish_nowait(make_event("system", "system", BUSY_MESSAGE))
+
+    def release(self, estimated: int, actual: Optional[int] = None):
+        self.in_flight -= 1
+        if self.tpm and actual is not None:
+            self._refill()
+            self.tokens -= actual - estimated
+        self._dispatch()
+
+    def penalize(self, delay: float):
+        """Back off the whole deployment after a 429: no new admissions for `delay` seconds."""
+        self._not_before = max(self._not_before, time.monotonic() + delay)
+        self._dispatch()
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._refill()
+        paused = self._not_before - time.monotonic()
+        if paused > 0:
+            if self._queue:
+                self._timer = asyncio.get_running_loop().call_later(paused, self._dispatch)
+            self._publish()
+            return
+        while self._queue and self.in_flight < self.max_concurrency:
+            priority, seq, future, tokens = self._queue[0]
+            if future.done():
+                heapq.heappop(self._queue)
+                continue
+            if self.tpm and self.tokens < tokens:
+                # Wake up when the bucket has refilled enough for the head of the queue
+                delay = (tokens - self.tokens) * 60 / self.tpm
+                self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                break
+            heapq.heappop(self._queue)
+            self.in_flight += 1
+            if self.tpm:
+                self.tokens -= tokens
+            future.set_result(None)
+        self._publish()
+
+    def _publish(self):
+        metrics = get_metrics()
+        labels = {"deployment": self.deployment}
+        metrics.set("career_coach_scheduler_queue_depth", labels, len(self._queue), "LLM requests waiting for admission")
+        metrics.set("career_coach_scheduler_in_flight", labels, self.in_flight, "LLM requests in flight")
+
+    def stats(self) -> Dict[str, float]:
+        self._refill()
+        return {
+            "queue_depth": self.depth,
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "tokens_available": round(self.tokens) if self.tpm else None,
+            "tpm": self.tpm or None,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "retries": self.retries,
+            "paused_s": round(max(0.0, self._not_before - time.monotonic()), 3),
+            "avg_wait_s": self.total_wait / self.admitted if self.admitted else 0.0,
+        }
+
+
+class ScheduledChatCompletionClient(ChatCompletionClient):
+    """
+    Chat client that routes every completion through the deployment's DeploymentScheduler.
+    The priority comes from the calling agent (tagged by the per-agent instrumented client).
+    Rate-limit and transient server errors are retried with jittered exponential backoff.
+    """
+    def __init__(self, client: ChatCompletionClient, scheduler: DeploymentScheduler, max_retries: int = None, backoff: float = None):
+        self._client = client
+        self.scheduler = scheduler
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("SCHEDULER_MAX_RETRIES", "4"))
+        self.backoff = backoff or float(os.getenv("SCHEDULER_BACKOFF_BASE", "1.0"))
+        self.completion_estimate = int(os.getenv("SCHEDULER_COMPLETION_TOKEN_ESTIMATE", "500"))
+
+    def _estimate(self, messages: Sequence[LLMMessage], kwargs: Dict[str, Any]) -> int:
+        try:
+            prompt = self._client.count_tokens(messages, tools=kwargs.get("tools", []))
+        except Exception:
+            prompt = sum(len(str(getattr(m, "content", ""))) // 4 + 4 for m in messages)
+        completion = (kwargs.get("extra_create_args") or {}).get("max_tokens") or self.completion_estimate
+        return prompt + completion
+
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        if attempt >= self.max_retries:
+            return None
+        if isinstance(error, openai.RateLimitError):
+            retry_after = error.response.headers.get("retry-after") if error.response is not None else None
+            try:
+                floor = float(retry_after) if retry_after else 0.0
+            except ValueError:
+                floor = 0.0
+        elif isinstance(error, (openai.InternalServerError, openai.APITimeoutError, openai.APIConnectionError)):
+            floor = 0.0
+        else:
+            return None
+        # Full jitter keeps retrying sessions from hitting the deployment in lockstep
+        return max(floor, random.uniform(0, self.backoff * 2 ** attempt))
+
+    async def create(self, messages: Sequence[LLMMessage], **kwargs) -> CreateResult:
+        priority = agent_priority(current_agent())
+        estimate = self._estimate(messages, kwargs)
+        attempt = 0
+        while True:
+            admitted = await self.scheduler.acquire(priority, estimate)
+            actual = admitted
+            try:
+                result = await self._client.create(messages, **kwargs)
+                actual = result.usage.prompt_tokens + result.usage.completion_tokens
+                return result
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                self.scheduler.release(admitted, actual)
+                admitted = None
+                await self._back_off(e, delay)
+                attempt += 1
+            finally:
+                # Also reached when the caller is cancelled mid-call (e.g. a wait_for timeout)
+                if admitted is not None:
+                    self.scheduler.release(admitted, actual)
+
+    async def create_stream(self, messages: Sequence[LLMMessage], **kwargs) -> AsyncGenerator[Any, None]:
+        priority = agent_priority(current_agent())
+        estimate = self._estimate(messages, kwargs)
+        attempt = 0
+        while True:
+            admitted = await self.scheduler.acquire(priority, estimate)
+            actual = admitted
+            started = False
+            try:
+                async for item in self._client.create_stream(messages, **kwargs):
+                    started = True
+                    if isinstance(item, CreateResult):
+                        actual = item.usage.prompt_tokens + item.usage.completion_tokens
+                    yield item
+                return
+            except Exception as e:
+                # Only retry if nothing has been streamed to the caller yet
+                delay = None if started else self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                self.scheduler.release(admitted, actual)
+                admitted = None
+                await self._back_off(e, delay)
+                attempt += 1
+            finally:
+                if admitted is not None:
+                    self.scheduler.release(admitted, actual)
+
+    async def _back_off(self, error: Exception, delay: float):
+        self.scheduler.retries += 1
+        if isinstance(error, openai.RateLimitError):
+            self.scheduler.penalize(delay)
+        get_metrics().inc(
+            "career_coach_scheduler_retries_total",
+            {"deployment": self.scheduler.deployment, "error": type(error).__name__},
+            1,
+            "LLM requests retried after a rate-limit or transient error",
+        )
+        logger.warning(f"{type(error).__name__} on {self.scheduler.deployment}, retrying in {delay:.1f}s")
+        await asyncio.sleep(delay)
+
+    async def close(self) -> None:
+        # The wrapped client is shared and closed by the registry
+        pass
+
+    def actual_usage(self) -> RequestUsage:
+        return self._client.actual_usage()
+
+    def total_usage(self) -> RequestUsage:
+        return self._client.total_usage()
+
+    def count_tokens(self, messages: Sequence[LLMMessage], **kwargs) -> int:
+        return self._client.count_tokens(messages, **kwargs)
+
+    def remaining_tokens(self, messages: Sequence[LLMMessage], **kwargs) -> int:
+        return self._client.remaining_tokens(messages, **kwargs)
+
+    @property
+    def capabilities(self):
+        return self._client.capabilities
+
+    @property
+    def model_info(self) -> ModelInfo:
+        return self._client.model_info
+
+
+class LlmScheduler:
+    """Process-wide set of DeploymentSchedulers and the scheduled clients in front of them."""
+    def __init__(self):
+        self.deployments: Dict[Optional[str], DeploymentScheduler] = {}
+        self._clients: Dict[Optional[str], ScheduledChatCompletionClient] = {}
+
+    def deployment(self, deployment: Optional[str]) -> DeploymentScheduler:
+        if deployment not in self.deployments:
+            self.deployments[deployment] = DeploymentScheduler(
+                deployment,
+                max_concurrency=int(keyed_setting("SCHEDULER_MAX_CONCURRENCY", deployment, 16)),
+                tpm=keyed_setting("SCHEDULER_TPM", deployment, 0),
+                max_queue=int(keyed_setting("SCHEDULER_MAX_QUEUE", deployment, 200)),
+            )
+        return self.deployments[deployment]
+
+    def client(self, deployment: Optional[str], client: ChatCompletionClient) -> ScheduledChatCompletionClient:
+        if deployment not in self._clients:
+            self._clients[deployment] = ScheduledChatCompletionClient(client, self.deployment(deployment))
+        return self._clients[deployment]
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {str(name): scheduler.stats() for name, scheduler in self.deployments.items()}
+
+
+_scheduler: Optional[LlmScheduler] = None
+
+
+def get_scheduler() -> LlmScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = LlmScheduler()
+    return _scheduler
@@ -0,0 +1,261 @@
+from typing import Any, List, Optional
+import asyncio
+import logging
+import os
+from autogen_core import CancellationToken
+from autogen_core.tools import BaseTool
+from autogen_ext.tools.mcp import StdioServerParams, StdioMcpToolAdapter, create_mcp_server_session
+from memory.shortterm_memory import ShortTermMemory
+from workflow.agents import create_agents
+from workflow.tool_cache import CachingTool
+
+logger = logging.getLogger("SessionPool")
+
+
+def web_search_server_params() -> StdioServerParams:
+    return StdioServerParams(
+        command=os.getenv("MCP_WEB_SEARCH_COMMAND", "npx"),
+        args=os.getenv("MCP_WEB_SEARCH_ARGS", "-y @modelcontextprotocol/server-brave-search").split(),
+        env={"BRAVE_API_KEY": os.getenv("BRAVE_API_KEY", "")},
+    )
+
+
+class McpServer:
+    """
+    One long-lived MCP stdio server process with an open client session.
+    The session is entered and exited by a dedicated owner task, as the MCP client requires.
+    """
+    def __init__(self, server_params: StdioServerParams, tool_name: str):
+        self.server_params = server_params
+        self.tool_name = tool_name
+        self.adapter: Optional[StdioMcpToolAdapter] = None
+        self.session = None
+        self.in_flight = 0
+        self._ready = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._error: Optional[BaseException] = None
+
+    @property
+    def healthy(self) -> bool:
+        return self.adapter is not None and self._task is not None and not self._task.done()
+
+    async def start(self):
+        self._task = asyncio.create_task(self._serve())
+        await self._ready.wait()
+        if self._error:
+            raise self._error
+
+    async def _serve(self):
+        try:
+            async with create_mcp_server_session(self.server_params) as session:
+                await session.initialize()
+                tools = await session.list_tools()
+                tool = next((t for t in tools.tools if t.name == self.tool_name), None)
+                if tool is None:
+                    raise ValueError(f"Tool '{self.tool_name}' not found on MCP server")
+                self.session = session
+                self.adapter = StdioMcpToolAdapter(server_params=self.server_params, tool=tool, session=session)
+                self._ready.set()
+                await self._stop.wait()
+        except Exception as e:
+            self._error = e
+            logger.error(f"MCP server for {self.tool_name} exited: {e}")
+        finally:
+            self.adapter = None
+            self.session = None
+            self._ready.set()
+
+    async def ping(self, timeout: float) -> bool:
+        if not self.healthy:
+            return False
+        try:
+            await asyncio.wait_for(self.session.send_ping(), timeout)
+            return True
+        except Exception as e:
+            logger.warning(f"MCP health check for {self.tool_name} failed: {e}")
+            return False
+
+    async def stop(self):
+        self._stop.set()
+        if self._task:
+            await asyncio.gather(self._task, return_exceptions=True)
+
+
+class McpServerPool:
+    """Keeps `size` MCP servers for one tool running, replacing any that fail a health check."""
+    def __init__(self, server_params: StdioServerParams, tool_name: str, size: int = 1, health_check_interval: float = 30.0):
+        self.server_params = server_params
+        self.tool_name = tool_name
+        self.size = size
+        self.health_check_interval = health_check_interval
+        self.servers: List[McpServer] = []
+        self.restarts = 0
+        self._health_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self.servers = list(await asyncio.gather(*(self._spawn() for _ in range(self.size))))
+        self._health_task = asyncio.create_task(self._health_loop())
+
+    async def _spawn(self) -> McpServer:
+        server = McpServer(self.server_params, self.tool_name)
+        await server.start()
+        return server
+
+    def acquire(self) -> McpServer:
+        healthy = [s for s in self.servers if s.healthy]
+        if not healthy:
+            raise RuntimeError(f"No healthy MCP server for {self.tool_name}")
+        return min(healthy, key=lambda s: s.in_flight)
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            for i, server in enumerate(list(self.servers)):
+                if await server.ping(timeout=5.0):
+                    continue
+                await server.stop()
+                try:
+                    self.servers[i] = await self._spawn()
+                    self.restarts += 1
+                    logger.info(f"Restarted MCP server for {self.tool_name}")
+                except Exception as e:
+                    logger.error(f"Could not restart MCP server for {self.tool_name}: {e}")
+
+    def tool(self) -> "PooledMcpTool":
+        return PooledMcpTool(self)
+
+    async def close(self):
+        if self._health_task:
+            self._health_task.cancel()
+            await asyncio.gather(self._health_task, return_exceptions=True)
+        await asyncio.gather(*(s.stop() for s in self.servers))
+        self.servers = []
+
+
+class PooledMcpTool(BaseTool):
+    """
+    Tool that routes each call to the least busy healthy server in an McpServerPool,
+    so agents can hold it across server restarts.
+    """
+    def __init__(self, pool: McpServerPool):
+        self._pool = pool
+        self._template = pool.acquire().adapter
+        super().__init__(
+            args_type=self._template.args_type(),
+            return_type=self._template.return_type(),
+            name=self._template.name,
+            description=self._template.description,
+        )
+
+    @property
+    def schema(self):
+        return self._template.schema
+
+    def return_value_as_string(self, value: Any) -> str:
+        return self._template.return_value_as_string(value)
+
+    async def run(self, args, cancellation_token: CancellationToken) -> Any:
+        server = self._pool.acquire()
+        server.in_flight += 1
+        try:
+            return await server.adapter.run(args, cancellation_token)
+        finally:
+            server.in_flight -= 1
+
+
+class SessionFactory:
+    """
+    Pool of pre-built agent teams shared across chat sessions.
+    `acquire()` hands out a warm team for exclusive use; `release()` resets the agents' per-session
+    state and returns them to the pool. All teams share one McpServerPool for web search.
+    """
+    def __init__(
+        self,
+        agent_config,
+        tool_config,
+        size: int = None,
+        mcp_pool_size: int = None,
+        health_check_interval: float = None,
+        model_client_stream: bool = True,
+    ):
+        self.agent_config = agent_config
+        self.tool_config = tool_config
+        self.model_client_stream = model_client_stream
+        self.size = size if size is not None else int(os.getenv("AGENT_POOL_SIZE", "4"))
+        self.mcp_pool = McpServerPool(
+            web_search_server_params(),
+            "brave_web_search",
+            size=mcp_pool_size if mcp_pool_size is not None else int(os.getenv("MCP_POOL_SIZE", "2")),
+            health_check_interval=health_check_interval if health_check_interval is not None else float(os.getenv("MCP_HEALTH_CHECK_INTERVAL", "30")),
+        )
+        self.web_search_tool: Optional[CachingTool] = None
+        self.created = 0
+        self.reused = 0
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._refill_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        await self.mcp_pool.start()
+        # One cache in front of the pool, so identical searches are shared across sessions
+        self.web_search_tool = CachingTool(self.mcp_pool.tool())
+        for agents in await asyncio.gather(*(self._build() for _ in range(self.size))):
+            self._idle.put_nowait(agents)
+        logger.info(f"Session factory ready with {self.size} warm agent teams")
+
+    async def _build(self) -> List[Any]:
+        # WebSocket sessions forward model output token by token; batch runs turn streaming off
+        agents, _ = await create_agents(
+            self.agent_config, self.tool_config, web_search_tool=self.web_search_tool, model_client_stream=self.model_client_stream
+        )
+        self.created += 1
+        return agents
+
+    async def acquire(self) -> List[Any]:
+        try:
+            agents = self._idle.get_nowait()
+            self.reused += 1
+        except asyncio.QueueEmpty:
+            # Pool exhausted: build one on demand rather than making the session wait for a release
+            agents = await self._build()
+        self._schedule_refill()
+        return agents
+
+    async def release(self, agents: List[Any]):
+        try:
+            await self._reset(agents)
+        except Exception as e:
+            logger.warning(f"Discarding agent team that failed to reset: {e}")
+            return
+        if self._idle.qsize() < self.size:
+            self._idle.put_nowait(agents)
+
+    async def _reset(self, agents: List[Any]):
+        for agent in agents:
+            await agent.on_reset(CancellationToken())
+            for memory in getattr(agent, "_memory", None) or []:
+                if isinstance(memory, ShortTermMemory):
+                    await memory.clear()
+
+    def _schedule_refill(self):
+        if self._refill_task is None or self._refill_task.done():
+            self._refill_task = asyncio.create_task(self._refill())
+
+    async def _refill(self):
+        while self._idle.qsize() < self.size:
+            self._idle.put_nowait(await self._build())
+
+    def stats(self) -> dict:
+        return {
+            "idle_teams": self._idle.qsize(),
+            "teams_created": self.created,
+            "teams_reused": self.reused,
+            "mcp_servers_healthy": sum(s.healthy for s in self.mcp_pool.servers),
+            "mcp_restarts": self.mcp_pool.restarts,
+        }
+
+    async def close(self):
+        if self._refill_task:
+            self._refill_task.cancel()
+            await asyncio.gather(self._refill_task, return_exceptions=True)
+        await self.mcp_pool.close()
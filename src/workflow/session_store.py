@@ -0,0 +1,313 @@
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import asyncio
+import inspect
+import json
+import logging
+import os
+import sqlite3
+import time
+import uuid
+from memory.shortterm_memory import ShortTermMemory
+
+logger = logging.getLogger("SessionStore")
+
+# <repo>/data, whatever directory the server is started from
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data")
+
+
+class SessionStore:
+    """
+    SQLite store of session snapshots, keyed by session_id, and of the session ids this server has
+    issued. Writes run in a worker thread. Point several workers at the same file and any of them
+    can resume any session.
+    """
+    def __init__(self, path: str = None):
+        self.path = path or os.getenv("SESSION_STORE_PATH") or os.path.join(DATA_DIR, "sessions.sqlite3")
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, updated REAL, state TEXT)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS issued (session_id TEXT PRIMARY KEY, created REAL)")
+        self._db.commit()
+        self._lock = asyncio.Lock()
+
+    async def save(self, session_id: str, state: Dict[str, Any]):
+        # Message timestamps are datetimes; str() gives ISO strings that pydantic parses back
+        data = json.dumps(state, default=str)
+        async with self._lock:
+            await asyncio.to_thread(self._save, session_id, data)
+
+    async def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        async with self._lock:
+            row = await asyncio.to_thread(self._load, session_id)
+        return json.loads(row[0]) if row else None
+
+    async def delete(self, session_id: str):
+        async with self._lock:
+            await asyncio.to_thread(self._delete, session_id)
+
+    async def issue(self) -> str:
+        """A new, unguessable session id. It is the only credential for the session and its CV."""
+        session_id = str(uuid.uuid4())
+        async with self._lock:
+            await asyncio.to_thread(self._issue, session_id)
+        return session_id
+
+    async def known(self, session_id: str) -> bool:
+        """Whether `session_id` was issued by this server (or has a snapshot)."""
+        async with self._lock:
+            return await asyncio.to_thread(self._known, session_id)
+
+    async def prune(self, max_age: float) -> int:
+        """Delete snapshots not updated, and issued ids not used, for `max_age` seconds."""
+        async with self._lock:
+            return await asyncio.to_thread(self._prune, time.time() - max_age)
+
+    def close(self):
+        self._db.close()
+
+    def _save(self, session_id: str, data: str):
+        self._db.execute("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)", (session_id, time.time(), data))
+        self._db.commit()
+
+    def _load(self, session_id: str):
+        return self._db.execute("SELECT state FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+
+    def _issue(self, session_id: str):
+        self._db.execute("INSERT INTO issued VALUES (?, ?)", (session_id, time.time()))
+        self._db.commit()
+
+    def _known(self, session_id: str) -> bool:
+        return self._db.execute(
+            "SELECT 1 FROM issued WHERE session_id = ? UNION ALL SELECT 1 FROM sessions WHERE session_id = ?",
+            (session_id, session_id),
+        ).fetchone() is not None
+
+    def _delete(self, session_id: str):
+        self._db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        self._db.commit()
+
+    def _prune(self, cutoff: float) -> int:
+        removed = self._db.execute("DELETE FROM sessions WHERE updated < ?", (cutoff,)).rowcount
+        self._db.execute(
+            "DELETE FROM issued WHERE created < ? AND session_id NOT IN (SELECT session_id FROM sessions)", (cutoff,)
+        )
+        self._db.commit()
+        return removed
+
+
+class LiveSession:
+    """
+    A running chat session that can outlive its WebSocket: the team, its task and the event bus
+    stay in memory while the client is away, so a reconnect only needs a new sender.
+    """
+    def __init__(self, session_id: str, mode: str, bus, agents: List[Any], team=None, release: Callable[[List[Any]], Awaitable[None]] = None):
+        self.session_id = session_id
+        self.mode = mode
+        self.bus = bus
+        self.agents = agents
+        self.team = team
+        self.task: Optional[asyncio.Task] = None
+        # Forwards bus events to the current connection
+        self.sender: Optional[asyncio.Task] = None
+        # The WebSocket currently attached, None while the client is away
+        self.owner: Optional[Any] = None
+        self.detached_at: Optional[float] = None
+        self.waiting_for_input = False
+        self.turns = 0
+        self.extra: Dict[str, Any] = {}
+        # Run on close; may return awaitables
+        self.cleanups: List[Callable[[], Any]] = []
+        self._release = release
+        self._closed = False
+
+    @property
+    def finished(self) -> bool:
+        return self.task is not None and self.task.done()
+
+    async def snapshot(self) -> Dict[str, Any]:
+        state: Dict[str, Any] = {
+            "mode": self.mode,
+            "turns": self.turns,
+            "saved_at": time.time(),
+            "extra": self.extra,
+            "short_term_memory": {},
+        }
+        if self.team is not None:
+            state["team"] = await self.team.save_state()
+        else:
+            state["agents"] = {agent.name: await agent.save_state() for agent in self.agents}
+        for agent in self.agents:
+            for memory in getattr(agent, "_memory", None) or []:
+                if isinstance(memory, ShortTermMemory):
+                    state["short_term_memory"][agent.name] = await memory.save_state()
+        return state
+
+    async def restore(self, state: Dict[str, Any]):
+        """Load a snapshot into freshly acquired agents (and team) before the session task starts."""
+        if self.team is not None and state.get("team"):
+            await self.team.load_state(state["team"])
+        for agent in self.agents:
+            agent_state = (state.get("agents") or {}).get(agent.name)
+            if agent_state:
+                await agent.load_state(agent_state)
+            memory_state = state.get("short_term_memory", {}).get(agent.name)
+            for memory in getattr(agent, "_memory", None) or []:
+                if memory_state and isinstance(memory, ShortTermMemory):
+                    await memory.load_state(memory_state)
+        self.turns = state.get("turns", 0)
+        self.extra = state.get("extra", {})
+
+    async def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        # Cancelling the task does not reach an agent blocked on user input, and the team's
+        # runtime waits for it before stopping; closing the bus first wakes it
+        self.bus.close()
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except (Exception, asyncio.CancelledError):
+                pass
+        for cleanup in self.cleanups:
+            result = cleanup()
+            if inspect.isawaitable(result):
+                await result
+        if self._release is not None:
+            await self._release(self.agents)
+
+
+class SessionManager:
+    """
+    Keeps sessions alive across reconnects. A session whose client disconnects stays in RAM for
+    `idle_timeout` seconds; after that (or when more than `max_live` sessions are held) it is
+    snapshotted to the SessionStore and its agents go back to the pool. A reconnect with the same
+    session_id reattaches to the live session, or restores the last snapshot.
+    """
+    def __init__(self, store: SessionStore = None, idle_timeout: float = None, max_live: int = None, reap_interval: float = None):
+        self.store = store or SessionStore()
+        self.idle_timeout = idle_timeout if idle_timeout is not None else float(os.getenv("SESSION_IDLE_TIMEOUT", "300"))
+        self.max_live = max_live or int(os.getenv("SESSION_MAX_LIVE", "100"))
+        self.reap_interval = reap_interval or float(os.getenv("SESSION_REAP_INTERVAL", "10"))
+        self.retention = float(os.getenv("SESSION_RETENTION", str(7 * 24 * 3600)))
+        self.live: Dict[str, LiveSession] = {}
+        self.reattached = 0
+        self.restored = 0
+        self.evicted = 0
+        self._reaper: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._reaper = asyncio.create_task(self._reap_loop())
+
+    async def attach(self, session_id: str, owner: Any) -> Optional[LiveSession]:
+        """
+        Take over a live session for a new connection (its WebSocket). The previous connection's
+        sender is stopped and its socket closed with code 4000, so it can no longer send turns.
+        """
+        session = self.live.get(session_id)
+        if session is None or session.finished:
+            return None
+        previous = session.owner
+        if session.sender is not None:
+            session.sender.cancel()
+        session.owner = owner
+        session.detached_at = None
+        self.reattached += 1
+        if previous is not None:
+            try:
+                await previous.close(code=4000, reason="Session taken over by another connection")
+            except Exception as e:
+                # Already closing on its own
+                logger.debug(f"Closing the previous connection of {session_id} failed: {e}")
+        return session
+
+    async def session_id(self, requested: Optional[str] = None) -> str:
+        """
+        `requested` if this server issued it, else a newly issued id. Clients cannot pick their own
+        ids, since a session id is what scopes the session's CV.
+        """
+        if requested and (requested in self.live or await self.store.known(requested)):
+            return requested
+        return await self.store.issue()
+
+    def register(self, session: LiveSession, owner: Any, restored: bool = False):
+        session.owner = owner
+        self.live[session.session_id] = session
+        if restored:
+            self.restored += 1
+
+    async def detach(self, session: LiveSession, owner: Any):
+        """Called when a connection ends; ignored if another connection has taken the session over."""
+        if session.owner is not owner:
+            return
+        session.owner = None
+        session.detached_at = time.monotonic()
+        if session.finished:
+            await self._drop(session)
+            await self.store.delete(session.session_id)
+
+    async def checkpoint(self, session: LiveSession):
+        """Snapshot at a turn boundary (the team is waiting for the user)."""
+        try:
+            await self.store.save(session.session_id, await session.snapshot())
+        except Exception as e:
+            logger.warning(f"Could not snapshot session {session.session_id}: {e}")
+
+    async def evict(self, session: LiveSession):
+        if session.waiting_for_input:
+            await self.checkpoint(session)
+        await self._drop(session)
+        self.evicted += 1
+        logger.info(f"Evicted idle session {session.session_id} to the session store")
+
+    async def _drop(self, session: LiveSession):
+        if self.live.get(session.session_id) is session:
+            del self.live[session.session_id]
+        await session.close()
+
+    async def _reap_loop(self):
+        while True:
+            await asyncio.sleep(self.reap_interval)
+            try:
+                await self.reap()
+            except Exception as e:
+                logger.warning(f"Session reaper failed: {e}")
+
+    async def reap(self):
+        now = time.monotonic()
+        detached = sorted(
+            (s for s in self.live.values() if s.owner is None and s.detached_at is not None),
+            key=lambda s: s.detached_at,
+        )
+        over = max(len(self.live) - self.max_live, 0)
+        for session in detached:
+            # Mid-turn sessions are kept until they reach a turn boundary, so snapshots stay consistent
+            if session.finished:
+                await self._drop(session)
+                await self.store.delete(session.session_id)
+            elif session.waiting_for_input and (over > 0 or now - session.detached_at >= self.idle_timeout):
+                await self.evict(session)
+                over -= 1
+        if self.retention > 0:
+            await self.store.prune(self.retention)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "live": len(self.live),
+            "detached": sum(1 for s in self.live.values() if s.owner is None),
+            "reattached": self.reattached,
+            "restored": self.restored,
+            "evicted": self.evicted,
+        }
+
+    async def close(self):
+        if self._reaper is not None:
+            self._reaper.cancel()
+            await asyncio.gather(self._reaper, return_exceptions=True)
+        # Snapshot whatever can be resumed by the next process
+        for session in list(self.live.values()):
+            if session.waiting_for_input:
+                await self.checkpoint(session)
+            await self._drop(session)
+        self.store.close()
@@ -0,0 +1,320 @@
+from collections import OrderedDict
+from typing import Any, AsyncGenerator, Callable, Dict, List, Mapping, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+import weakref
+from autogen_agentchat.base import TaskResult
+from autogen_agentchat.messages import BaseChatMessage, TextMessage
+from autogen_agentchat.tools import AgentTool
+from autogen_core import CancellationToken
+from autogen_core.tools import BaseTool
+from common.metrics import get_metrics
+
+logger = logging.getLogger("ToolCache")
+
+
+def tool_ttl(tool_name: str) -> float:
+    """TTL for a tool from TOOL_CACHE_TTLS ("brave_web_search=900,other=60"), else TOOL_CACHE_DEFAULT_TTL."""
+    for item in os.getenv("TOOL_CACHE_TTLS", "").split(","):
+        name, _, ttl = item.partition("=")
+        if name.strip() == tool_name and ttl.strip():
+            return float(ttl)
+    return float(os.getenv("TOOL_CACHE_DEFAULT_TTL", "300"))
+
+
+def normalize_args(args: Mapping[str, Any]) -> str:
+    """Cache key for tool arguments: keys sorted, strings lowercased with whitespace collapsed."""
+    def normalize(value):
+        if isinstance(value, str):
+            return " ".join(value.lower().split())
+        if isinstance(value, Mapping):
+            return {k: normalize(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [normalize(v) for v in value]
+        return value
+    return json.dumps(normalize(dict(args)), sort_keys=True, default=str)
+
+
+class CachingTool(BaseTool):
+    """
+    Wraps a tool (typically an MCP adapter) with a TTL cache and single-flight request coalescing:
+    concurrent identical calls share one execution, and repeats within the TTL are served from memory.
+    Meant to be shared across agents and sessions.
+    """
+    def __init__(self, tool: BaseTool, ttl: Optional[float] = None, max_entries: Optional[int] = None):
+        self._tool = tool
+        self.ttl = ttl if ttl is not None else tool_ttl(tool.name)
+        self.max_entries = max_entries or int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "1024"))
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        super().__init__(
+            args_type=tool.args_type(),
+            return_type=tool.return_type(),
+            name=tool.name,
+            description=tool.description,
+        )
+        _caching_tools.add(self)
+
+    @property
+    def schema(self):
+        return self._tool.schema
+
+    def return_value_as_string(self, value: Any) -> str:
+        return self._tool.return_value_as_string(value)
+
+    async def run(self, args, cancellation_token: CancellationToken) -> Any:
+        return await self.run_json(args.model_dump(), cancellation_token)
+
+    async def run_json(self, args: Mapping[str, Any], cancellation_token: CancellationToken, call_id: Optional[str] = None) -> Any:
+        with get_metrics().span("tool", self.name) as span:
+            key = normalize_args(args)
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    span.cached(True)
+                    return value
+                del self._entries[key]
+            task = self._inflight.get(key)
+            if task is not None:
+                self.coalesced += 1
+                span.cached(True)
+            else:
+                self.misses += 1
+                span.cached(False)
+                # Runs detached so one caller's cancellation does not fail the others waiting on it
+                task = asyncio.create_task(self._tool.run_json(args, CancellationToken(), call_id))
+                self._inflight[key] = task
+                task.add_done_callback(lambda t, key=key: self._store(key, t))
+            return await asyncio.shield(task)
+
+    def _store(self, key: str, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        if task.cancelled() or task.exception() is not None or self.ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, task.result())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, args: Optional[Mapping[str, Any]] = None):
+        if args is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(normalize_args(args), None)
+
+    def stats(self) -> Dict[str, float]:
+        calls = self.hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": (self.hits + self.coalesced) / calls if calls else 0.0,
+            "entries": len(self._entries),
+            "ttl": self.ttl,
+        }
+
+
+_caching_tools: "weakref.WeakSet[CachingTool]" = weakref.WeakSet()
+
+
+def tool_cache_stats() -> Dict[str, Dict[str, float]]:
+    return {tool.name: tool.stats() for tool in _caching_tools}
+
+
+class ResponseCache:
+    """
+    Cache for deterministic tool-model responses, keyed on (tool name, deployment, normalized input hash).
+    In-memory LRU with TTL, optionally backed by a SQLite file that survives restarts.
+    Invalidation hooks registered with `on_invalidate` are called with (tool_name, key) for each removal.
+    """
+    def __init__(self, max_entries: int = None, ttl: float = None, sqlite_path: Optional[str] = None):
+        self.max_entries = max_entries or int(os.getenv("AGENT_TOOL_CACHE_MAX_ENTRIES", "512"))
+        self.ttl = ttl if ttl is not None else float(os.getenv("AGENT_TOOL_CACHE_TTL", "86400"))
+        self.hits = 0
+        self.misses = 0
+        self.persistent_hits = 0
+        self._entries: "OrderedDict[str, Tuple[float, str, Any]]" = OrderedDict()
+        self._hooks: List[Callable[[str, Optional[str]], None]] = []
+        self._db: Optional[sqlite3.Connection] = None
+        if sqlite_path:
+            self._db = sqlite3.connect(sqlite_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, tool TEXT, expires REAL, value TEXT)"
+            )
+            self._db.commit()
+        self._db_lock = asyncio.Lock()
+
+    @staticmethod
+    def key(tool_name: str, deployment: Optional[str], text: str) -> str:
+        normalized = " ".join(text.split()).lower()
+        digest = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+        return f"{tool_name}:{deployment}:{digest}"
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires, _, value = entry
+            if expires > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+        if self._db is not None:
+            async with self._db_lock:
+                row = await asyncio.to_thread(self._db_get, key)
+            if row is not None:
+                tool_name, expires, value = row[0], row[1], json.loads(row[2])
+                self._remember(key, tool_name, expires, value)
+                self.hits += 1
+                self.persistent_hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, tool_name: str, value: Any):
+        expires = time.time() + self.ttl
+        self._remember(key, tool_name, expires, value)
+        if self._db is not None:
+            async with self._db_lock:
+                await asyncio.to_thread(self._db_put, key, tool_name, expires, json.dumps(value))
+
+    def on_invalidate(self, hook: Callable[[str, Optional[str]], None]):
+        self._hooks.append(hook)
+
+    async def invalidate(self, tool_name: Optional[str] = None, key: Optional[str] = None):
+        """Drop one key, every entry for a tool, or (with no arguments) everything."""
+        if key is not None:
+            removed = [key] if self._entries.pop(key, None) is not None else []
+        else:
+            removed = [k for k, (_, tool, _) in self._entries.items() if tool_name is None or tool == tool_name]
+            for k in removed:
+                del self._entries[k]
+        if self._db is not None:
+            async with self._db_lock:
+                await asyncio.to_thread(self._db_delete, tool_name, key)
+        for hook in self._hooks:
+            hook(tool_name, key)
+        logger.info(f"Invalidated {len(removed)} cached responses (tool={tool_name}, key={key})")
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "persistent_hits": self.persistent_hits,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+        }
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _remember(self, key: str, tool_name: str, expires: float, value: Any):
+        self._entries[key] = (expires, tool_name, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _db_get(self, key: str):
+        row = self._db.execute("SELECT tool, expires, value FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is not None and row[1] <= time.time():
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._db.commit()
+            return None
+        return row
+
+    def _db_put(self, key: str, tool_name: str, expires: float, value: str):
+        self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)", (key, tool_name, expires, value))
+        self._db.commit()
+
+    def _db_delete(self, tool_name: Optional[str], key: Optional[str]):
+        if key is not None:
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+        elif tool_name is not None:
+            self._db.execute("DELETE FROM responses WHERE tool = ?", (tool_name,))
+        else:
+            self._db.execute("DELETE FROM responses")
+        self._db.commit()
+
+
+class CachedAgentTool(AgentTool):
+    """
+    AgentTool whose results are served from a ResponseCache when the same input comes back
+    (reconnects, retries, re-uploaded CVs), skipping the tool-model completion entirely.
+    """
+    def __init__(self, agent, cache: ResponseCache, deployment: Optional[str] = None, **kwargs):
+        super().__init__(agent, **kwargs)
+        self.cache = cache
+        self.deployment = deployment
+
+    def cache_key(self, task: str) -> str:
+        return ResponseCache.key(self.name, self.deployment, task)
+
+    async def run(self, args, cancellation_token: CancellationToken) -> TaskResult:
+        with get_metrics().span("tool", self.name, deployment=self.deployment) as span:
+            key = self.cache_key(args.task)
+            cached = await self.cache.get(key)
+            span.cached(cached is not None)
+            if cached is not None:
+                return self._rebuild(cached)
+            result = await super().run(args, cancellation_token)
+            await self.cache.put(key, self.name, self._serialize(result))
+            return result
+
+    async def run_stream(self, args, cancellation_token: CancellationToken) -> AsyncGenerator[Any, None]:
+        with get_metrics().span("tool", self.name, deployment=self.deployment) as span:
+            key = self.cache_key(args.task)
+            cached = await self.cache.get(key)
+            span.cached(cached is not None)
+            if cached is not None:
+                yield self._rebuild(cached)
+                return
+            async for event in super().run_stream(args, cancellation_token):
+                if isinstance(event, TaskResult):
+                    await self.cache.put(key, self.name, self._serialize(event))
+                yield event
+
+    async def invalidate(self, task: Optional[str] = None):
+        await self.cache.invalidate(tool_name=self.name, key=self.cache_key(task) if task is not None else None)
+
+    @staticmethod
+    def _serialize(result: TaskResult) -> Dict[str, Any]:
+        # Only chat messages matter for return_value_as_string, so only they are kept
+        return {
+            "messages": [
+                {"source": m.source, "content": m.to_model_text()}
+                for m in result.messages if isinstance(m, BaseChatMessage)
+            ],
+            "stop_reason": result.stop_reason,
+        }
+
+    @staticmethod
+    def _rebuild(cached: Dict[str, Any]) -> TaskResult:
+        return TaskResult(
+            messages=[TextMessage(source=m["source"], content=m["content"]) for m in cached["messages"]],
+            stop_reason=cached.get("stop_reason"),
+        )
+
+
+_response_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Shared ResponseCache if AGENT_TOOL_CACHE is enabled (opt-in), else None."""
+    global _response_cache
+    if _response_cache is None and os.getenv("AGENT_TOOL_CACHE", "").lower() in ("1", "true", "yes"):
+        _response_cache = ResponseCache(sqlite_path=os.getenv("AGENT_TOOL_CACHE_PATH") or None)
+    return _response_cache
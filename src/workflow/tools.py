@@ -1,22 +1,47 @@
 from autogen_agentchat.agents import AssistantAgent
 from autogen_agentchat.tools import AgentTool
+from workflow.tool_cache import CachedAgentTool, get_response_cache
+from workflow.instrumented_client import InstrumentedChatCompletionClient
+from common.metrics import get_metrics
+import os
+
+class InstrumentedAgentTool(AgentTool):
+    """AgentTool that records each call as a "tool" span."""
+    async def run(self, args, cancellation_token):
+        with get_metrics().span("tool", self.name):
+            return await super().run(args, cancellation_token)
+
+    async def run_stream(self, args, cancellation_token):
+        with get_metrics().span("tool", self.name):
+            async for event in super().run_stream(args, cancellation_token):
+                yield event
+
+def _wrap(agent):
+    # Repeat analyses are served from the response cache when AGENT_TOOL_CACHE is enabled
+    cache = get_response_cache()
+    if cache is None:
+        return InstrumentedAgentTool(agent)
+    return CachedAgentTool(agent, cache, deployment=os.getenv("AZURE_OPENAI_TOOL_DEPLOYMENT"))
+
+def _client(tool_client, name):
+    return InstrumentedChatCompletionClient(tool_client, name, os.getenv("AZURE_OPENAI_TOOL_DEPLOYMENT"))
 
 def make_analyze_resume_tool(tool_client):
     """Analyze a resume for strengths, weaknesses, and ATS optimization."""
     analyze_resume_agent = AssistantAgent(
         name="AnalyzeResumeAgent",
         description="Analyze a resume for strengths, weaknesses, and ATS optimization. You need to give actionable feedback.",
-        model_client=tool_client,
+        model_client=_client(tool_client, "AnalyzeResumeAgent"),
         system_message="You are a resume analyzer. You are given a resume and you need to analyze it for strengths, weaknesses, and ATS optimization. You need to give actionable feedback.",
     )
-    return AgentTool(analyze_resume_agent)
+    return _wrap(analyze_resume_agent)
 
 def make_analyze_skill_gap_tool(tool_client):
     """Compare user skills to job requirements and identify gaps."""
     analyze_skill_gap_agent = AssistantAgent(
         name="AnalyzeSkillGapAgent",
         description="Compare user skills to job requirements and identify gaps.",
-        model_client=tool_client,
+        model_client=_client(tool_client, "AnalyzeSkillGapAgent"),
         system_message="You are a skill gap analyzer. You are given user skills and job requirements and you need to identify gaps.",
     )
-    return AgentTool(analyze_skill_gap_agent)
+    return _wrap(analyze_skill_gap_agent)
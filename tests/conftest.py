@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Modules import each other relative to src/ (as when running `cd src && uvicorn api.main:app`)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
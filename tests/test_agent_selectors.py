@@ -0,0 +1,25 @@
+from autogen_agentchat.messages import TextMessage
+from workflow.agent_selectors import USER, human_in_the_loop_selector, make_human_in_the_loop_selector
+
+
+def message(source, content):
+    return TextMessage(source=source, content=content)
+
+
+def test_team_selector_routes_and_keeps_its_place(capsys):
+    select = make_human_in_the_loop_selector()
+    thread = [message("user", "I want to move into data engineering.")]
+    assert select(thread) == "TriageAgent"
+    thread.append(message("TriageAgent", "SkillAgent, please compare my skills with the role."))
+    assert select(thread) == "SkillAgent"
+    thread.append(message("SkillAgent", "Which city do you want to work in?"))
+    assert select(thread) == USER
+    # Only the newly added messages were scanned, and nothing was printed
+    assert select.__self__._seen == 3
+    assert capsys.readouterr().out == ""
+
+
+def test_shared_selector_starts_over_on_another_thread():
+    first = [message("user", "Hi"), message("TriageAgent", "Noted.")]
+    assert human_in_the_loop_selector(first) == "ProfilerAgent"
+    assert human_in_the_loop_selector([message("user", "Hello")]) == "TriageAgent"
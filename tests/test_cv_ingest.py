@@ -0,0 +1,107 @@
+import asyncio
+import time
+import pytest
+from fastapi.testclient import TestClient
+from api import cv_ingest
+from api.cv_ingest import CvIngestError, CvIngestor, chunk_cv
+from workflow.session_store import SessionManager, SessionStore
+
+
+def slow_parse(filename, data):
+    time.sleep(60)
+
+
+def test_chunks_stay_within_sections():
+    text = "Jane Doe\nEXPERIENCE\n" + "\n".join(f"Built system {i}" for i in range(30)) + "\nSkills:\nPython, SQL"
+    chunks = chunk_cv(text, max_chars=100)
+    assert chunks[0] == {"section": "General", "content": "Jane Doe"}
+    assert {chunk["section"] for chunk in chunks} == {"General", "Experience", "Skills"}
+    assert all(len(chunk["content"]) <= 100 for chunk in chunks)
+    assert chunks[-1] == {"section": "Skills", "content": "Python, SQL"}
+
+
+def test_parse_timeout_kills_the_worker_and_rebuilds_the_pool(monkeypatch):
+    async def run():
+        ingestor = CvIngestor(parse_timeout=0.5, max_workers=1)
+        try:
+            monkeypatch.setattr(cv_ingest, "parse_cv_bytes", slow_parse)
+            stuck = asyncio.create_task(ingestor.parse("cv.pdf", b""))
+            await asyncio.sleep(0.3)
+            workers = list(ingestor._pool._processes.values())
+            with pytest.raises(CvIngestError) as error:
+                await stuck
+            assert error.value.status_code == 422
+            assert ingestor.pool_restarts == 1
+            for worker in workers:
+                worker.join(5)
+                assert not worker.is_alive()
+            # The single worker slot is free again for the next upload
+            monkeypatch.undo()
+            assert await ingestor.parse("cv.txt", b"Python developer") == "Python developer"
+        finally:
+            ingestor.close()
+    asyncio.run(run())
+
+
+@pytest.fixture
+def client(tmp_path):
+    from api.main import app
+    app.state.cv_ingestor = CvIngestor(max_bytes=1024, max_workers=1)
+    app.state.session_manager = SessionManager(SessionStore(str(tmp_path / "sessions.sqlite3")))
+    yield TestClient(app)
+    app.state.cv_ingestor.close()
+    app.state.session_manager.store.close()
+
+
+def test_upload_to_a_session_the_server_never_issued_is_rejected(client):
+    # A client-chosen id (or someone else's user_id) must not decide whose CV this is
+    response = client.post(
+        "/upload_cv",
+        files={"file": ("cv.txt", b"Python developer")},
+        data={"session_id": "victim", "user_id": "victim"},
+    )
+    assert response.status_code == 404
+
+
+def test_upload_over_the_limit_is_cut_off_while_streaming(client):
+    def body():
+        # Chunked, so there is no Content-Length to reject up front
+        yield b"--boundary\r\nContent-Disposition: form-data; name=\"file\"; filename=\"cv.txt\"\r\n\r\n"
+        for _ in range(200):
+            yield b"x" * 1024
+        yield b"\r\n--boundary--\r\n"
+    response = client.post(
+        "/upload_cv",
+        content=body(),
+        headers={"Content-Type": "multipart/form-data; boundary=boundary"},
+    )
+    assert response.status_code == 413
+
+
+class RecordingMemory:
+    def __init__(self):
+        self.docs = {}
+
+    async def add(self, messages):
+        self.docs.update((message["id"], message) for message in messages)
+
+
+def test_reupload_after_deletion_is_indexed_again():
+    async def run():
+        ingestor = CvIngestor(max_workers=1)
+
+        async def parse(filename, data):
+            return data.decode()
+        ingestor.parse = parse
+        try:
+            memory = RecordingMemory()
+            text = b"Summary\nPython developer\n\nSkills\nPython\n\nSkills\nPython"
+            first = await ingestor.ingest(memory, "cv.txt", text, user_id="u1")
+            assert first["indexed"] == len(memory.docs) and first["duplicates"] == first["chunks"] - first["indexed"]
+            # Retention or an explicit delete removed the chunks; the same upload must restore them
+            memory.docs.clear()
+            second = await ingestor.ingest(memory, "cv.txt", text, user_id="u1")
+            assert second["indexed"] == first["indexed"] == len(memory.docs)
+        finally:
+            ingestor.close()
+    asyncio.run(run())
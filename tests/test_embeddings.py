@@ -0,0 +1,74 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from memory.embeddings import EmbeddingEngine
+
+
+class GatedEmbeddings:
+    """Embeddings endpoint that holds every request until `release` is set."""
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.requests = []
+
+    async def create(self, input, model=None):
+        self.requests.append(list(input))
+        await self.release.wait()
+        return SimpleNamespace(data=[SimpleNamespace(index=i, embedding=[float(len(text))]) for i, text in enumerate(input)])
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    monkeypatch.setenv("AZURE_OPENAI_ENDPOINT", "https://example.openai.azure.com")
+    monkeypatch.setenv("AZURE_OPENAI_API_KEY", "test")
+
+    def build():
+        engine = EmbeddingEngine(deployment="test-embedding", batch_window=0)
+        engine.client = SimpleNamespace(embeddings=GatedEmbeddings())
+        return engine
+    return build
+
+
+def test_concurrent_calls_share_one_request(engine):
+    async def run():
+        e = engine()
+        first = asyncio.create_task(e.embed_many(["python", "sql"]))
+        second = asyncio.create_task(e.embed("python"))
+        await asyncio.sleep(0.01)
+        e.client.embeddings.release.set()
+        assert await first == [[6.0], [3.0]]
+        assert await second == [6.0]
+        assert e.client.embeddings.requests == [["python", "sql"]]
+    asyncio.run(run())
+
+
+def test_cancelled_caller_does_not_cancel_shared_text(engine):
+    async def run():
+        e = engine()
+        first = asyncio.create_task(e.embed_many(["python", "sql"]))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(e.embed("python"))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        await asyncio.gather(first, return_exceptions=True)
+        e.client.embeddings.release.set()
+        assert await second == [6.0]
+        assert first.cancelled()
+        assert e._inflight == {} and e._waiters == {}
+    asyncio.run(run())
+
+
+def test_texts_nobody_waits_for_are_not_sent(engine):
+    async def run():
+        e = engine()
+        e.batch_window = 0.05
+        caller = asyncio.create_task(e.embed("python"))
+        await asyncio.sleep(0)
+        caller.cancel()
+        await asyncio.gather(caller, return_exceptions=True)
+        await asyncio.sleep(0.1)
+        assert e.client.embeddings.requests == []
+        assert e._inflight == {}
+        # The text is embedded normally the next time it is asked for
+        e.client.embeddings.release.set()
+        assert await e.embed("python") == [6.0]
+    asyncio.run(run())
@@ -0,0 +1,85 @@
+import asyncio
+from types import SimpleNamespace
+from autogen_core.models import AssistantMessage, SystemMessage, UserMessage
+from workflow.model_context import TokenBudgetChatCompletionContext
+
+
+class FakeClient:
+    """One token per word; the summarizer numbers its summaries and records each prompt."""
+    def __init__(self):
+        self.prompts = []
+
+    def count_tokens(self, messages, **kwargs):
+        return sum(len(str(message.content).split()) for message in messages)
+
+    async def create(self, messages, **kwargs):
+        self.prompts.append(messages[0].content)
+        return SimpleNamespace(content=f"summary {len(self.prompts)}")
+
+
+def turn(i):
+    return UserMessage(content=" ".join(["word"] * 10) + f" turn{i}", source="user")
+
+
+def context(client, budget=60):
+    return TokenBudgetChatCompletionContext(client, token_budget=budget, summary_max_words=10)
+
+
+def test_history_over_budget_is_folded_into_a_summary():
+    async def run():
+        client = FakeClient()
+        ctx = context(client)
+        for i in range(5):
+            await ctx.add_message(turn(i))
+        assert client.prompts == [] and ctx.summary == ""
+        await ctx.add_message(turn(5))
+        assert ctx.compactions == 1 and ctx.summary == "summary 1"
+        messages = await ctx.get_messages()
+        assert isinstance(messages[0], SystemMessage) and "summary 1" in messages[0].content
+        # The oldest turns were evicted, the latest kept, and the rest fits the budget
+        assert "turn0" in client.prompts[0] and "turn5" not in client.prompts[0]
+        assert messages[-1].content.endswith("turn5")
+        assert client.count_tokens(messages) <= ctx.token_budget
+    asyncio.run(run())
+
+
+def test_summary_is_updated_incrementally():
+    async def run():
+        client = FakeClient()
+        ctx = context(client)
+        for i in range(10):
+            await ctx.add_message(turn(i))
+        assert ctx.compactions >= 2
+        # Later summaries start from the previous summary and only see newly evicted turns
+        assert "summary 1" in client.prompts[1] and "turn0" not in client.prompts[1]
+    asyncio.run(run())
+
+
+def test_get_messages_never_summarizes():
+    async def run():
+        client = FakeClient()
+        ctx = context(client, budget=10_000)
+        for i in range(5):
+            await ctx.add_message(turn(i))
+        ctx.token_budget = 20
+        await ctx.get_messages()
+        await ctx.get_messages()
+        assert client.prompts == [] and ctx.compactions == 0
+        await ctx.compact()
+        assert ctx.compactions == 1
+    asyncio.run(run())
+
+
+def test_state_round_trips_the_summary():
+    async def run():
+        client = FakeClient()
+        ctx = context(client)
+        for i in range(6):
+            await ctx.add_message(turn(i))
+        await ctx.add_message(AssistantMessage(content="noted", source="TriageAgent"))
+        state = await ctx.save_state()
+        restored = context(FakeClient())
+        await restored.load_state(state)
+        assert restored.summary == ctx.summary == "summary 1"
+        assert await restored.get_messages() == await ctx.get_messages()
+    asyncio.run(run())
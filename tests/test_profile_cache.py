@@ -0,0 +1,88 @@
+import asyncio
+import json
+import pytest
+from autogen_agentchat.agents import AssistantAgent
+from autogen_agentchat.messages import MemoryQueryEvent
+from autogen_core.memory import MemoryContent, MemoryMimeType
+from autogen_core.models import SystemMessage
+from autogen_ext.models.replay import ReplayChatCompletionClient
+from memory.profile_cache import ProfileCache, ProfileMemory
+from memory.vector_backends import LocalVectorBackend
+from memory.vector_memory import VectorMemory
+
+
+def cv_doc(doc_id, user_id, chunk, content, metadata_user=None):
+    metadata = {"user_id": metadata_user or user_id, "doc_type": "cv", "chunk": chunk}
+    return {"id": doc_id, "content": content, "embedding": [1.0, 0.0], "user_id": user_id, "doc_type": "cv", "metadata": json.dumps(metadata)}
+
+
+@pytest.fixture
+def profile_memory(monkeypatch):
+    monkeypatch.setenv("AZURE_OPENAI_ENDPOINT", "https://example.openai.azure.com")
+    monkeypatch.setenv("AZURE_OPENAI_API_KEY", "test")
+
+    async def build(filters_metadata=True):
+        backend = LocalVectorBackend("profile")
+        backend.filters_metadata = filters_metadata
+        await backend.upload([
+            cv_doc("a2", "alice", 1, "Skills: Python, SQL"),
+            cv_doc("a1", "alice", 0, "Alice, data engineer"),
+            cv_doc("b1", "bob", 0, "Bob, designer"),
+            # Promoted field and metadata disagree: never served to either user
+            cv_doc("x1", "alice", 2, "Mallory's CV", metadata_user="mallory"),
+        ])
+        return VectorMemory(index_name="profile", backend=backend)
+    return build
+
+
+def test_lookup_is_scoped_to_the_user_and_cached(profile_memory):
+    async def run():
+        memory = await profile_memory()
+        cache = ProfileCache(ttl=60)
+        chunks = await cache.get(memory, "alice")
+        assert sorted(chunk.content for chunk in chunks) == ["Alice, data engineer", "Skills: Python, SQL"]
+        assert await cache.get(memory, "alice") is chunks
+        cache.invalidate("alice")
+        assert cache.stats()["entries"] == 0
+    asyncio.run(run())
+
+
+def test_index_without_filterable_fields_returns_nothing(profile_memory):
+    async def run():
+        memory = await profile_memory(filters_metadata=False)
+        cache = ProfileCache(ttl=60)
+        assert await cache.get(memory, "alice") == []
+        assert cache.stats()["entries"] == 0
+    asyncio.run(run())
+
+
+def test_profile_memory_ignores_generic_adds(profile_memory):
+    async def run():
+        memory = ProfileMemory(await profile_memory(), "alice", cache=ProfileCache(ttl=60))
+        await memory.add(MemoryContent(content="not a CV", mime_type=MemoryMimeType.TEXT))
+        result = await memory.query()
+        assert "not a CV" not in [item.content for item in result.results]
+    asyncio.run(run())
+
+
+def test_cv_reaches_profiler_agent_model_context(profile_memory):
+    async def run():
+        memory = await profile_memory()
+        profile = ProfileMemory(memory, "alice", cache=ProfileCache(ttl=60))
+        agent = AssistantAgent(
+            "ProfilerAgent",
+            model_client=ReplayChatCompletionClient(["You are a data engineer.", "Still a data engineer."]),
+            memory=[profile],
+        )
+        result = await agent.run(task="Review my profile")
+        events = [m for m in result.messages if isinstance(m, MemoryQueryEvent)]
+        assert sorted(c.content for c in events[0].content) == ["Alice, data engineer", "Skills: Python, SQL"]
+        await agent.run(task="And now?")
+        cv_messages = [
+            m for m in await agent.model_context.get_messages()
+            if isinstance(m, SystemMessage) and m.content.startswith("The user's uploaded CV")
+        ]
+        # Added once, in chunk order, and only this user's chunks
+        assert len(cv_messages) == 1
+        assert cv_messages[0].content.endswith("Alice, data engineer\n\nSkills: Python, SQL")
+    asyncio.run(run())
@@ -0,0 +1,154 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from workflow.events import SessionEventBus, bind_bus
+from workflow.scheduler import BUSY_MESSAGE, DeploymentScheduler, ScheduledChatCompletionClient, SchedulerOverloaded
+
+
+def test_admits_up_to_max_concurrency_in_priority_order():
+    async def run():
+        scheduler = DeploymentScheduler("test", max_concurrency=1, tpm=0, max_queue=10)
+        await scheduler.acquire(priority=1, tokens=10)
+        order = []
+
+        async def request(name, priority):
+            await scheduler.acquire(priority, 10)
+            order.append(name)
+            scheduler.release(10, 10)
+        waiters = [asyncio.create_task(request("tool", 2)), asyncio.create_task(request("specialist", 1))]
+        await asyncio.sleep(0)
+        waiters.append(asyncio.create_task(request("triage", 0)))
+        await asyncio.sleep(0)
+        assert scheduler.depth == 3 and scheduler.in_flight == 1
+        scheduler.release(10, 10)
+        await asyncio.gather(*waiters)
+        assert order == ["triage", "specialist", "tool"]
+        assert scheduler.in_flight == 0
+        assert scheduler.admitted == 4
+    asyncio.run(run())
+
+
+def test_sheds_when_queue_is_full():
+    async def run():
+        scheduler = DeploymentScheduler("test", max_concurrency=1, tpm=0, max_queue=1)
+        await scheduler.acquire(1, 10)
+        waiter = asyncio.create_task(scheduler.acquire(1, 10))
+        await asyncio.sleep(0)
+        with pytest.raises(SchedulerOverloaded):
+            await scheduler.acquire(0, 10)
+        assert scheduler.shed == 1
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+    asyncio.run(run())
+
+
+def test_shedding_tells_the_session_once_per_burst():
+    async def run():
+        bus = SessionEventBus(session_id="s1")
+        bind_bus(bus)
+        scheduler = DeploymentScheduler("test", max_concurrency=1, tpm=0, max_queue=0)
+        for _ in range(3):
+            with pytest.raises(SchedulerOverloaded):
+                await scheduler.acquire(1, 10)
+        bus.close()
+        events = [event async for event in bus.events()]
+        assert [event["content"] for event in events] == [BUSY_MESSAGE]
+        assert scheduler.shed == 3
+    asyncio.run(run())
+
+
+def test_cancelled_waiter_frees_its_queue_slot():
+    async def run():
+        scheduler = DeploymentScheduler("test", max_concurrency=1, tpm=0, max_queue=1)
+        await scheduler.acquire(1, 10)
+        waiter = asyncio.create_task(scheduler.acquire(1, 10))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert scheduler.depth == 0
+        # The cancelled request neither holds a slot nor blocks the next one from queueing
+        follower = asyncio.create_task(scheduler.acquire(1, 10))
+        await asyncio.sleep(0)
+        scheduler.release(10, 10)
+        await follower
+        assert scheduler.in_flight == 1
+        assert scheduler.admitted == 2
+    asyncio.run(run())
+
+
+def test_cancel_after_admission_hands_the_slot_back():
+    async def run():
+        scheduler = DeploymentScheduler("test", max_concurrency=1, tpm=0, max_queue=10)
+        await scheduler.acquire(1, 10)
+        waiter = asyncio.create_task(scheduler.acquire(1, 10))
+        await asyncio.sleep(0)
+        # Admit the waiter and cancel it before it gets to run
+        scheduler.release(10, 10)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert waiter.cancelled()
+        assert scheduler.in_flight == 0
+    asyncio.run(run())
+
+
+def test_cancel_after_admission_refunds_its_tokens():
+    async def run():
+        scheduler = DeploymentScheduler("test", max_concurrency=1, tpm=6000, max_queue=10)
+        await scheduler.acquire(1, 10)
+        waiter = asyncio.create_task(scheduler.acquire(1, 3000))
+        await asyncio.sleep(0)
+        scheduler.release(10, 10)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert scheduler.in_flight == 0
+        assert scheduler.stats()["tokens_available"] >= 5980
+    asyncio.run(run())
+
+
+def test_rate_limit_pauses_admission_without_a_token_budget():
+    async def run():
+        scheduler = DeploymentScheduler("test", max_concurrency=10, tpm=0, max_queue=10)
+        scheduler.penalize(0.1)
+        waiter = asyncio.create_task(scheduler.acquire(1, 10))
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+        assert scheduler.stats()["paused_s"] > 0
+        await asyncio.wait_for(waiter, 1)
+        assert scheduler.in_flight == 1
+    asyncio.run(run())
+
+
+def test_token_bucket_holds_requests_until_refilled():
+    async def run():
+        # 6000 tokens per minute refill at 100 per second
+        scheduler = DeploymentScheduler("test", max_concurrency=10, tpm=6000, max_queue=10)
+        await scheduler.acquire(1, 6000)
+        waiter = asyncio.create_task(scheduler.acquire(1, 10))
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+        await asyncio.wait_for(waiter, 1)
+        # Actual usage below the estimate returns the difference to the bucket
+        scheduler.release(6000, 100)
+        assert scheduler.stats()["tokens_available"] >= 5900
+    asyncio.run(run())
+
+
+class SlowClient:
+    """Chat client stub whose completions never finish on their own."""
+    def count_tokens(self, messages, **kwargs):
+        return 10
+
+    async def create(self, messages, **kwargs):
+        await asyncio.sleep(3600)
+
+
+def test_timed_out_create_returns_its_slot():
+    async def run():
+        scheduler = DeploymentScheduler("test", max_concurrency=2, tpm=0, max_queue=10)
+        client = ScheduledChatCompletionClient(SlowClient(), scheduler, max_retries=0)
+        for _ in range(3):
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(client.create([SimpleNamespace(content="hi")]), 0.01)
+        assert scheduler.in_flight == 0
+        assert scheduler.admitted == 3
+    asyncio.run(run())
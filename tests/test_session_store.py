@@ -0,0 +1,101 @@
+import asyncio
+from types import SimpleNamespace
+from workflow.events import SessionEventBus
+from workflow.session_store import LiveSession, SessionManager, SessionStore
+
+
+class FakeSocket:
+    def __init__(self):
+        self.closed_with = None
+
+    async def close(self, code=1000, reason=None):
+        self.closed_with = code
+
+
+def live_session(session_id="s1"):
+    session = LiveSession(session_id, "selector", SimpleNamespace(close=lambda: None), agents=[])
+    session.task = asyncio.create_task(asyncio.sleep(3600))
+    return session
+
+
+def test_store_round_trip_and_prune(tmp_path):
+    async def run():
+        store = SessionStore(str(tmp_path / "sessions.sqlite3"))
+        await store.save("s1", {"mode": "parallel", "turns": 2})
+        assert await store.load("s1") == {"mode": "parallel", "turns": 2}
+        assert await store.prune(3600) == 0
+        assert await store.prune(-1) == 1
+        assert await store.load("s1") is None
+        store.close()
+    asyncio.run(run())
+
+
+def test_only_issued_session_ids_are_accepted(tmp_path):
+    async def run():
+        manager = SessionManager(SessionStore(str(tmp_path / "sessions.sqlite3")))
+        issued = await manager.session_id()
+        assert await manager.session_id(issued) == issued
+        replaced = await manager.session_id("chosen-by-the-client")
+        assert replaced != "chosen-by-the-client"
+        assert await manager.store.known(replaced)
+        manager.store.close()
+    asyncio.run(run())
+
+
+def test_takeover_closes_the_previous_socket(tmp_path):
+    async def run():
+        manager = SessionManager(SessionStore(str(tmp_path / "sessions.sqlite3")))
+        old, new = FakeSocket(), FakeSocket()
+        session = live_session()
+        manager.register(session, old)
+        session.sender = asyncio.create_task(asyncio.sleep(3600))
+        sender = session.sender
+
+        assert await manager.attach("s1", new) is session
+        await asyncio.gather(sender, return_exceptions=True)
+        assert sender.cancelled()
+        assert old.closed_with == 4000 and new.closed_with is None
+        assert session.owner is new
+        # The old connection's handler ends after the takeover and must not detach the session
+        await manager.detach(session, old)
+        assert session.owner is new and session.detached_at is None
+        await manager.close()
+    asyncio.run(run())
+
+
+def test_detached_session_is_evicted_at_a_turn_boundary(tmp_path):
+    async def run():
+        manager = SessionManager(SessionStore(str(tmp_path / "sessions.sqlite3")), idle_timeout=0)
+        session = live_session()
+        manager.register(session, FakeSocket())
+        await manager.detach(session, session.owner)
+        # Mid-turn sessions stay in memory
+        await manager.reap()
+        assert "s1" in manager.live
+        session.waiting_for_input = True
+        await manager.reap()
+        assert "s1" not in manager.live and manager.evicted == 1
+        assert (await manager.store.load("s1"))["mode"] == "selector"
+        assert await manager.attach("s1", FakeSocket()) is None
+        await manager.close()
+    asyncio.run(run())
+
+
+def test_close_wakes_a_task_waiting_for_input():
+    async def run():
+        bus = SessionEventBus("s1")
+        session = LiveSession("s1", "selector", bus, agents=[])
+
+        async def team():
+            # Like the team runtime, which waits for in-flight handlers (the user proxy) before stopping
+            handler = asyncio.create_task(bus.receive_user_message())
+            try:
+                await asyncio.shield(handler)
+            finally:
+                await asyncio.gather(handler, return_exceptions=True)
+        session.task = asyncio.create_task(team())
+        await asyncio.sleep(0)
+        closing = asyncio.create_task(session.close())
+        await asyncio.wait([closing], timeout=1)
+        assert closing.done() and session.task.done()
+    asyncio.run(run())
@@ -0,0 +1,83 @@
+import asyncio
+from autogen_core.model_context import UnboundedChatCompletionContext
+from autogen_core.models import SystemMessage, UserMessage
+from memory.shortterm_memory import ShortTermMemory
+
+
+def test_evicts_by_count_and_tokens():
+    async def run():
+        memory = ShortTermMemory(capacity=3, max_tokens=20)
+        await memory.add([{"content": f"message {i}"} for i in range(5)])
+        assert memory.size() == 3
+        await memory.add([{"content": "x" * 200}])
+        # The newest message is always kept, even over the token budget
+        assert memory.size() == 1 and memory.total_tokens() == 51
+    asyncio.run(run())
+
+
+def test_query_ranks_by_relevance_then_recency():
+    async def run():
+        memory = ShortTermMemory(capacity=10)
+        await memory.add([
+            {"content": "I have five years of Python experience", "role": "user"},
+            {"content": "Looking for data engineering roles in Berlin"},
+            {"content": "Python and SQL are my strongest skills"},
+        ])
+        result = await memory.query("python skills", top_k=2)
+        assert [m.content for m in result.results] == [
+            "Python and SQL are my strongest skills",
+            "I have five years of Python experience",
+        ]
+        assert result.results[1].metadata == {"role": "user"}
+        # No matching terms falls back to the most recent messages
+        assert [m.content for m in (await memory.query("kubernetes", top_k=1)).results] == ["Python and SQL are my strongest skills"]
+    asyncio.run(run())
+
+
+def test_update_context_adds_relevant_messages():
+    async def run():
+        memory = ShortTermMemory(capacity=10)
+        context = UnboundedChatCompletionContext()
+        await context.add_message(UserMessage(content="Which Berlin roles fit me?", source="user"))
+        empty = await memory.update_context(context)
+        assert empty.memories.results == [] and len(await context.get_messages()) == 1
+
+        await memory.add([{"content": "Prefers roles in Berlin"}, {"content": "Knows Rust"}])
+        result = await memory.update_context(context)
+        assert [m.content for m in result.memories.results][0] == "Prefers roles in Berlin"
+        added = (await context.get_messages())[-1]
+        assert isinstance(added, SystemMessage) and "Prefers roles in Berlin" in added.content
+    asyncio.run(run())
+
+
+def test_repeated_updates_keep_one_recall_message():
+    async def run():
+        memory = ShortTermMemory(capacity=10)
+        await memory.add([{"content": "Prefers roles in Berlin"}, {"content": "Knows Rust"}])
+        context = UnboundedChatCompletionContext()
+        for question in ["Which Berlin roles fit me?", "What about Rust?", "Anything else?"]:
+            await context.add_message(UserMessage(content=question, source="user"))
+            await memory.update_context(context)
+        messages = await context.get_messages()
+        recalls = [m for m in messages if isinstance(m, SystemMessage)]
+        assert len(recalls) == 1 and recalls[0] is messages[-1]
+        assert [m.content for m in messages[:-1]] == ["Which Berlin roles fit me?", "What about Rust?", "Anything else?"]
+        # An empty memory removes the stale block too
+        await memory.clear()
+        await memory.update_context(context)
+        assert not any(isinstance(m, SystemMessage) for m in await context.get_messages())
+    asyncio.run(run())
+
+
+def test_clear_and_state_round_trip():
+    async def run():
+        memory = ShortTermMemory(capacity=10)
+        await memory.add([{"content": "Python developer"}, {"content": "Wants remote work"}])
+        state = await memory.save_state()
+        await memory.clear()
+        assert memory.size() == 0 and memory.total_tokens() == 0
+        assert (await memory.query("python")).results == []
+        restored = ShortTermMemory(capacity=10)
+        await restored.load_state(state)
+        assert [m.content for m in (await restored.query("remote")).results] == ["Wants remote work"]
+    asyncio.run(run())
@@ -0,0 +1,108 @@
+import asyncio
+from autogen_core import CancellationToken
+from autogen_core.tools import FunctionTool
+from workflow.tool_cache import CachedAgentTool, CachingTool, ResponseCache
+
+
+def counting_tool(release: asyncio.Event, calls: list):
+    async def brave_web_search(query: str) -> str:
+        calls.append(query)
+        await release.wait()
+        return f"results for {query}"
+    return FunctionTool(brave_web_search, description="Search the web")
+
+
+def test_concurrent_identical_calls_share_one_execution():
+    async def run():
+        release, calls = asyncio.Event(), []
+        tool = CachingTool(counting_tool(release, calls), ttl=60)
+        waiters = [asyncio.create_task(tool.run_json({"query": q}, CancellationToken())) for q in ("Python jobs", " python  JOBS")]
+        await asyncio.sleep(0)
+        release.set()
+        assert await asyncio.gather(*waiters) == ["results for Python jobs"] * 2
+        assert await tool.run_json({"query": "python jobs"}, CancellationToken()) == "results for Python jobs"
+        assert calls == ["Python jobs"]
+        assert (tool.misses, tool.coalesced, tool.hits) == (1, 1, 1)
+    asyncio.run(run())
+
+
+def test_cancelling_one_caller_does_not_cancel_the_shared_call():
+    async def run():
+        release, calls = asyncio.Event(), []
+        tool = CachingTool(counting_tool(release, calls), ttl=60)
+        first = asyncio.create_task(tool.run_json({"query": "data engineer"}, CancellationToken()))
+        second = asyncio.create_task(tool.run_json({"query": "data engineer"}, CancellationToken()))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.gather(first, return_exceptions=True)
+        release.set()
+        assert await second == "results for data engineer"
+        assert first.cancelled()
+        # The execution finished for the remaining caller, so its result was cached
+        assert tool.stats()["entries"] == 1
+        assert calls == ["data engineer"]
+    asyncio.run(run())
+
+
+def test_cancelling_every_caller_still_caches_the_result():
+    async def run():
+        release, calls = asyncio.Event(), []
+        tool = CachingTool(counting_tool(release, calls), ttl=60)
+        caller = asyncio.create_task(tool.run_json({"query": "ml"}, CancellationToken()))
+        await asyncio.sleep(0)
+        caller.cancel()
+        await asyncio.gather(caller, return_exceptions=True)
+        release.set()
+        assert await tool.run_json({"query": "ml"}, CancellationToken()) == "results for ml"
+        assert calls == ["ml"]
+    asyncio.run(run())
+
+
+def test_failed_calls_are_not_cached():
+    async def run():
+        attempts = []
+
+        async def flaky(query: str) -> str:
+            attempts.append(query)
+            if len(attempts) == 1:
+                raise RuntimeError("upstream error")
+            return "ok"
+        tool = CachingTool(FunctionTool(flaky, description="Flaky tool"), ttl=60)
+        try:
+            await tool.run_json({"query": "q"}, CancellationToken())
+        except RuntimeError:
+            pass
+        assert await tool.run_json({"query": "q"}, CancellationToken()) == "ok"
+        assert len(attempts) == 2
+    asyncio.run(run())
+
+
+def test_response_cache_expiry_persistence_and_invalidation(tmp_path):
+    async def run():
+        path = str(tmp_path / "responses.sqlite")
+        cache = ResponseCache(max_entries=2, ttl=60, sqlite_path=path)
+        key = ResponseCache.key("analyze_resume", "gpt-4o", "My  CV")
+        assert key == ResponseCache.key("analyze_resume", "gpt-4o", "my cv")
+        await cache.put(key, "analyze_resume", {"messages": [], "stop_reason": None})
+        cache.close()
+
+        reopened = ResponseCache(max_entries=2, ttl=60, sqlite_path=path)
+        assert await reopened.get(key) == {"messages": [], "stop_reason": None}
+        assert reopened.persistent_hits == 1
+        removed = []
+        reopened.on_invalidate(lambda tool, k: removed.append((tool, k)))
+        await reopened.invalidate(tool_name="analyze_resume")
+        assert await reopened.get(key) is None
+        assert removed == [("analyze_resume", None)]
+        reopened.close()
+
+        expired = ResponseCache(ttl=0)
+        await expired.put(key, "analyze_resume", "value")
+        assert await expired.get(key) is None
+    asyncio.run(run())
+
+
+def test_cached_agent_tool_round_trips_task_results():
+    cached = {"messages": [{"source": "AnalyzeResumeAgent", "content": "Strong Python"}], "stop_reason": "done"}
+    result = CachedAgentTool._rebuild(cached)
+    assert CachedAgentTool._serialize(result) == cached
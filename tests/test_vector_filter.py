@@ -0,0 +1,84 @@
+import asyncio
+import json
+import pytest
+from memory.vector_backends import LocalVectorBackend, compile_filter
+
+DOC = {
+    "id": "1",
+    "user_id": "alice",
+    "doc_type": "cv",
+    "metadata": json.dumps({"source": "upload", "page": 2, "created_at": 1000, "tags": {"lang": "en"}}),
+}
+
+
+@pytest.mark.parametrize("expr, expected", [
+    ("user_id eq 'alice'", True),
+    ("user_id ne 'alice'", False),
+    ("user_id eq 'alice' and doc_type eq 'cv'", True),
+    ("user_id eq 'bob' or doc_type eq 'cv'", True),
+    ("user_id eq 'bob' or doc_type eq 'cv' and page eq 3", False),
+    ("(user_id eq 'bob' or doc_type eq 'cv') and page eq 2", True),
+    ("not user_id eq 'alice'", False),
+    ("not (user_id eq 'bob')", True),
+    ("page gt 1 and page le 2", True),
+    ("created_at lt 999", False),
+    ("missing gt 1", False),
+    ("missing eq null", True),
+    ("metadata/source eq 'upload'", True),
+    ("tags/lang eq 'en'", True),
+    ("search.in(user_id, 'bob,alice')", True),
+    ("search.in(user_id, 'bob|carol', '|')", False),
+    ("user_id eq 'o''brien'", False),
+])
+def test_compile_filter(expr, expected):
+    assert compile_filter(expr)(DOC) is expected
+
+
+def test_compile_filter_escaped_quote():
+    assert compile_filter("user_id eq 'o''brien'")({"id": "2", "user_id": "o'brien"})
+
+
+@pytest.mark.parametrize("expr", ["user_id eq", "(user_id eq 'a'", "user_id eq 'a' )", "user_id eq 'a' ; drop", "search.in(user_id)"])
+def test_compile_filter_rejects_malformed(expr):
+    with pytest.raises(ValueError):
+        compile_filter(expr)
+
+
+def test_local_backend_filtered_search_and_delete(tmp_path):
+    async def run():
+        backend = LocalVectorBackend("test", path=str(tmp_path), initial_capacity=2)
+        await backend.upload([
+            {"id": str(i), "content": f"doc {i}", "embedding": [1.0, float(i)], "user_id": "a" if i % 2 else "b"}
+            for i in range(10)
+        ])
+        hits = await backend.search([1.0, 9.0], top_k=3, filter="user_id eq 'b'")
+        assert [hit["id"] for hit in hits] == ["8", "6", "4"]
+        assert await backend.delete("user_id eq 'a'", batch_size=3) == 5
+        assert await backend.count() == 5
+        assert await backend.lookup("user_id eq 'a'", top=10) == []
+        reloaded = LocalVectorBackend("test", path=str(tmp_path))
+        assert sorted(doc["id"] for doc in await reloaded.lookup("user_id eq 'b'", top=10)) == ["0", "2", "4", "6", "8"]
+    asyncio.run(run())
+
+
+def test_filter_masks_only_evaluate_new_rows():
+    async def run():
+        backend = LocalVectorBackend("test")
+        calls = []
+        predicate = compile_filter("user_id eq 'b'")
+        backend._filters["user_id eq 'b'"] = lambda doc: calls.append(doc["id"]) or predicate(doc)
+        docs = [{"id": str(i), "embedding": [1.0, float(i)], "user_id": "a" if i % 2 else "b"} for i in range(6)]
+        await backend.upload(docs)
+        assert [hit["id"] for hit in await backend.search([1.0, 9.0], top_k=2, filter="user_id eq 'b'")] == ["4", "2"]
+        assert len(calls) == 6
+        await backend.search([1.0, 9.0], top_k=2, filter="user_id eq 'b'")
+        assert len(calls) == 6
+        # A new row is evaluated once; a replaced row is re-evaluated in place
+        await backend.upload([{"id": "6", "embedding": [1.0, 6.0], "user_id": "b"}, dict(docs[4], user_id="a")])
+        assert [hit["id"] for hit in await backend.search([1.0, 9.0], top_k=2, filter="user_id eq 'b'")] == ["6", "2"]
+        assert len(calls) == 8
+        # Deletes and compaction keep the surviving rows' bits
+        await backend.delete("user_id eq 'a'")
+        assert [doc["id"] for doc in await backend.lookup("user_id eq 'b'", top=10)] == ["0", "2", "6"]
+        assert len(calls) == 8
+    asyncio.run(run())